@@ -6,3 +6,6 @@
 from openfl_contrib.interface.aggregation_functions.custom_weighted_average import (
     CustomWeightedAverage,
 )
+from openfl_contrib.interface.aggregation_functions.sparse_weighted_average import (
+    SparseWeightedAverage,
+)
@@ -0,0 +1,79 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Compressed-domain Federated averaging module."""
+
+import numpy as np
+from openfl.interface.aggregation_functions.core import AggregationFunction
+
+from openfl_contrib.pipelines import SKCPipeline
+
+
+class SparseWeightedAverage(AggregationFunction):
+    """Weighted average aggregation of SKC payloads, without decompressing them.
+
+    Local tensors are either numpy arrays or SKC payloads, i.e. the
+    (data, transformer_metadata) tuples returned by SKCPipeline.forward. Every
+    tensor is added with its weight to a single accumulator, and payloads are
+    scatter-added at their kept indices, so memory stays at one tensor size
+    whatever the number of collaborators.
+
+    The openfl Aggregator decompresses the collaborator tensors before it
+    aggregates them, so it always calls this function with numpy arrays,
+    which are averaged densely. Payloads are only aggregated without
+    decompression when they are handed to call directly.
+
+    Aggregation functions are singletons: the first construction creates the
+    pipeline and later constructions return the same object, ignoring their
+    settings. Replace the pipeline attribute to change the settings.
+
+    Attributes:
+        pipeline (SKCPipeline): pipeline decoding the payloads.
+    """
+
+    def __init__(self, **pipeline_settings):
+        """Initialize.
+
+        Args:
+            **pipeline_settings: settings of the SKCPipeline the payloads were
+                compressed with, e.g. the compression_pipeline settings of
+                plan.yaml. Only the first construction applies them.
+        """
+        super().__init__()
+        self.pipeline = SKCPipeline(**pipeline_settings)
+
+    def call(self, local_tensors, db_iterator=None, tensor_name=None, *_) -> np.ndarray:
+        """Aggregate tensors.
+
+        Delta-encoded payloads are decoded against the reference set with
+        self.pipeline.set_reference under tensor_name, for the round recorded
+        in their metadata.
+
+        Args:
+            local_tensors(list[openfl.utilities.LocalTensor]): List of local tensors to
+                aggregate, holding numpy arrays or SKC payloads.
+            db_iterator: iterator over history of all tensors.
+            tensor_name: name of the tensor, needed by delta-encoded payloads
+            fl_round: round number
+            tags: tuple of tags for this tensor
+        Returns:
+            np.ndarray: aggregated tensor
+        """
+        total_weight = sum(x.weight for x in local_tensors)
+        weighted_sum = None
+        for local_tensor in local_tensors:
+            weight = local_tensor.weight / total_weight
+            if isinstance(local_tensor.tensor, np.ndarray):
+                if weighted_sum is None:
+                    weighted_sum = np.zeros(local_tensor.tensor.shape, dtype=np.float32)
+                weighted_sum += local_tensor.tensor * weight
+            else:
+                data, transformer_metadata = local_tensor.tensor
+                weighted_sum = self.pipeline.accumulate(
+                    data,
+                    transformer_metadata,
+                    out=weighted_sum,
+                    weight=weight,
+                    tensor_name=tensor_name,
+                )
+        return weighted_sum
@@ -2,4 +2,5 @@
 # SPDX-License-Identifier: Apache-2.0
 """openfl.pipelines module."""
 
+from openfl_contrib.pipelines.shuffle_pipeline import ShufflePipeline
 from openfl_contrib.pipelines.skc_pipeline import SKCPipeline
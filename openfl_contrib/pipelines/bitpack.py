@@ -0,0 +1,43 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Bit packing module."""
+
+import numpy as np
+
+
+def pack_bits(codes, n_bits):
+    """Pack unsigned integer codes into a dense little-endian bit stream.
+
+    Args:
+        codes: a flat numpy array of unsigned integers, each below 2**n_bits.
+        n_bits (int): number of bits kept per code.
+
+    Returns:
+        packed: uint8 numpy array of ceil(len(codes) * n_bits / 8) bytes.
+    """
+    code_bytes = codes.astype(codes.dtype.newbyteorder("<"), copy=False).view(np.uint8)
+    code_bytes = code_bytes.reshape(codes.shape[0], codes.dtype.itemsize)
+    bits = np.unpackbits(code_bytes, axis=1, count=n_bits, bitorder="little")
+    return np.packbits(bits, bitorder="little")
+
+
+def unpack_bits(packed, n_bits, count, dtype=np.uint8):
+    """Unpack a bit stream produced by pack_bits.
+
+    Args:
+        packed: uint8 numpy array.
+        n_bits (int): number of bits per code.
+        count (int): number of codes in the stream.
+        dtype: unsigned integer dtype of the decoded codes (Default=np.uint8).
+
+    Returns:
+        codes: numpy array of count codes.
+    """
+    dtype = np.dtype(dtype)
+    bits = np.unpackbits(packed, count=count * n_bits, bitorder="little")
+    code_bytes = np.packbits(bits.reshape(count, n_bits), axis=1, bitorder="little")
+    if code_bytes.shape[1] < dtype.itemsize:
+        padding = np.zeros((count, dtype.itemsize - code_bytes.shape[1]), dtype=np.uint8)
+        code_bytes = np.hstack([code_bytes, padding])
+    return code_bytes.view(dtype.newbyteorder("<")).reshape(count).astype(dtype, copy=False)
@@ -0,0 +1,241 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Lossless codec registry module.
+
+Every compressed payload starts with a one-byte header holding the id of the
+codec that produced it, so the receiver does not need to know the sender's
+codec settings. decompress also accepts plain gzip streams without a
+header. This only covers the codec API: SKCPipeline payloads of earlier
+versions use another layout and are not decoded by SKCPipeline.backward.
+
+zstd and lz4 are registered only when the `zstandard` and `lz4` packages are
+installed.
+"""
+
+import bz2
+import gzip
+import lzma
+import threading
+import time
+import zlib
+from importlib import util
+from typing import Callable, NamedTuple
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class Codec(NamedTuple):
+    """A lossless byte codec.
+
+    Attributes:
+        codec_id: one-byte id written in the payload header.
+        compress: callable taking (data, level) and returning compressed bytes.
+        decompress: callable taking compressed bytes and returning the data.
+        default_level: level used when none is given.
+    """
+
+    codec_id: int
+    compress: Callable
+    decompress: Callable
+    default_level: int = None
+
+
+_CODECS = {}
+
+
+def register_codec(name, codec_id, compress, decompress, default_level=None):
+    """Register a lossless codec.
+
+    Args:
+        name (str): codec name used in the pipeline settings.
+        codec_id (int): unique id in [0, 255], written in the payload header.
+        compress: callable taking (data, level) and returning compressed bytes.
+        decompress: callable taking compressed bytes and returning the data.
+        default_level (int): level used when none is given (Default=None).
+    """
+    if codec_id == _GZIP_MAGIC[0] or not 0 <= codec_id <= 255:
+        raise ValueError(f"Invalid codec id {codec_id}")
+    for other_name, other in _CODECS.items():
+        if other.codec_id == codec_id and other_name != name:
+            raise ValueError(f"Codec id {codec_id} is already used by '{other_name}'")
+    _CODECS[name] = Codec(codec_id, compress, decompress, default_level)
+
+
+def available_codecs():
+    """Return the names of the registered codecs."""
+    return list(_CODECS)
+
+
+def compress(data, codec="gzip", level=None, throughput_target=100.0, kind=None):
+    """Compress data and prepend the codec header.
+
+    Args:
+        data: a bytes-like object.
+        codec (str): registered codec name, or 'auto' (Default='gzip').
+        level (int): codec level, None for the codec default (Default=None).
+        throughput_target (float): minimal compression throughput in MB/s that
+            the 'auto' mode accepts (Default=100.0).
+        kind: hashable description of the data, e.g. its dtype. The 'auto'
+            mode probes the codecs once per kind and size class (Default=None).
+
+    Returns:
+        payload: the header byte followed by the compressed data.
+    """
+    if codec == "auto":
+        return _auto_compress(data, throughput_target, kind)
+    if codec not in _CODECS:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {available_codecs()}")
+    entry = _CODECS[codec]
+    level = entry.default_level if level is None else level
+    return bytes((entry.codec_id,)) + entry.compress(data, level)
+
+
+def decompress(payload):
+    """Decompress a payload produced by compress, or a plain gzip stream.
+
+    Args:
+        payload: a bytes-like object.
+
+    Returns:
+        data: the decompressed bytes.
+    """
+    payload = memoryview(payload)
+    if payload[:2] == _GZIP_MAGIC:
+        return gzip.decompress(payload)
+    codec_id = payload[0]
+    for entry in _CODECS.values():
+        if entry.codec_id == codec_id:
+            return entry.decompress(payload[1:])
+    raise ValueError(f"Unknown codec id {codec_id}")
+
+
+# densest-first candidates of the 'auto' mode, as (codec, level)
+AUTO_CANDIDATES = (
+    ("lzma", 6),
+    ("zstd", 19),
+    ("gzip", 9),
+    ("zstd", 3),
+    ("zlib", 6),
+    ("zlib", 1),
+    ("lz4", 0),
+    ("none", None),
+)
+_AUTO_SAMPLE_SIZE = 1 << 18
+_AUTO_MIN_TIMED_SIZE = 1 << 12
+# calls of the 'auto' mode reusing a probed codec before it probes again
+AUTO_REPROBE_INTERVAL = 64
+
+# (throughput target, kind, size class) -> [codec, level, calls left]
+_auto_choices = {}
+_auto_lock = threading.Lock()
+
+
+def _auto_compress(data, throughput_target, kind=None):
+    """Compress with the codec probed for data of this kind and size class.
+
+    Size classes grow by factors of 4. A probe runs on the first call of a
+    class, and again once the probed codec has served AUTO_REPROBE_INTERVAL
+    calls.
+    """
+    data = memoryview(data).cast("B")
+    key = (throughput_target, kind, data.nbytes.bit_length() // 2)
+    with _auto_lock:
+        choice = _auto_choices.get(key)
+        if choice is not None and choice[2] > 0:
+            choice[2] -= 1
+            return compress(data, codec=choice[0], level=choice[1])
+    name, level, payload = _auto_probe(data, throughput_target)
+    with _auto_lock:
+        _auto_choices[key] = [name, level, AUTO_REPROBE_INTERVAL]
+    return payload
+
+
+def _auto_probe(data, throughput_target):
+    """Pick and apply the densest codec that meets the throughput target.
+
+    Candidates are tried on a leading sample of the data. When no candidate is
+    fast enough, the fastest one is used. Samples too small to be timed
+    reliably just pick the densest codec.
+
+    Returns:
+        name, level, payload: the picked codec and the payload of data.
+    """
+    sample = data[:_AUTO_SAMPLE_SIZE]
+    timed = sample.nbytes >= _AUTO_MIN_TIMED_SIZE
+    trials = []
+    for name, level in AUTO_CANDIDATES:
+        if name not in _CODECS:
+            continue
+        start = time.perf_counter()
+        payload = compress(sample, codec=name, level=level)
+        elapsed = time.perf_counter() - start
+        throughput = sample.nbytes / max(elapsed, 1e-9) / 1e6
+        trials.append((name, level, len(payload), throughput, payload))
+
+    fast_enough = [t for t in trials if not timed or t[3] >= throughput_target]
+    if fast_enough:
+        name, level, _, _, payload = min(fast_enough, key=lambda t: t[2])
+    else:
+        name, level, _, _, payload = max(trials, key=lambda t: t[3])
+    if sample.nbytes < data.nbytes:
+        payload = compress(data, codec=name, level=level)
+    return name, level, payload
+
+
+register_codec(
+    "none",
+    0,
+    lambda data, level: bytes(data),
+    bytes,
+)
+register_codec(
+    "gzip",
+    1,
+    lambda data, level: gzip.compress(data, compresslevel=level, mtime=0),
+    gzip.decompress,
+    default_level=9,
+)
+register_codec(
+    "zlib",
+    2,
+    lambda data, level: zlib.compress(data, level),
+    zlib.decompress,
+    default_level=6,
+)
+register_codec(
+    "lzma",
+    3,
+    lambda data, level: lzma.compress(data, preset=level),
+    lzma.decompress,
+    default_level=6,
+)
+register_codec(
+    "bz2",
+    4,
+    lambda data, level: bz2.compress(data, compresslevel=level),
+    bz2.decompress,
+    default_level=9,
+)
+
+if util.find_spec("zstandard") is not None:
+    import zstandard
+
+    register_codec(
+        "zstd",
+        5,
+        lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+        default_level=3,
+    )
+
+if util.find_spec("lz4") is not None:
+    import lz4.frame
+
+    register_codec(
+        "lz4",
+        6,
+        lambda data, level: lz4.frame.compress(data, compression_level=level),
+        lz4.frame.decompress,
+        default_level=0,
+    )
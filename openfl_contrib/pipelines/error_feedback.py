@@ -0,0 +1,113 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Error-feedback residual store module."""
+
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+import numpy as np
+
+
+class ResidualStore:
+    """Per-tensor residuals of lossy compression, carried over to the next round.
+
+    Residuals are written through to one .npy file per tensor in path, so
+    they survive collaborator restarts. At most max_bytes of residuals are
+    kept in memory. The least recently used ones are dropped from memory and
+    reloaded from disk when they are needed again, or lost when path is None.
+
+    Attributes:
+        path (str): directory of the residual files, None to keep them in
+            memory only.
+        max_bytes (int): memory budget of the in-memory residuals.
+    """
+
+    def __init__(self, path="local_state/skc_residuals", max_bytes=256 << 20):
+        """Initialize.
+
+        Args:
+            path (str): directory of the residual files, None to keep them in
+                memory only (Default='local_state/skc_residuals')
+            max_bytes (int): memory budget of the in-memory residuals
+                (Default=256 MiB)
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._residuals = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, tensor_name):
+        """Return the residual of a tensor, or None when there is none.
+
+        Args:
+            tensor_name (str): name of the tensor.
+
+        Returns:
+            residual: flat float32 numpy array, or None.
+        """
+        with self._lock:
+            if tensor_name in self._residuals:
+                self._residuals.move_to_end(tensor_name)
+                return self._residuals[tensor_name]
+        file_path = self._file_path(tensor_name)
+        if file_path is None or not os.path.exists(file_path):
+            return None
+        residual = np.load(file_path)
+        with self._lock:
+            self._cache(tensor_name, residual)
+        return residual
+
+    def put(self, tensor_name, residual):
+        """Store the residual of a tensor.
+
+        Args:
+            tensor_name (str): name of the tensor.
+            residual: flat float32 numpy array.
+        """
+        file_path = self._file_path(tensor_name)
+        if file_path is not None:
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, residual)
+            os.replace(tmp_path, file_path)
+        with self._lock:
+            self._cache(tensor_name, residual)
+
+    def clear(self):
+        """Drop every residual, in memory and on disk."""
+        with self._lock:
+            self._residuals.clear()
+            self._nbytes = 0
+        if self.path is not None and os.path.isdir(self.path):
+            for file_name in os.listdir(self.path):
+                if file_name.endswith(".npy"):
+                    os.remove(os.path.join(self.path, file_name))
+
+    def __getstate__(self):
+        """Pickle the store settings only, e.g. for worker processes."""
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        """Restore a pickled store with an empty memory cache."""
+        self.__init__(**state)
+
+    def _cache(self, tensor_name, residual):
+        """Keep a residual in memory, evicting the least recently used ones."""
+        if tensor_name in self._residuals:
+            self._nbytes -= self._residuals.pop(tensor_name).nbytes
+        self._residuals[tensor_name] = residual
+        self._nbytes += residual.nbytes
+        while self._nbytes > self.max_bytes and self._residuals:
+            _, evicted = self._residuals.popitem(last=False)
+            self._nbytes -= evicted.nbytes
+
+    def _file_path(self, tensor_name):
+        """Path of the residual file of a tensor."""
+        if self.path is None:
+            return None
+        return os.path.join(self.path, quote(tensor_name, safe="") + ".npy")
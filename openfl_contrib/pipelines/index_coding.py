@@ -0,0 +1,129 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Sparse index stream coding module.
+
+A stream starts with a one-byte tag naming its format. The delta format holds
+the gaps between consecutive sorted indices as LEB128 varints, 7 bits per byte
+with the high bit flagging a continuation. The bitmap format holds one
+presence bit per position up to the last index. The encoder picks the shorter
+one, so sparse selections pay about log2(n / k) bits per index and dense ones
+at most n / k.
+"""
+
+import numpy as np
+
+INDEX_FORMATS = ("delta", "bitmap")
+
+
+def encode_indices(indices, index_format=None):
+    """Encode sorted unique indices.
+
+    Args:
+        indices: ascending numpy array of non-negative integers.
+        index_format (str): one of INDEX_FORMATS, None to pick the shorter
+            stream (Default=None).
+
+    Returns:
+        stream: bytearray starting with the format tag.
+    """
+    if index_format not in INDEX_FORMATS + (None,):
+        raise ValueError(f"Unknown index format '{index_format}', expected one of {INDEX_FORMATS}")
+    indices = np.asarray(indices)
+    deltas = _deltas(indices.astype(np.uint64, copy=False))
+    lengths = _varint_lengths(deltas)
+    if index_format is None:
+        index_format = "delta" if lengths.sum() <= _bitmap_nbytes(indices) else "bitmap"
+    body_nbytes = int(lengths.sum()) if index_format == "delta" else _bitmap_nbytes(indices)
+    stream = bytearray(1 + body_nbytes)
+    stream[0] = INDEX_FORMATS.index(index_format)
+    body = np.frombuffer(stream, dtype=np.uint8, offset=1)
+    if index_format == "delta":
+        _encode_varints(deltas, lengths, body)
+    else:
+        del deltas, lengths
+        presence = np.zeros(body.shape[0] * 8, dtype=bool)
+        presence[indices] = True
+        body[:] = np.packbits(presence, bitorder="little")
+    return stream
+
+
+def decode_indices(stream):
+    """Decode a stream produced by encode_indices.
+
+    Args:
+        stream: a bytes-like object.
+
+    Returns:
+        indices: ascending int64 numpy array.
+    """
+    stream = np.frombuffer(stream, dtype=np.uint8)
+    index_format = INDEX_FORMATS[stream[0]]
+    if index_format == "bitmap":
+        return np.flatnonzero(np.unpackbits(stream[1:], bitorder="little"))
+    return np.cumsum(_decode_varints(stream[1:]), dtype=np.uint64).astype(np.int64)
+
+
+def index_bits(n_elements, k):
+    """Expected bits per index of the shorter stream for k of n_elements indices.
+
+    Args:
+        n_elements (int): number of positions.
+        k: number of indices, a scalar or a numpy array.
+
+    Returns:
+        bits per index, as a float numpy array shaped like k.
+    """
+    gap = n_elements / np.maximum(np.asarray(k, dtype=np.float64), 1)
+    delta_bits = 8 * np.maximum(np.ceil(np.log2(gap + 1) / 7), 1)
+    return np.minimum(delta_bits, gap)
+
+
+def _deltas(indices):
+    """Gaps between consecutive indices, the first one relative to 0."""
+    deltas = np.empty_like(indices)
+    deltas[:1] = indices[:1]
+    np.subtract(indices[1:], indices[:-1], out=deltas[1:])
+    return deltas
+
+
+def _varint_lengths(values):
+    """Number of 7-bit groups of every value, at least one."""
+    lengths = np.ones(values.shape[0], dtype=np.uint8)
+    for shift in range(7, 64, 7):
+        lengths += values >= (np.uint64(1) << np.uint64(shift))
+    return lengths
+
+
+def _bitmap_nbytes(indices):
+    """Length of the bitmap stream of indices, without the tag."""
+    if indices.shape[0] == 0:
+        return 0
+    return (int(indices[-1]) + 8) // 8
+
+
+def _encode_varints(values, lengths, stream):
+    """Encode unsigned 64-bit values as LEB128 varints into a preallocated stream."""
+    starts = np.cumsum(lengths, dtype=np.int64)
+    starts -= lengths
+    for group in range(int(lengths.max(initial=0))):
+        if group:
+            selected = np.flatnonzero(lengths > group)
+            group_values, group_lengths = values[selected], lengths[selected]
+            positions = starts[selected] + group
+        else:
+            group_values, group_lengths, positions = values, lengths, starts
+        group_bytes = (group_values >> np.uint64(7 * group)).astype(np.uint8) & 0x7F
+        group_bytes |= (group_lengths > group + 1).astype(np.uint8) << 7
+        stream[positions] = group_bytes
+
+
+def _decode_varints(stream):
+    """Decode a LEB128 varint stream into unsigned 64-bit values."""
+    if stream.shape[0] == 0:
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero(stream < 0x80) + 1
+    starts = np.concatenate([[0], ends[:-1]])
+    groups = np.arange(stream.shape[0]) - np.repeat(starts, ends - starts)
+    payload = (stream & 0x7F).astype(np.uint64) << (7 * groups).astype(np.uint64)
+    return np.add.reduceat(payload, starts)
@@ -0,0 +1,202 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Pipeline instrumentation module.
+
+A PipelineRecorder attached to an SKCPipeline receives one record per
+transformer stage and per tensor, in both directions, with the wall and CPU
+time, the input and output bytes and, optionally, the relative squared error
+of the lossy stages. Pipelines without a recorder skip every measurement.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+# stage name of the records covering a whole tensor
+PIPELINE_STAGE = "pipeline"
+
+
+class PipelineRecorder:
+    """Collect per-stage timings and byte counts of a pipeline.
+
+    Records are dictionaries with the keys tensor_name, stage, direction
+    ('forward' or 'backward'), wall_seconds, cpu_seconds, input_bytes,
+    output_bytes and relative_error (None when not measured). Hooks are
+    called with every record as it is made. flush tags the pending records
+    with a round number, appends them to path as JSON lines and returns
+    their summary, so a task runner or aggregator can call it once per round:
+
+        compression_pipeline :
+          template : openfl_contrib.pipelines.SKCPipeline
+          settings :
+            instrumentation :
+              path          : logs/skc_stages.jsonl
+              measure_error : true
+
+    CPU time is the one of the whole process, so stages running concurrently
+    on several threads share it.
+
+    Attributes:
+        path (str): JSON lines file written by flush, None to keep records
+            in memory only.
+        measure_error (bool): decode the output of lossy stages again to
+            measure their relative squared error.
+    """
+
+    def __init__(self, path=None, measure_error=False, hooks=()):
+        """Initialize.
+
+        Args:
+            path (str): JSON lines file written by flush (Default=None)
+            measure_error (bool): measure the relative squared error of lossy
+                stages, at the cost of decoding them (Default=False)
+            hooks: callables receiving every record (Default=())
+        """
+        self.path = path
+        self.measure_error = measure_error
+        self._hooks = list(hooks)
+        self._records = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Pickle the recorder settings only, e.g. for worker processes."""
+        return {"path": self.path, "measure_error": self.measure_error}
+
+    def __setstate__(self, state):
+        """Restore a pickled recorder without records or hooks."""
+        self.__init__(**state)
+
+    def add_hook(self, hook):
+        """Call hook with every new record.
+
+        Args:
+            hook: callable taking a record dictionary.
+        """
+        self._hooks.append(hook)
+
+    @contextmanager
+    def measure(self, tensor_name, stage, direction, data):
+        """Time the block it wraps and record it.
+
+        The block sets the 'output' key of the yielded dictionary to its
+        output, and may set 'error' to a callable returning the relative
+        error of the stage. It is called after the clocks stop, and only
+        with measure_error.
+
+        Args:
+            tensor_name (str): name of the tensor, or None.
+            stage (str): name of the stage.
+            direction (str): 'forward' or 'backward'.
+            data: input of the stage.
+
+        Yields:
+            result: dictionary receiving the output of the stage.
+        """
+        result = {}
+        wall, cpu = time.perf_counter(), time.process_time()
+        yield result
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        error = None
+        if self.measure_error and "error" in result:
+            error = result["error"]()
+        self.record(
+            tensor_name=tensor_name,
+            stage=stage,
+            direction=direction,
+            wall_seconds=wall,
+            cpu_seconds=cpu,
+            input_bytes=nbytes(data),
+            output_bytes=nbytes(result.get("output")),
+            relative_error=error,
+        )
+
+    def record(self, **fields):
+        """Store a record and pass it to the hooks.
+
+        Args:
+            **fields: fields of the record.
+        """
+        with self._lock:
+            self._records.append(fields)
+        for hook in self._hooks:
+            hook(fields)
+
+    def records(self):
+        """Return a copy of the pending records."""
+        with self._lock:
+            return list(self._records)
+
+    def flush(self, round_number=None):
+        """Write the pending records to path, clear them and summarize them.
+
+        Args:
+            round_number (int): round the records are tagged with
+                (Default=None)
+
+        Returns:
+            summary: the summary of the flushed records.
+        """
+        with self._lock:
+            records, self._records = self._records, []
+        records = [dict(record, round=round_number) for record in records]
+        if self.path is not None and records:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+        return summarize(records)
+
+
+def summarize(records):
+    """Total the records of every stage and direction.
+
+    Args:
+        records: list of record dictionaries.
+
+    Returns:
+        dictionary from 'stage/direction' to the count, the summed times and
+        bytes, and the mean relative error of the records that measured it.
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    errors = defaultdict(list)
+    for record in records:
+        key = f"{record['stage']}/{record['direction']}"
+        total = totals[key]
+        total["count"] += 1
+        for field in ("wall_seconds", "cpu_seconds", "input_bytes", "output_bytes"):
+            total[field] += record[field]
+        if record.get("relative_error") is not None:
+            errors[key].append(record["relative_error"])
+    summary = {}
+    for key, total in totals.items():
+        summary[key] = dict(total, count=int(total["count"]))
+        summary[key]["relative_error"] = float(np.mean(errors[key])) if errors[key] else None
+    return summary
+
+
+def nbytes(data):
+    """Size in bytes of a stage input or output, 0 when unknown."""
+    if hasattr(data, "indices") and hasattr(data, "values"):
+        return nbytes(data.indices) + nbytes(data.values)
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return memoryview(data).nbytes
+    return 0
+
+
+def relative_error(data, recovered):
+    """||x - x_hat||^2 / ||x||^2 of two arrays, or of the values of two sparse tensors."""
+    if hasattr(data, "values"):
+        data, recovered = data.values, recovered.values
+    data = np.asarray(data, dtype=np.float64).ravel()
+    error = data - np.asarray(recovered, dtype=np.float64).ravel()
+    energy = float(np.dot(data, data))
+    return float(np.dot(error, error)) / energy if energy else 0.0
@@ -0,0 +1,129 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Per-tensor compression policy module."""
+
+from fnmatch import fnmatchcase
+from typing import NamedTuple
+
+import numpy as np
+
+# "passthrough" sends the raw bytes, "lossless" sends them through the codec
+# only, "skc" runs the full sparsity / k-means pipeline and "pq" sends dense
+# product quantization codes through the codec
+ROUTES = ("passthrough", "lossless", "skc", "pq")
+
+
+class PolicyRule(NamedTuple):
+    """A rule routing the tensors it matches.
+
+    Every condition set must hold for the rule to match. A rule without
+    conditions matches every tensor.
+
+    Attributes:
+        route: one of ROUTES.
+        pattern: fnmatch pattern of the tensor name, e.g. '*.bias'. Never
+            matches tensors compressed without a name.
+        min_elements: minimal element count, inclusive.
+        max_elements: maximal element count, inclusive.
+        dtypes: dtype names, e.g. ('int64', 'float16').
+    """
+
+    route: str
+    pattern: str = None
+    min_elements: int = None
+    max_elements: int = None
+    dtypes: tuple = None
+
+    def matches(self, tensor_name, data):
+        """Check whether the rule applies to a tensor.
+
+        Args:
+            tensor_name (str): name of the tensor, or None.
+            data: a numpy array.
+
+        Returns:
+            True when every condition of the rule holds.
+        """
+        if self.pattern is not None and (
+            tensor_name is None or not fnmatchcase(tensor_name, self.pattern)
+        ):
+            return False
+        n_elements = np.size(data)
+        if self.min_elements is not None and n_elements < self.min_elements:
+            return False
+        if self.max_elements is not None and n_elements > self.max_elements:
+            return False
+        if self.dtypes is not None and np.asarray(data).dtype.name not in self.dtypes:
+            return False
+        return True
+
+
+class CompressionPolicy:
+    """Route every tensor to passthrough, lossless-only, full SKC or product quantization.
+
+    Rules are checked in order and the first matching one decides. Tensors
+    matching no rule take the default route. Rules are plain dictionaries
+    with the PolicyRule fields, so they can be written in the
+    compression_pipeline settings of plan.yaml:
+
+        compression_pipeline :
+          template : openfl_contrib.pipelines.SKCPipeline
+          settings :
+            policy :
+              - route        : passthrough
+                dtypes       : [int64]
+              - route        : lossless
+                max_elements : 4096
+              - route        : pq
+                pattern      : 'fc1.weight'
+
+    Attributes:
+        rules (list): the PolicyRule list.
+        default (str): route of the tensors matching no rule.
+    """
+
+    def __init__(self, rules=(), default="skc"):
+        """Initialize.
+
+        Args:
+            rules: PolicyRule objects or dictionaries of their fields
+                (Default=())
+            default (str): route of the tensors matching no rule
+                (Default='skc')
+        """
+        self.rules = [rule if isinstance(rule, PolicyRule) else _make_rule(rule) for rule in rules]
+        if default not in ROUTES:
+            raise ValueError(f"Unknown route '{default}', expected one of {ROUTES}")
+        self.default = default
+
+    def route(self, tensor_name, data):
+        """Select the route of a tensor.
+
+        Args:
+            tensor_name (str): name of the tensor, or None.
+            data: a numpy array.
+
+        Returns:
+            route: one of ROUTES.
+        """
+        for rule in self.rules:
+            if rule.matches(tensor_name, data):
+                return rule.route
+        return self.default
+
+
+def _make_rule(settings):
+    """Build a PolicyRule from a dictionary of plan settings."""
+    unknown = set(settings) - set(PolicyRule._fields)
+    if unknown:
+        raise ValueError(f"Unknown policy rule fields {sorted(unknown)}")
+    if settings.get("route") not in ROUTES:
+        raise ValueError(f"Unknown route '{settings.get('route')}', expected one of {ROUTES}")
+    settings = dict(settings)
+    dtypes = settings.get("dtypes")
+    if dtypes is not None:
+        if isinstance(dtypes, str):
+            dtypes = [dtypes]
+        settings["dtypes"] = tuple(np.dtype(dtype).name for dtype in dtypes)
+    return PolicyRule(**settings)
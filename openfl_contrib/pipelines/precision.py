@@ -0,0 +1,68 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Reduced-precision value encoding module.
+
+numpy has no bfloat16 dtype, so bfloat16 values are carried as the upper
+16 bits of their float32 representation in a uint16 array. float16 overflows
+to inf above 65504, while bfloat16 keeps the float32 range with an 8-bit
+mantissa.
+"""
+
+import numpy as np
+
+VALUE_DTYPES = ("float32", "float16", "bfloat16")
+
+
+def encode_values(x, value_dtype="float32"):
+    """Encode float values in the transport dtype.
+
+    Args:
+        x: a numpy array of floats.
+        value_dtype (str): one of VALUE_DTYPES (Default='float32').
+
+    Returns:
+        encoded: float32 or float16 array, or uint16 array of bfloat16 bits.
+    """
+    if value_dtype not in VALUE_DTYPES:
+        raise ValueError(f"Unknown value dtype '{value_dtype}', expected one of {VALUE_DTYPES}")
+    if value_dtype == "bfloat16":
+        return _to_bfloat16(x)
+    return np.asarray(x).astype(value_dtype, copy=False)
+
+
+def decode_values(encoded, value_dtype="float32"):
+    """Promote values encoded by encode_values back to float32.
+
+    Args:
+        encoded: array returned by encode_values.
+        value_dtype (str): one of VALUE_DTYPES (Default='float32').
+
+    Returns:
+        values: float32 numpy array.
+    """
+    if value_dtype == "bfloat16":
+        return (encoded.astype(np.uint32) << 16).view(np.float32)
+    return encoded.astype(np.float32, copy=False)
+
+
+def round_values(x, value_dtype="float32"):
+    """Round float values to the nearest value representable in the transport dtype.
+
+    Args:
+        x: a numpy array of floats.
+        value_dtype (str): one of VALUE_DTYPES (Default='float32').
+
+    Returns:
+        values: float32 numpy array.
+    """
+    return decode_values(encode_values(np.asarray(x, dtype=np.float32), value_dtype), value_dtype)
+
+
+def _to_bfloat16(x):
+    """Round float32 values to bfloat16 bits, to nearest even."""
+    bits = np.ascontiguousarray(x, dtype=np.float32).view(np.uint32)
+    rounded = (bits + (0x7FFF + ((bits >> 16) & 1))) >> 16
+    # keep NaNs quiet NaNs instead of letting the rounding carry into inf
+    rounded = np.where(np.isnan(x), 0x7FC0, rounded)
+    return rounded.astype(np.uint16)
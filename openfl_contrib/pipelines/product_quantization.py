@@ -0,0 +1,130 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Product quantization module.
+
+A flat tensor is cut into vectors of n_subspaces * subvector_size consecutive
+elements, and every vector into n_subspaces sub-vectors. Each subspace gets its
+own codebook, learnt by k-means over the sub-vectors of that position, and each
+sub-vector is replaced by the code of its nearest codeword. With 256 codewords
+a sub-vector costs one byte, i.e. 8 / subvector_size bits per element.
+"""
+
+import numpy as np
+
+
+def pq_split(x, subvector_size, n_subspaces=1):
+    """Cut a flat array into sub-vectors, zero padding the last vector.
+
+    Args:
+        x: a flat numpy array.
+        subvector_size (int): number of elements of a sub-vector.
+        n_subspaces (int): number of sub-vectors per vector (Default=1).
+
+    Returns:
+        vectors: float32 array shaped (n_subspaces, n_vectors, subvector_size).
+    """
+    vector_size = subvector_size * n_subspaces
+    n_vectors = -(-x.shape[0] // vector_size)
+    padded = np.zeros(n_vectors * vector_size, dtype=np.float32)
+    padded[: x.shape[0]] = x
+    return padded.reshape(n_vectors, n_subspaces, subvector_size).transpose(1, 0, 2)
+
+
+def pq_merge(vectors, n_elements):
+    """Invert pq_split.
+
+    Args:
+        vectors: array shaped (n_subspaces, n_vectors, subvector_size).
+        n_elements (int): number of elements of the flat array.
+
+    Returns:
+        x: flat float32 array of n_elements elements.
+    """
+    return np.ascontiguousarray(vectors.transpose(1, 0, 2), dtype=np.float32).reshape(-1)[
+        :n_elements
+    ]
+
+
+def pq_fit(vectors, n_codewords, n_iter=10, seed=0):
+    """Fit one k-means codebook per subspace with batched Lloyd iterations.
+
+    Codewords start from a k-means++ draw of the sub-vectors. Codewords left
+    without sub-vectors keep their previous position.
+
+    Args:
+        vectors: float32 array shaped (n_subspaces, n_vectors, subvector_size).
+        n_codewords (int): number of codewords per subspace, at most n_vectors.
+        n_iter (int): number of Lloyd iterations (Default=10).
+        seed (int): seed of the initial codewords (Default=0).
+
+    Returns:
+        codebooks: float32 array shaped (n_subspaces, n_codewords, subvector_size).
+    """
+    n_subspaces, n_vectors, subvector_size = vectors.shape
+    codebooks = _kmeans_plus_plus(vectors, n_codewords, np.random.default_rng(seed))
+    # offsets making the labels of all subspaces distinct for a single bincount
+    offsets = (np.arange(n_subspaces) * n_codewords)[:, None]
+    for _ in range(n_iter):
+        labels = pq_assign(vectors, codebooks) + offsets
+        counts = np.bincount(labels.ravel(), minlength=n_subspaces * n_codewords)
+        sums = np.stack(
+            [
+                np.bincount(
+                    labels.ravel(), weights=vectors[..., i].ravel(), minlength=counts.shape[0]
+                )
+                for i in range(subvector_size)
+            ],
+            axis=-1,
+        )
+        filled = counts > 0
+        flat_codebooks = codebooks.reshape(-1, subvector_size)
+        flat_codebooks[filled] = sums[filled] / counts[filled, None]
+    return codebooks
+
+
+def pq_assign(vectors, codebooks, block_size=8192):
+    """Find the nearest codeword of every sub-vector.
+
+    Distances are ranked by |c|^2 / 2 - x.c, batched over all subspaces with
+    one matrix product per block of block_size vectors.
+
+    Args:
+        vectors: array shaped (n_subspaces, n_vectors, subvector_size).
+        codebooks: array shaped (n_subspaces, n_codewords, subvector_size).
+        block_size (int): number of vectors per block, bounding the distance
+            matrix to n_subspaces * block_size * n_codewords floats
+            (Default=8192).
+
+    Returns:
+        labels: int64 array shaped (n_subspaces, n_vectors).
+    """
+    codebooks = np.asarray(codebooks, dtype=np.float32)
+    half_norms = 0.5 * np.einsum("mkd,mkd->mk", codebooks, codebooks)[:, None, :]
+    codewords_t = codebooks.transpose(0, 2, 1)
+    labels = np.empty(vectors.shape[:2], dtype=np.int64)
+    for start in range(0, vectors.shape[1], block_size):
+        block = vectors[:, start : start + block_size]
+        distances = half_norms - np.matmul(block, codewords_t)
+        labels[:, start : start + block_size] = distances.argmin(axis=-1)
+    return labels
+
+
+def _kmeans_plus_plus(vectors, n_codewords, rng):
+    """Draw initial codewords far apart, with probability proportional to D^2."""
+    n_subspaces, n_vectors, _ = vectors.shape
+    subspaces = np.arange(n_subspaces)
+    chosen = rng.integers(n_vectors, size=n_subspaces)
+    codebooks = np.empty((n_subspaces, n_codewords, vectors.shape[2]), dtype=np.float32)
+    codebooks[:, 0] = vectors[subspaces, chosen]
+    distances = np.full((n_subspaces, n_vectors), np.inf, dtype=np.float32)
+    for k in range(1, n_codewords):
+        offsets = vectors - codebooks[:, k - 1, None]
+        np.minimum(distances, np.einsum("mnd,mnd->mn", offsets, offsets), out=distances)
+        cumulative = np.cumsum(distances, axis=1, dtype=np.float64)
+        targets = rng.random(n_subspaces) * cumulative[:, -1]
+        chosen = [np.searchsorted(cumulative[m], targets[m], side="right") for m in subspaces]
+        # all remaining vectors duplicate a codeword when the total distance is zero
+        chosen = np.minimum(chosen, n_vectors - 1)
+        codebooks[:, k] = vectors[subspaces, chosen]
+    return codebooks
@@ -0,0 +1,281 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Scalar quantization module."""
+
+import numpy as np
+
+
+def kmeans_1d(x, n_clusters, n_candidates=512, max_iter=50):
+    """Fit a k-means codebook to one-dimensional data.
+
+    Optimal 1-D k-means clusters are contiguous runs of the sorted data, so the
+    codebook is found by dynamic programming over the cut positions of the
+    sorted array, using prefix sums to price each segment. When the data holds
+    more distinct values than n_candidates, the cuts are restricted to a grid of
+    quantile and uniform positions and the result is refined with Lloyd
+    iterations on the exact data.
+
+    Args:
+        x: a numpy array.
+        n_clusters (int): number of centroids.
+        n_candidates (int): maximum number of candidate cut positions searched
+            by the dynamic program (Default=512).
+        max_iter (int): maximum number of Lloyd refinement iterations
+            (Default=50).
+
+    Returns:
+        centroids: ascending float64 array with at most n_clusters entries.
+    """
+    xs = np.asarray(x, dtype=np.float64).ravel()
+    # sort a private copy in place
+    xs = xs.copy() if np.may_share_memory(xs, x) else xs
+    xs.sort()
+    n_elements = xs.shape[0]
+    changes = np.flatnonzero(xs[1:] != xs[:-1]) + 1
+    if changes.shape[0] < n_clusters:
+        return np.unique(xs)
+    exact = changes.shape[0] <= n_candidates
+    if exact:
+        cuts = changes
+    else:
+        n_grid = n_candidates // 2 + 1
+        quantile_cuts = np.linspace(0, n_elements, n_grid).astype(np.int64)
+        uniform_cuts = np.searchsorted(xs, np.linspace(xs[0], xs[-1], n_grid))
+        cuts = np.unique(np.concatenate([quantile_cuts, uniform_cuts]))
+        cuts = cuts[(cuts > 0) & (cuts < n_elements)]
+    # center the data in place to keep the prefix-sum costs well conditioned
+    shift = xs[n_elements // 2]
+    xs -= shift
+    s1 = np.zeros(n_elements + 1)
+    np.cumsum(xs, out=s1[1:])
+    s2 = np.zeros(n_elements + 1)
+    np.cumsum(np.square(xs), out=s2[1:])
+    positions = np.concatenate([[0], cuts, [n_elements]])
+    bounds = _optimal_segments(positions, s1, s2, n_clusters)
+    if not exact:
+        bounds = _lloyd_segments(xs, bounds, s1, max_iter)
+    return _segment_means(bounds, s1) + shift
+
+
+def assign_1d(x, centroids):
+    """Assign every element of x to its nearest centroid.
+
+    Args:
+        x: a numpy array.
+        centroids: ascending numpy array of centroids.
+
+    Returns:
+        labels: int64 array with the index of the nearest centroid.
+    """
+    midpoints = (centroids[1:] + centroids[:-1]) / 2
+    return np.searchsorted(midpoints, x, side="left")
+
+
+def lloyd_step_1d(x, centroids):
+    """Refine a codebook with a single Lloyd iteration.
+
+    Elements are assigned to their nearest centroid, and every centroid moves
+    to the mean of its elements. Centroids left without elements keep their
+    position. The labels are those of the assignment step, which the moved
+    centroids decode with no more error than the input codebook.
+
+    Args:
+        x: a flat numpy array.
+        centroids: ascending numpy array of centroids.
+
+    Returns:
+        centroids: the refined ascending float64 centroids.
+        labels: int64 array with the index of the refined centroid of every element.
+        distortion: mean squared error of the labels under the refined codebook.
+    """
+    labels = assign_1d(x, centroids)
+    counts = np.bincount(labels, minlength=centroids.shape[0])
+    sums = np.bincount(labels, weights=x, minlength=centroids.shape[0])
+    means = sums / np.maximum(counts, 1)
+    centroids = np.where(counts > 0, means, centroids)
+    if np.any(np.diff(centroids) < 0):
+        order = np.argsort(centroids, kind="stable")
+        centroids = centroids[order]
+        labels = np.argsort(order)[labels]
+    if x.shape[0] == 0:
+        return centroids, labels, 0.0
+    x = np.asarray(x, dtype=np.float64)
+    # total squared error around the cluster means
+    squared_error = np.dot(x, x) - np.dot(counts, means**2)
+    return centroids, labels, max(float(squared_error), 0.0) / x.shape[0]
+
+
+def stochastic_quantize(x, levels, block_size=None, rng=None):
+    """Quantize x to a uniform grid with unbiased stochastic rounding (QSGD).
+
+    Every element is scaled by the largest magnitude of its block to
+    [-levels, levels] and rounded up with probability equal to its fractional
+    part, so the decoded value equals x in expectation.
+
+    Args:
+        x: a flat numpy array.
+        levels (int): number of positive levels.
+        block_size (int): number of consecutive elements sharing a scale,
+            None for a single scale (Default=None).
+        rng: numpy Generator drawing the rounding (Default=None, unseeded).
+
+    Returns:
+        codes: unsigned codes in [0, 2 * levels], level + levels.
+        scales: float32 array with the largest magnitude of every block.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    x = np.asarray(x, dtype=np.float32)
+    magnitude = np.abs(x)
+    if block_size:
+        n_blocks = -(-x.shape[0] // block_size)
+        padded = np.zeros(n_blocks * block_size, dtype=np.float32)
+        padded[: x.shape[0]] = magnitude
+        scales = padded.reshape(n_blocks, block_size).max(axis=1)
+        del padded
+        block_scales = np.repeat(scales, block_size)[: x.shape[0]]
+    else:
+        scales = np.array([magnitude.max(initial=0.0)], dtype=np.float32)
+        block_scales = scales[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        magnitude *= levels / block_scales
+    np.nan_to_num(magnitude, copy=False, nan=0.0)
+    floor = np.floor(magnitude)
+    magnitude -= floor
+    floor += rng.random(x.shape[0], dtype=np.float32) < magnitude
+    np.minimum(floor, levels, out=floor)
+    codes = np.where(x < 0, levels - floor, levels + floor)
+    return codes.astype(code_dtype(2 * levels + 1)), scales
+
+
+def dequantize_uniform(codes, scales, levels, block_size=None):
+    """Decode codes produced by stochastic_quantize.
+
+    Args:
+        codes: unsigned codes in [0, 2 * levels].
+        scales: float32 array with the scale of every block.
+        levels (int): number of positive levels.
+        block_size (int): number of consecutive elements sharing a scale,
+            None for a single scale (Default=None).
+
+    Returns:
+        values: float32 numpy array.
+    """
+    steps = np.asarray(scales, dtype=np.float32) / np.float32(levels)
+    if block_size:
+        steps = np.repeat(steps, block_size)[: codes.shape[0]]
+    values = codes.astype(np.float32)
+    values -= levels
+    values *= steps
+    return values
+
+
+SAMPLE_METHODS = ("random", "stratified")
+
+
+def sample_1d(x, sample_size, method="random", seed=0):
+    """Draw a bounded sample of a flat array to fit a codebook on.
+
+    Args:
+        x: a flat numpy array.
+        sample_size (int): number of sampled elements.
+        method (str): 'random' draws uniformly without replacement,
+            'stratified' draws one element from each of sample_size equal
+            runs of x (Default='random').
+        seed (int): seed of the draw (Default=0).
+
+    Returns:
+        sample: numpy array of min(sample_size, len(x)) elements of x.
+    """
+    if method not in SAMPLE_METHODS:
+        raise ValueError(f"Unknown sample method '{method}', expected one of {SAMPLE_METHODS}")
+    n_elements = x.shape[0]
+    if n_elements <= sample_size:
+        return x
+    rng = np.random.default_rng(seed)
+    if method == "random":
+        return x[rng.choice(n_elements, sample_size, replace=False)]
+    starts = np.arange(sample_size, dtype=np.int64) * n_elements // sample_size
+    widths = np.diff(np.append(starts, n_elements))
+    return x[starts + (rng.random(sample_size) * widths).astype(np.int64)]
+
+
+def code_dtype(n_codes):
+    """Select the narrowest unsigned integer dtype able to hold n_codes codes.
+
+    Args:
+        n_codes (int): number of distinct codes.
+
+    Returns:
+        dtype: np.uint8, np.uint16 or np.uint32.
+    """
+    for dtype in (np.uint8, np.uint16):
+        if n_codes <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint32
+
+
+def _segment_means(bounds, s1):
+    """Mean of every sorted segment delimited by consecutive bounds."""
+    return (s1[bounds[1:]] - s1[bounds[:-1]]) / (bounds[1:] - bounds[:-1])
+
+
+def _optimal_segments(positions, s1, s2, n_clusters):
+    """Split the sorted data into n_clusters segments of minimal squared error.
+
+    Args:
+        positions: ascending candidate cut positions, starting with 0 and
+            ending with the number of elements.
+        s1: prefix sums of the sorted data.
+        s2: prefix sums of the squared sorted data.
+        n_clusters: number of segments.
+
+    Returns:
+        bounds: the n_clusters + 1 chosen positions.
+    """
+    p_sum = s1[positions]
+    p_sq = s2[positions]
+    count = positions[None, :] - positions[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # cost[i, j]: squared error of the segment between positions i and j
+        seg_sum = p_sum[None, :] - p_sum[:, None]
+        cost = (p_sq[None, :] - p_sq[:, None]) - seg_sum**2 / count
+    cost[count <= 0] = np.inf
+    np.maximum(cost, 0.0, out=cost, where=np.isfinite(cost))
+
+    best = cost[0]
+    backtrack = []
+    for _ in range(n_clusters - 1):
+        total = best[:, None] + cost
+        arg = np.argmin(total, axis=0)
+        backtrack.append(arg)
+        best = total[arg, np.arange(total.shape[1])]
+
+    bounds = [positions.shape[0] - 1]
+    for arg in reversed(backtrack):
+        bounds.append(arg[bounds[-1]])
+    bounds.append(0)
+    return positions[np.asarray(bounds[::-1])]
+
+
+def _lloyd_segments(xs, bounds, s1, max_iter):
+    """Refine segment bounds of the sorted data with Lloyd iterations.
+
+    Args:
+        xs: the sorted data.
+        bounds: initial segment bounds.
+        s1: prefix sums of the sorted data.
+        max_iter: maximum number of iterations.
+
+    Returns:
+        bounds: the refined segment bounds.
+    """
+    for _ in range(max_iter):
+        centroids = _segment_means(bounds, s1)
+        midpoints = (centroids[1:] + centroids[:-1]) / 2
+        new_bounds = bounds.copy()
+        new_bounds[1:-1] = np.searchsorted(xs, midpoints, side="right")
+        if np.any(np.diff(new_bounds) <= 0) or np.array_equal(new_bounds, bounds):
+            break
+        bounds = new_bounds
+    return bounds
@@ -0,0 +1,306 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Rate-distortion control module."""
+
+import numpy as np
+
+from openfl_contrib.pipelines.index_coding import index_bits
+
+P_GRID = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+CLUSTER_GRID = (2, 4, 8, 16, 32, 64, 256)
+
+
+class RateController:
+    """Choose p_sparsity and n_clusters per tensor for SKC compression.
+
+    The controller either meets a byte budget per round while minimizing the
+    total squared error, or meets a relative distortion target per tensor
+    with as few bytes as possible. Rate and distortion of every (p, K) setting
+    are estimated from a sample of the tensor magnitudes and scaled by the
+    ratios of observed to predicted bytes and error of the tensor's previous
+    rounds.
+
+    Tensors compressed one at a time, as by the collaborator, share the byte
+    budget of their round: every choice splits the bytes left in the round
+    among the current tensor and the ones the previous round still had to
+    send. Tensors without a name are told apart by their position in the
+    round. A round ends when a name comes again, or, without names, after as
+    many tensors as the previous round, the first round ending when the shape
+    of its first tensor comes again. The budget is only met once a full round
+    has been seen.
+
+    Attributes:
+        byte_budget (int): payload bytes per round.
+        distortion_target (float): relative squared error per tensor.
+    """
+
+    def __init__(
+        self,
+        byte_budget=None,
+        distortion_target=None,
+        p_grid=P_GRID,
+        cluster_grid=CLUSTER_GRID,
+        sample_size=1 << 16,
+        smoothing=0.5,
+        seed=0,
+    ):
+        """Initialize.
+
+        Args:
+            byte_budget (int): payload bytes per round (Default=None)
+            distortion_target (float): relative squared error per tensor,
+                ||x - x_hat||^2 / ||x||^2 (Default=None)
+            p_grid (tuple): candidate sparsity ratios (Default=P_GRID)
+            cluster_grid (tuple): candidate cluster counts (Default=CLUSTER_GRID)
+            sample_size (int): number of elements sampled for the statistics
+                (Default=65536)
+            smoothing (float): weight of the previous error correction when a
+                new observation arrives (Default=0.5)
+            seed (int): seed of the sampling (Default=0)
+        """
+        if (byte_budget is None) == (distortion_target is None):
+            raise ValueError("Exactly one of byte_budget and distortion_target must be set")
+        self.byte_budget = byte_budget
+        self.distortion_target = distortion_target
+        self.p_grid = np.asarray(p_grid, dtype=np.float64)
+        self.cluster_grid = np.asarray(cluster_grid, dtype=np.int64)
+        self.sample_size = sample_size
+        self.smoothing = smoothing
+        self.seed = seed
+        self._sizes = {}
+        self._plan = {}
+        self._predicted = {}
+        self._correction = {}
+        self._byte_correction = {}
+        # (key, shape) of the tensors chosen one at a time in this round and the previous one
+        self._round = []
+        self._previous_round = None
+        # key -> bytes of the current round, predicted then observed
+        self._round_bytes = {}
+        # key -> rate-distortion options of the last choice
+        self._options_cache = {}
+
+    def plan(self, tensor_dict):
+        """Choose the settings of every tensor of a round.
+
+        Args:
+            tensor_dict: dictionary from tensor names to numpy arrays.
+
+        Returns:
+            dictionary from tensor names to (p_sparsity, n_clusters) tuples.
+        """
+        options = {}
+        for name, data in tensor_dict.items():
+            self._sizes[name] = np.size(data)
+            options[name] = self._options(data, name)
+        if self.byte_budget is None:
+            choices = {name: self._target_choice(*opt) for name, opt in options.items()}
+        else:
+            choices = _allocate(options, self.byte_budget)
+        self._plan = {}
+        for name, (bytes_, distortion, energy) in options.items():
+            i, j = choices[name]
+            self._record(name, bytes_[i, j], distortion[i, j])
+            self._plan[name] = (float(self.p_grid[i]), int(self.cluster_grid[j]))
+        return dict(self._plan)
+
+    def choose(self, tensor_name, data):
+        """Choose the settings of a single tensor.
+
+        Settings planned for the tensor in this round are reused. Otherwise the
+        bytes left in the round are allocated among this tensor and the ones
+        of the previous round not sent yet, using their last options. In the
+        first round, the tensor gets a share of the byte budget proportional
+        to its size among the tensors seen so far.
+
+        Args:
+            tensor_name (str): name of the tensor, or None.
+            data: a numpy array.
+
+        Returns:
+            p_sparsity, n_clusters
+        """
+        if tensor_name in self._plan and self._sizes.get(tensor_name) == np.size(data):
+            return self._plan[tensor_name]
+        key = self._advance(tensor_name, np.shape(data))
+        self._sizes[key] = np.size(data)
+        options = self._options(data, key)
+        bytes_, distortion, energy = options
+        if self.byte_budget is None:
+            i, j = self._target_choice(bytes_, distortion, energy)
+        elif self._previous_round is None:
+            total_size = max(sum(self._sizes.values()), np.size(data))
+            share = self.byte_budget * np.size(data) / total_size
+            i, j = _allocate({key: options}, share)[key]
+        else:
+            sent = {round_key for round_key, _ in self._round}
+            pending = {
+                round_key: self._options_cache[round_key]
+                for round_key, _ in self._previous_round
+                if round_key not in sent and round_key in self._options_cache
+            }
+            pending[key] = options
+            bytes_left = max(self.byte_budget - sum(self._round_bytes.values()), 0.0)
+            i, j = _allocate(pending, bytes_left)[key]
+        self._options_cache[key] = options
+        self._round_bytes[key] = float(bytes_[i, j])
+        self._record(key, bytes_[i, j], distortion[i, j])
+        return float(self.p_grid[i]), int(self.cluster_grid[j])
+
+    def update(self, tensor_name, observed_distortion, observed_bytes=None):
+        """Report the outcome of the last choice of a tensor.
+
+        Args:
+            tensor_name (str): name of the tensor, None for the tensor of the
+                last choice when it had no name.
+            observed_distortion (float): ||x - x_hat||^2 / ||x||^2.
+            observed_bytes (int): payload size, or None (Default=None).
+        """
+        if tensor_name is None and self._round:
+            tensor_name = self._round[-1][0]
+        if tensor_name not in self._predicted:
+            return
+        predicted_bytes, predicted_distortion = self._predicted[tensor_name]
+        if predicted_distortion > 0:
+            self._smooth(self._correction, tensor_name, observed_distortion / predicted_distortion)
+        if observed_bytes is not None:
+            self._smooth(self._byte_correction, tensor_name, observed_bytes / predicted_bytes)
+            if tensor_name in self._round_bytes:
+                self._round_bytes[tensor_name] = float(observed_bytes)
+
+    def _advance(self, tensor_name, shape):
+        """Add a tensor to the current round, starting a new round first when it ends.
+
+        Returns:
+            key: the name of the tensor, or its position in the round.
+        """
+        if self._round and self._round_ended(tensor_name, shape):
+            self._previous_round = self._round
+            self._round = []
+            self._round_bytes = {}
+        key = tensor_name if tensor_name is not None else f"#{len(self._round)}"
+        self._round.append((key, shape))
+        return key
+
+    def _round_ended(self, tensor_name, shape):
+        """Check whether a tensor belongs to the next round."""
+        if tensor_name is not None:
+            return any(key == tensor_name for key, _ in self._round)
+        if self._previous_round is not None:
+            return len(self._round) >= len(self._previous_round)
+        return shape == self._round[0][1]
+
+    def _smooth(self, corrections, tensor_name, ratio):
+        """Blend a new observed/predicted ratio into the correction of a tensor.
+
+        Predictions already include the previous correction, so the ratio
+        rescales it rather than replacing it.
+        """
+        previous = corrections.get(tensor_name, 1.0)
+        target = np.clip(previous * ratio, 1e-3, 1e3)
+        corrections[tensor_name] = self.smoothing * previous + (1 - self.smoothing) * target
+
+    def _record(self, tensor_name, bytes_, distortion):
+        """Remember the predicted bytes and relative error of the last choice."""
+        if tensor_name is not None:
+            self._predicted[tensor_name] = (float(bytes_), float(distortion))
+
+    def _target_choice(self, bytes_, distortion, energy):
+        """Cheapest setting meeting the distortion target, or the most accurate one."""
+        feasible = distortion <= self.distortion_target
+        if not feasible.any():
+            return np.unravel_index(np.argmin(distortion), distortion.shape)
+        return np.unravel_index(np.argmin(np.where(feasible, bytes_, np.inf)), bytes_.shape)
+
+    def _options(self, data, tensor_name):
+        """Estimate payload bytes and relative distortion of the whole grid.
+
+        Returns:
+            bytes_: (len(p_grid), len(cluster_grid)) estimated payload bytes.
+            distortion: matching estimated relative squared errors.
+            energy: squared norm of the tensor.
+        """
+        flat = np.ravel(data)
+        n_elements = flat.shape[0]
+        if n_elements == 0:
+            # empty tensors cost nothing whatever the setting
+            empty = np.zeros((self.p_grid.shape[0], self.cluster_grid.shape[0]))
+            return empty, empty, 0.0
+        if n_elements > self.sample_size:
+            rng = np.random.default_rng(self.seed)
+            flat = flat[rng.choice(n_elements, self.sample_size, replace=False)]
+        values = flat.astype(np.float64)[np.argsort(-np.abs(flat), kind="stable")]
+        n_sample = values.shape[0]
+        s1 = np.cumsum(values)
+        s2 = np.cumsum(values**2)
+        energy_sample = max(s2[-1], np.finfo(np.float64).tiny)
+
+        m = np.maximum(np.ceil(self.p_grid * n_sample).astype(np.int64), 1)
+        kept_energy = s2[m - 1]
+        kept_var = kept_energy / m - (s1[m - 1] / m) ** 2
+        dropped = 1.0 - kept_energy / energy_sample
+        # quantization error of K levels on the kept values decays as 1 / K^2
+        k = np.ceil(self.p_grid * n_elements)[:, None]
+        clusters = self.cluster_grid[None, :]
+        quantized = np.where(
+            clusters >= k,
+            0.0,
+            kept_var[:, None] * m[:, None] / clusters**2 / energy_sample,
+        )
+        distortion = (dropped[:, None] + quantized) * self._correction.get(tensor_name, 1.0)
+
+        code_bits = np.maximum(np.ceil(np.log2(clusters)), 1)
+        bytes_ = k * (index_bits(n_elements, k) + code_bits) / 8 + 4 * clusters
+        bytes_ = bytes_ * self._byte_correction.get(tensor_name, 1.0)
+        energy = energy_sample * n_elements / n_sample
+        return bytes_, np.maximum(distortion, 0.0), energy
+
+
+def _allocate(options, byte_budget):
+    """Minimize the total squared error of a set of tensors under a byte budget.
+
+    Every tensor picks the setting minimizing distortion + lambda * bytes,
+    and lambda is bisected to the smallest value meeting the budget. The
+    bytes left by the gaps between the settings of the grid are then spent
+    on the upgrades removing the most error per byte that still fit.
+
+    Args:
+        options: dictionary from tensor names to (bytes_, distortion, energy).
+        byte_budget: total payload bytes.
+
+    Returns:
+        dictionary from tensor names to (p index, cluster index) tuples.
+    """
+    names = list(options)
+    grid_shape = options[names[0]][0].shape
+    bytes_ = np.stack([options[name][0].reshape(-1) for name in names])
+    errors = np.stack([(options[name][1] * options[name][2]).reshape(-1) for name in names])
+    rows = np.arange(len(names))
+
+    def pick(lam):
+        flat_choices = np.argmin(errors + lam * bytes_, axis=1)
+        return flat_choices, bytes_[rows, flat_choices].sum()
+
+    low, high = -12.0, 12.0
+    flat_choices, total = pick(10**high)
+    if total <= byte_budget:
+        for _ in range(60):
+            mid = (low + high) / 2
+            if pick(10**mid)[1] <= byte_budget:
+                high = mid
+            else:
+                low = mid
+        flat_choices, total = pick(10**high)
+        while True:
+            extra = bytes_ - bytes_[rows, flat_choices][:, None]
+            gain = errors[rows, flat_choices][:, None] - errors
+            fits = (extra > 0) & (gain > 0) & (extra <= byte_budget - total)
+            if not fits.any():
+                break
+            row, choice = np.unravel_index(
+                np.argmax(np.where(fits, gain / np.where(fits, extra, 1), -np.inf)), fits.shape
+            )
+            flat_choices[row] = choice
+            total += extra[row, choice]
+    return {name: np.unravel_index(choice, grid_shape) for name, choice in zip(names, flat_choices)}
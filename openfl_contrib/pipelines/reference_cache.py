@@ -0,0 +1,146 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Delta reference cache module."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+
+class ReferenceMismatchError(ValueError):
+    """The receiver does not hold the reference a delta payload was encoded against.
+
+    The sender has to send the full tensor instead.
+    """
+
+
+class Reference(NamedTuple):
+    """The last agreed version of a tensor.
+
+    Attributes:
+        round_number: round the tensor was agreed on.
+        digest: tuple of four 16-bit integers identifying its bytes.
+        data: the tensor, as a read-only float32 numpy array.
+    """
+
+    round_number: int
+    digest: tuple
+    data: np.ndarray
+
+
+class ReferenceCache:
+    """Per-tensor references that delta payloads are encoded against.
+
+    Sender and receiver each put the tensor both of them hold after a round,
+    e.g. the decompressed aggregated model, and a delta is only decoded when
+    the round and digest of the receiver's reference match the ones of the
+    sender. At most max_bytes of references are kept, the least recently used
+    ones are dropped first.
+
+    Attributes:
+        max_bytes (int): memory budget of the references.
+    """
+
+    def __init__(self, max_bytes=256 << 20):
+        """Initialize.
+
+        Args:
+            max_bytes (int): memory budget of the references (Default=256 MiB)
+        """
+        self.max_bytes = max_bytes
+        self._references = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, tensor_name, round_number, data):
+        """Store the reference of a tensor, replacing the previous one.
+
+        Args:
+            tensor_name (str): name of the tensor.
+            round_number (int): round the tensor was agreed on.
+            data: a numpy array.
+
+        Returns:
+            reference: the stored Reference.
+        """
+        data = np.array(data, dtype=np.float32, order="C")
+        data.flags.writeable = False
+        reference = Reference(round_number, tensor_digest(data), data)
+        with self._lock:
+            if tensor_name in self._references:
+                self._nbytes -= self._references.pop(tensor_name).data.nbytes
+            self._references[tensor_name] = reference
+            self._nbytes += data.nbytes
+            while self._nbytes > self.max_bytes and self._references:
+                _, evicted = self._references.popitem(last=False)
+                self._nbytes -= evicted.data.nbytes
+        return reference
+
+    def get(self, tensor_name):
+        """Return the reference of a tensor, or None when there is none.
+
+        Args:
+            tensor_name (str): name of the tensor.
+
+        Returns:
+            reference: a Reference, or None.
+        """
+        with self._lock:
+            reference = self._references.get(tensor_name)
+            if reference is not None:
+                self._references.move_to_end(tensor_name)
+            return reference
+
+    def verify(self, tensor_name, round_number, digest):
+        """Return the reference of a tensor when it is the expected version.
+
+        Args:
+            tensor_name (str): name of the tensor.
+            round_number (int): expected round of the reference.
+            digest: expected digest of the reference.
+
+        Returns:
+            reference: the matching Reference.
+
+        Raises:
+            ReferenceMismatchError: when the reference is missing or differs.
+        """
+        reference = None if tensor_name is None else self.get(tensor_name)
+        if reference is None:
+            raise ReferenceMismatchError(
+                f"No reference of tensor '{tensor_name}' to decode its round {round_number} delta"
+            )
+        if reference.round_number != round_number or reference.digest != tuple(digest):
+            raise ReferenceMismatchError(
+                f"Reference of tensor '{tensor_name}' is from round {reference.round_number}"
+                f" with digest {reference.digest}, the delta expects round {round_number}"
+                f" with digest {tuple(digest)}"
+            )
+        return reference
+
+    def __getstate__(self):
+        """Pickle the cache with its references, e.g. for worker processes."""
+        return {"max_bytes": self.max_bytes, "references": list(self._references.items())}
+
+    def __setstate__(self, state):
+        """Restore a pickled cache."""
+        self.__init__(state["max_bytes"])
+        self._references.update(state["references"])
+        self._nbytes = sum(reference.data.nbytes for _, reference in state["references"])
+
+
+def tensor_digest(data):
+    """Digest of the bytes of a float32 array, as four 16-bit integers.
+
+    Args:
+        data: a C-contiguous float32 numpy array.
+
+    Returns:
+        digest: tuple of four ints, each fitting the int32 metadata lists.
+    """
+    digest = hashlib.blake2b(memoryview(data).cast("B"), digest_size=8).digest()
+    return tuple(int(part) for part in np.frombuffer(digest, dtype="<u2"))
@@ -0,0 +1,77 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Byte and bit shuffle module.
+
+Neighbouring float values share their sign and exponent bytes, but the bytes
+of one value are interleaved with those of the next in memory, which hides the
+repetition from byte-oriented codecs. Shuffling transposes the buffer so that
+the first bytes (or bits) of all values come first, then the second ones, and
+so on. Bit shuffling works on blocks of _BIT_BLOCK values, and the values of
+the last block beyond a multiple of 8 are only byte-shuffled.
+"""
+
+import numpy as np
+
+SHUFFLE_MODES = ("byte", "bit")
+
+# values per bit-shuffled block, a multiple of 8
+_BIT_BLOCK = 1 << 16
+
+
+def shuffle(data, mode="byte"):
+    """Transpose the byte or bit planes of an array.
+
+    Args:
+        data: a numpy array.
+        mode (str): one of SHUFFLE_MODES (Default='byte').
+
+    Returns:
+        shuffled: flat uint8 numpy array of data.nbytes bytes.
+    """
+    if mode not in SHUFFLE_MODES:
+        raise ValueError(f"Unknown shuffle mode '{mode}', expected one of {SHUFFLE_MODES}")
+    data = np.ascontiguousarray(data).reshape(-1)
+    planes = data.view(np.uint8).reshape(data.shape[0], data.dtype.itemsize)
+    if mode == "byte":
+        return np.ascontiguousarray(planes.T).reshape(-1)
+    shuffled = np.empty(data.nbytes, dtype=np.uint8)
+    for start in range(0, data.shape[0], _BIT_BLOCK):
+        block = planes[start : start + _BIT_BLOCK]
+        block_out = shuffled[start * planes.shape[1] : (start + block.shape[0]) * planes.shape[1]]
+        n_bits = block.shape[0] // 8 * 8
+        bits = np.unpackbits(block[:n_bits], axis=1, bitorder="little")
+        bit_planes = np.packbits(bits.T, axis=1, bitorder="little")
+        block_out[: bit_planes.size] = bit_planes.reshape(-1)
+        block_out[bit_planes.size :] = block[n_bits:].T.reshape(-1)
+    return shuffled
+
+
+def unshuffle(shuffled, dtype, count, mode="byte"):
+    """Invert shuffle.
+
+    Args:
+        shuffled: bytes-like object produced by shuffle.
+        dtype: dtype of the original array.
+        count (int): number of values of the original array.
+        mode (str): one of SHUFFLE_MODES (Default='byte').
+
+    Returns:
+        data: flat numpy array of count values.
+    """
+    dtype = np.dtype(dtype)
+    shuffled = np.frombuffer(shuffled, dtype=np.uint8)
+    if mode == "byte":
+        planes = shuffled.reshape(dtype.itemsize, count).T
+        return np.ascontiguousarray(planes).view(dtype).reshape(count)
+    planes = np.empty((count, dtype.itemsize), dtype=np.uint8)
+    for start in range(0, count, _BIT_BLOCK):
+        block = planes[start : start + _BIT_BLOCK]
+        block_in = shuffled[start * dtype.itemsize : (start + block.shape[0]) * dtype.itemsize]
+        n_bits = block.shape[0] // 8 * 8
+        n_plane_bytes = n_bits * dtype.itemsize
+        bit_planes = block_in[:n_plane_bytes].reshape(dtype.itemsize * 8, n_bits // 8)
+        bits = np.unpackbits(bit_planes, axis=1, bitorder="little")
+        block[:n_bits] = np.packbits(bits.T, axis=1, bitorder="little")
+        block[n_bits:] = block_in[n_plane_bytes:].reshape(dtype.itemsize, -1).T
+    return planes.view(dtype).reshape(count)
@@ -0,0 +1,38 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Shuffle pipeline module."""
+
+from openfl.pipelines.pipeline import TransformationPipeline
+
+from openfl_contrib.pipelines.skc_pipeline import GZIPTransformer, ShuffleTransformer
+
+
+class ShufflePipeline(TransformationPipeline):
+    """A pipeline class to compress data losslessly, shuffling its planes before the codec.
+
+    Tensors are recovered bit for bit with their dtype and shape, e.g. for
+    models or tensors that must not be compressed lossily.
+    """
+
+    def __init__(
+        self, shuffle="byte", codec="gzip", codec_level=None, codec_throughput=100.0, **kwargs
+    ):
+        """Initialize a pipeline of transformers.
+
+        Args:
+            shuffle (str): Shuffle 'byte' or 'bit' planes (Default='byte')
+            codec (str): Lossless codec name, or 'auto' (Default='gzip')
+            codec_level (int): Codec level, None for the codec default
+                (Default=None)
+            codec_throughput (float): Minimal throughput in MB/s accepted by
+                the 'auto' codec (Default=100.0)
+
+        Returns:
+            Lossless data compression transformer pipeline object
+        """
+        transformers = [
+            ShuffleTransformer(shuffle),
+            GZIPTransformer(codec=codec, level=codec_level, throughput_target=codec_throughput),
+        ]
+        super(ShufflePipeline, self).__init__(transformers=transformers, **kwargs)
@@ -3,184 +3,842 @@
 
 """SKCPipeline module."""
 
-import copy as co
-import gzip as gz
+import functools
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib import util
+from typing import NamedTuple
 
 import numpy as np
 from openfl.pipelines.pipeline import TransformationPipeline, Transformer
+from openfl.protocols import base_pb2, utils
 from sklearn import cluster
 
+from openfl_contrib.pipelines import codecs
+from openfl_contrib.pipelines.bitpack import pack_bits, unpack_bits
+from openfl_contrib.pipelines.error_feedback import ResidualStore
+from openfl_contrib.pipelines.index_coding import decode_indices, encode_indices
+from openfl_contrib.pipelines.instrumentation import (
+    PIPELINE_STAGE,
+    PipelineRecorder,
+    relative_error,
+)
+from openfl_contrib.pipelines.policy import CompressionPolicy
+from openfl_contrib.pipelines.precision import (
+    VALUE_DTYPES,
+    decode_values,
+    encode_values,
+    round_values,
+)
+from openfl_contrib.pipelines.product_quantization import pq_assign, pq_fit, pq_merge, pq_split
+from openfl_contrib.pipelines.quantization import (
+    assign_1d,
+    code_dtype,
+    dequantize_uniform,
+    kmeans_1d,
+    lloyd_step_1d,
+    sample_1d,
+    stochastic_quantize,
+)
+from openfl_contrib.pipelines.rate_control import RateController
+from openfl_contrib.pipelines.reference_cache import ReferenceCache, ReferenceMismatchError
+from openfl_contrib.pipelines.shuffle import SHUFFLE_MODES, shuffle, unshuffle
+from openfl_contrib.pipelines.topk import block_topk_indices, topk_indices
+
+# dtypes that GZIPTransformer serializes as is, identified by their position
+_VALUE_DTYPES = (
+    np.dtype(np.float32),
+    np.dtype(np.uint8),
+    np.dtype(np.uint16),
+    np.dtype(np.uint32),
+    np.dtype(np.float16),
+)
+# bfloat16 values travel as uint16 bits under their own dtype code
+_BFLOAT16_CODE = len(_VALUE_DTYPES)
+
+# first byte of every SKCPipeline payload
+_STAGES_FRAME = 0
+_CHUNKED_FRAME = 1
+_LOSSLESS_FRAME = 2
+_PASSTHROUGH_FRAME = 3
+_PQ_FRAME = 4
+_DELTA_FRAME = 5
+
+# largest top-k block size per item size of the in-block index gaps
+_MAX_OFFSET_BLOCK = {1: 1 << 8, 2: 1 << 16}
+
+# negative int_to_float keys of KmeansTransformer carry statistics, not codes
+_EXTRA_DISTORTION_KEY = -1
+
+# engines of the top-k selection and code assignment of the transformers
+ARRAY_BACKENDS = ("numpy", "torch")
+
+
+class SparseTensor(NamedTuple):
+    """Sparse representation of a flattened tensor passed between SKC transformers.
+
+    Attributes:
+        indices: sorted int64 positions of the kept components.
+        values: the kept components (or their codes), aligned with indices.
+        block_size: size of the blocks the components were selected in, None
+            for a selection over the whole tensor.
+    """
+
+    indices: np.ndarray
+    values: np.ndarray
+    block_size: int = None
+
 
 class SparsityTransformer(Transformer):
     """A transformer class to sparsify input data."""
 
-    def __init__(self, p=0.01):
+    def __init__(
+        self,
+        p=0.01,
+        topk_method="partition",
+        n_workers=None,
+        array_backend="numpy",
+        block_size=None,
+    ):
         """Initialize.
 
         Args:
             p (float): sparsity ratio (Default=0.01)
+            topk_method (str): top-k selection engine, 'sort' or 'partition'
+                (Default='partition')
+            n_workers (int): number of threads used for top-k selection
+                (Default=None, all available cores)
+            array_backend (str): 'numpy', or 'torch' to select the top-k
+                with torch.topk, ignoring topk_method (Default='numpy')
+            block_size (int): keep the top p fraction of every block of
+                block_size elements, at most 65536, instead of the top p
+                fraction of the whole tensor. Indices are then sent as
+                in-block gaps, and topk_method and array_backend are
+                ignored (Default=None)
         """
+        _check_array_backend(array_backend)
+        if block_size is not None and not 0 < block_size <= _MAX_OFFSET_BLOCK[2]:
+            raise ValueError(
+                f"Top-k block size {block_size} is out of range [1, {_MAX_OFFSET_BLOCK[2]}]"
+            )
+        self.block_size = block_size
         self.lossy = True
         self.p = p
+        self.topk_method = topk_method
+        self.array_backend = array_backend
+        self.n_workers = n_workers or os.cpu_count() or 1
 
-    def forward(self, data, **kwargs):
+    def forward(self, data, p_sparsity=None, **kwargs):
         """
         Sparsify data and pass over only non-sparsified elements by reducing the array size.
 
         Args:
             data: an numpy array from the model tensor_dict.
+            p_sparsity: sparsity ratio overriding p for this call, recorded
+             in the metadata.
 
         Returns:
-            sparse_data: a flattened, sparse representation of the input tensor
+            sparse_data: a SparseTensor with the top-k components of the
+             flattened input tensor.
             metadata: dictionary to store a list of meta information.
         """
-        metadata = {"int_list": list(data.shape)}
-        # sparsification
-        data = data.astype(np.float32)
-        flatten_data = data.flatten()
+        metadata = {"int_list": list(np.shape(data))}
+        # sparsification, on a view of the input unless a cast is needed
+        flatten_data = np.ravel(data).astype(np.float32, copy=False)
         n_elements = flatten_data.shape[0]
-        k_op = int(np.ceil(n_elements * self.p))
-        topk, topk_indices = self._topk_func(flatten_data, k_op)
-        sparse_data = np.zeros(flatten_data.shape)
-        sparse_data[topk_indices] = topk
-        return sparse_data, metadata
+        p = self.p
+        if p_sparsity is not None:
+            p = p_sparsity
+            metadata["int_to_float"] = {0: p_sparsity}
+        k_op = int(np.ceil(n_elements * p))
+        if self.block_size is not None:
+            k_block = int(np.ceil(self.block_size * p))
+            topk_idx = block_topk_indices(
+                flatten_data, k_block, self.block_size, n_workers=self.n_workers
+            )
+            topk = flatten_data[topk_idx]
+        elif self.array_backend == "torch":
+            from openfl_contrib.pipelines import torch_backend
 
-    def backward(self, data, metadata, **kwargs):
+            topk_idx = torch_backend.topk_indices(flatten_data, k_op)
+            topk = flatten_data[topk_idx]
+        else:
+            topk, topk_idx = self._topk_func(
+                flatten_data, k_op, method=self.topk_method, n_workers=self.n_workers
+            )
+        return SparseTensor(topk_idx, topk, self.block_size), metadata
+
+    def backward(self, data, metadata, out=None, **kwargs):
         """Recover data array with the right shape and numerical type.
 
         Args:
-            data: an numpy array with non-zero values.
+            data: a SparseTensor, or a dense flattened numpy array.
             metadata: dictionary to contain information for recovering back
              to original data array.
+            out: preallocated C-contiguous float32 array of the original size
+             to recover the data into (Default=None).
 
         Returns:
             recovered_data: an numpy array with original shape.
         """
-        data = data.astype(np.float32)
-        data_shape = metadata["int_list"]
-        recovered_data = data.reshape(data_shape)
-        return recovered_data
+        data_shape = list(metadata["int_list"])
+        if out is None:
+            out = np.zeros(int(np.prod(data_shape)), dtype=np.float32)
+        elif isinstance(data, SparseTensor):
+            out.fill(0)
+        dense_data = out.reshape(-1)
+        if isinstance(data, SparseTensor):
+            dense_data[data.indices] = data.values
+        else:
+            dense_data[:] = data
+        return dense_data.reshape(data_shape)
+
+    def accumulate(self, data, metadata, out, weight=1.0):
+        """Add weight times the recovered data to a dense accumulator.
+
+        Only the kept components are touched, so the cost scales with their
+        number instead of the tensor size.
+
+        Args:
+            data: a SparseTensor, or a dense flattened numpy array.
+            metadata: dictionary to contain information for recovering back
+             to original data array.
+            out: C-contiguous float array of the original size to add into.
+            weight (float): factor applied to the data (Default=1.0).
+
+        Returns:
+            out: the accumulator with the original shape.
+        """
+        dense_data = out.reshape(-1)
+        if isinstance(data, SparseTensor):
+            # indices are unique, so a buffered scatter-add is exact
+            dense_data[data.indices] += data.values if weight == 1 else data.values * weight
+        else:
+            dense_data += data * weight
+        return dense_data.reshape(list(metadata["int_list"]))
 
     @staticmethod
-    def _topk_func(x, k):
+    def _topk_func(x, k, method="partition", n_workers=1):
         """Select top k values.
 
         Args:
             x: an numpy array to be sorted out for top-k components.
             k: k most maximum values.
+            method: top-k selection engine, 'sort' or 'partition'.
+            n_workers: number of threads used for top-k selection.
 
         Returns:
             topk_mag: components with top-k values.
             indices: indices of the top-k components.
         """
-        # quick sort as default on magnitude
-        idx = np.argsort(np.abs(x))
-        # sorted order, the right most is the largest magnitude
-        length = x.shape[0]
-        start_idx = length - k
-        # get the top k magnitude
-        topk_mag = np.asarray(x[idx[start_idx:]])
-        indices = np.asarray(idx[start_idx:])
-        if min(topk_mag) - 0 < 10e-8:  # avoid zeros
-            topk_mag = topk_mag + 10e-8
+        indices = topk_indices(x, k, method=method, n_workers=n_workers)
+        topk_mag = x[indices]
         return topk_mag, indices
 
 
 class KmeansTransformer(Transformer):
-    """A transformer class to quantize input data."""
+    """A transformer class to quantize input data.
 
-    def __init__(self, n_cluster=6):
-        """Initialize."""
+    With warm_start, the codebook of every named tensor is cached and the next
+    round refines it with a single Lloyd iteration instead of a full fit. A
+    full fit runs again when the mean squared error of the refined codebook
+    exceeds the one of the previous round by more than refit_tolerance.
+
+    With sample_size, codebooks of larger arrays are fitted on a sample and
+    every element is then assigned to its nearest centroid. The mean squared
+    error on the whole array in excess of the one on the sample is recorded
+    in the metadata under the int_to_float key -1.
+    """
+
+    def __init__(
+        self,
+        n_cluster=6,
+        backend="dp",
+        warm_start=False,
+        refit_tolerance=0.25,
+        sample_size=None,
+        sample_method="random",
+        seed=0,
+        value_dtype="float32",
+        array_backend="numpy",
+    ):
+        """Initialize.
+
+        Args:
+            n_cluster (int): number of quantization levels (Default=6)
+            backend (str): codebook solver, 'dp' for the exact 1-D quantizer or
+                'sklearn' for sklearn.cluster.KMeans (Default='dp')
+            warm_start (bool): refine the previous codebook of named tensors
+                (Default=False)
+            refit_tolerance (float): relative increase of the mean squared error
+                over the previous round that triggers a full fit (Default=0.25)
+            sample_size (int): fit codebooks on at most sample_size elements,
+                None to fit on all of them (Default=None)
+            sample_method (str): 'random' or 'stratified' (Default='random')
+            seed (int): seed of the sampling (Default=0)
+            value_dtype (str): precision the centroids are rounded to,
+                'float32', 'float16' or 'bfloat16' (Default='float32')
+            array_backend (str): 'numpy', or 'torch' to assign the codes with
+                torch.bucketize and torch.unique. Codebooks are fitted with
+                numpy either way (Default='numpy')
+        """
+        _check_array_backend(array_backend)
+        if backend not in ("dp", "sklearn"):
+            raise ValueError(f"Unknown KMeans backend '{backend}', expected 'dp' or 'sklearn'")
         self.n_cluster = n_cluster
+        self.backend = backend
+        self.warm_start = warm_start
+        self.refit_tolerance = refit_tolerance
+        self.sample_size = sample_size
+        self.sample_method = sample_method
+        self.seed = seed
+        if value_dtype not in VALUE_DTYPES:
+            raise ValueError(f"Unknown value dtype '{value_dtype}', expected one of {VALUE_DTYPES}")
+        self.value_dtype = value_dtype
+        self.array_backend = array_backend
+        # tensor name -> (codebook, its mean squared error)
+        self._codebooks = {}
         self.lossy = True
 
-    def forward(self, data, **kwargs):
+    def forward(self, data, n_clusters=None, tensor_name=None, **kwargs):
         """Quantize data into n_cluster levels of values.
 
         Args:
-            data: an flattened numpy array.
+            data: an flattened numpy array, or a SparseTensor whose values
+             are quantized.
+            n_clusters: number of levels overriding n_cluster for this call.
+            tensor_name: name of the tensor, used to look up its codebook.
 
         Returns:
             int_data: an numpy array being quantized.
             metadata: dictionary to store a list of meta information.
         """
+        if isinstance(data, SparseTensor):
+            int_values, metadata = self.forward(
+                data.values, n_clusters=n_clusters, tensor_name=tensor_name, **kwargs
+            )
+            return data._replace(values=int_values), metadata
+        n_cluster = n_clusters or self.n_cluster
         # clustering
         data = data.reshape((-1, 1))
-        if data.shape[0] >= self.n_cluster:
-            k_means = cluster.KMeans(n_clusters=self.n_cluster, n_init=self.n_cluster)
-            k_means.fit(data)
-            quantized_values = k_means.cluster_centers_.squeeze()
-            indices = k_means.labels_
-            quant_array = np.choose(indices, quantized_values)
+        fit_data = data
+        if self.sample_size is not None and data.shape[0] > self.sample_size:
+            fit_data = sample_1d(
+                data.reshape(-1), self.sample_size, method=self.sample_method, seed=self.seed
+            ).reshape((-1, 1))
+        warm = self._warm_start(data.reshape(-1), n_cluster, tensor_name)
+        if warm is not None:
+            codebook, int_array = warm
+        elif data.shape[0] >= n_cluster and self.backend == "dp":
+            codebook = kmeans_1d(fit_data, n_cluster)
+            int_array = self._assign(data.reshape(-1), codebook)
+        elif data.shape[0] >= n_cluster:
+            k_means = cluster.KMeans(n_clusters=n_cluster, n_init=n_cluster)
+            k_means.fit(fit_data)
+            codebook = np.sort(k_means.cluster_centers_.reshape(-1))
+            int_array = self._assign(data.reshape(-1), codebook)
+        elif self.array_backend == "torch":
+            from openfl_contrib.pipelines import torch_backend
+
+            codebook, int_array = torch_backend.unique_inverse(data)
         else:
-            quant_array = data
-        int_array, int2float_map = self._float_to_int(quant_array)
-        metadata = {"int_to_float": int2float_map}
-        int_array = int_array.reshape(-1)
+            codebook, int_array = np.unique(data, return_inverse=True)
+        if warm is None and self.warm_start and tensor_name is not None:
+            self._store_codebook(data.reshape(-1), codebook, tensor_name)
+        int_array = int_array.reshape(-1).astype(code_dtype(codebook.shape[0]))
+        if self.value_dtype != "float32":
+            codebook = round_values(codebook, self.value_dtype)
+        metadata = {"int_to_float": dict(enumerate(codebook.tolist()))}
+        if warm is None and fit_data is not data:
+            metadata["int_to_float"][_EXTRA_DISTORTION_KEY] = _sample_excess_error(
+                data.reshape(-1), int_array, fit_data.reshape(-1), codebook
+            )
         return int_array, metadata
 
-    def backward(self, data, metadata, **kwargs):
+    def _assign(self, data, codebook):
+        """Assign every element of data to its nearest centroid with the array backend."""
+        if self.array_backend == "torch":
+            from openfl_contrib.pipelines import torch_backend
+
+            return torch_backend.assign_1d(data, codebook)
+        return assign_1d(data, codebook)
+
+    def _warm_start(self, data, n_cluster, tensor_name):
+        """Refine the cached codebook of a tensor.
+
+        Returns:
+            (codebook, labels), or None when a full fit is needed.
+        """
+        if not self.warm_start or tensor_name not in self._codebooks:
+            return None
+        codebook, previous = self._codebooks[tensor_name]
+        if codebook.shape[0] != n_cluster or data.shape[0] < n_cluster:
+            return None
+        codebook, labels, distortion = lloyd_step_1d(data, codebook)
+        if distortion > previous * (1 + self.refit_tolerance):
+            return None
+        self._codebooks[tensor_name] = (codebook, distortion)
+        return codebook, labels
+
+    def _store_codebook(self, data, codebook, tensor_name):
+        """Cache a fully fitted codebook with its mean squared error."""
+        if codebook.shape[0] < 2:
+            return
+        codebook = np.asarray(codebook, dtype=np.float64)
+        error = data - codebook[assign_1d(data, codebook)]
+        distortion = float(np.mean(np.square(error, dtype=np.float64)))
+        self._codebooks[tensor_name] = (codebook, distortion)
+
+    def backward(self, data, metadata, weight=None, **kwargs):
         """Recover data array back to the original numerical type.
 
         Args:
-            data: an numpy array with non-zero values
+            data: an numpy array of integer codes
             metadata: dictionary to contain information for recovering back
              to original data array
+            weight (float): factor applied to the codebook before decoding,
+             None to recover the values themselves (Default=None)
 
         Returns:
             data: an numpy array with original numerical type
         """
-        # convert back to float
-        data = co.deepcopy(data)
-        int2float_map = metadata["int_to_float"]
-        for key in int2float_map:
-            indices = data == key
-            data[indices] = int2float_map[key]
-        return data
+        if isinstance(data, SparseTensor):
+            return data._replace(
+                values=self.backward(data.values, metadata, weight=weight, **kwargs)
+            )
+        # convert back to float with a single table lookup, empty tensors having no codebook
+        table = self._int_to_float_table(metadata.get("int_to_float", {}))
+        if weight is not None:
+            table = table * np.float32(weight)
+        return table[data]
 
     @staticmethod
-    def _float_to_int(np_array):
+    def _int_to_float_table(int_to_float_map):
+        """Build a dense decoding table from the int-to-float map.
+
+        Args:
+            int_to_float_map: mapping from integer codes to float values.
+
+        Returns:
+            table: float32 numpy array indexed by code.
+        """
+        keys = np.fromiter(int_to_float_map.keys(), dtype=np.int64)
+        values = np.fromiter(int_to_float_map.values(), dtype=np.float32)
+        values, keys = values[keys >= 0], keys[keys >= 0]
+        table = np.zeros(keys.max(initial=-1) + 1, dtype=np.float32)
+        table[keys] = values
+        return table
+
+
+class QSGDTransformer(Transformer):
+    """A transformer class to quantize input data on a uniform grid with stochastic rounding.
+
+    Values are scaled by the largest magnitude of their block and rounded to
+    one of 2 * levels + 1 grid points, up or down at random so that the
+    decoded values are unbiased. Encoding and decoding are O(N).
+    """
+
+    def __init__(self, levels=8, block_size=None, seed=None):
+        """Initialize.
+
+        Args:
+            levels (int): number of positive grid levels (Default=8)
+            block_size (int): number of consecutive values sharing a scale,
+                None for one scale per tensor (Default=None)
+            seed (int): seed of the rounding, None for a random seed
+                (Default=None)
+        """
+        self.levels = levels
+        self.block_size = block_size
+        self._seed_sequence = np.random.SeedSequence(seed)
+        self._lock = threading.Lock()
+        self.lossy = True
+
+    def __getstate__(self):
+        """Pickle the transformer without its lock, e.g. for worker processes."""
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled transformer with a new lock."""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def spawn_seeds(self, n):
+        """Spawn n independent seed sequences of the rounding, e.g. one per task.
+
+        Copies of the transformer in worker processes would otherwise spawn
+        the same streams as the original at every call.
+        """
+        with self._lock:
+            return self._seed_sequence.spawn(n)
+
+    def reseed(self, seed_sequence):
+        """Draw the rounding of the next calls from seed_sequence."""
+        with self._lock:
+            self._seed_sequence = seed_sequence
+
+    def forward(self, data, **kwargs):
+        """Quantize data into codes of the uniform grid.
+
+        Args:
+            data: an flattened numpy array, or a SparseTensor whose values
+             are quantized.
+
+        Returns:
+            int_data: an numpy array of codes in [0, 2 * levels].
+            metadata: dictionary with the levels, block size and block scales.
         """
-         Create look-up table for conversion between floating and integer types.
+        if isinstance(data, SparseTensor):
+            int_values, metadata = self.forward(data.values, **kwargs)
+            return data._replace(values=int_values), metadata
+        with self._lock:
+            # an independent stream per call keeps concurrent calls thread-safe
+            rng = np.random.default_rng(self._seed_sequence.spawn(1)[0])
+        codes, scales = stochastic_quantize(
+            np.ravel(data), self.levels, block_size=self.block_size, rng=rng
+        )
+        metadata = {
+            "int_list": [self.levels, self.block_size or 0],
+            "int_to_float": dict(enumerate(scales.tolist())),
+        }
+        return codes, metadata
+
+    def backward(self, data, metadata, weight=None, **kwargs):
+        """Recover float32 values from the codes.
 
         Args:
-            np_array
+            data: an numpy array of codes, or a SparseTensor of them.
+            metadata: dictionary to contain information for recovering back
+             to original data array
+            weight (float): factor applied to the scales before decoding,
+             None to recover the values themselves (Default=None)
 
         Returns:
-            int_array, int_to_float_map
+            data: float32 numpy array
         """
-        flatten_array = np_array.reshape(-1)
-        unique_value_array = np.unique(flatten_array)
-        int_array = np.zeros(flatten_array.shape, dtype=np.int32)
-        int_to_float_map = {}
-        float_to_int_map = {}
-        # create table
-        for idx, u_value in enumerate(unique_value_array):
-            int_to_float_map.update({idx: u_value})
-            float_to_int_map.update({u_value: idx})
-            # assign to the integer array
-            indices = np.where(flatten_array == u_value)
-            int_array[indices] = idx
-        int_array = int_array.reshape(np_array.shape)
-        return int_array, int_to_float_map
+        if isinstance(data, SparseTensor):
+            return data._replace(
+                values=self.backward(data.values, metadata, weight=weight, **kwargs)
+            )
+        levels, block_size = metadata["int_list"]
+        scales = KmeansTransformer._int_to_float_table(metadata.get("int_to_float", {}))
+        if weight is not None:
+            scales = scales * np.float32(weight)
+        return dequantize_uniform(data, scales, levels, block_size=block_size)
 
 
-class GZIPTransformer(Transformer):
-    """A transformer class to losslessly compress data."""
+class ProductQuantizationTransformer(Transformer):
+    """A transformer class to quantize input data with per-subspace vector codebooks.
+
+    The flattened tensor is cut into vectors of n_subspaces * subvector_size
+    consecutive elements, so that rows of dense layers or whole conv kernels
+    (subvector_size = kh * kw) are quantized together. The output is a uint8
+    array holding the codes, one byte per sub-vector with at most 256
+    codewords, followed by the codebooks in value_dtype.
+    """
+
+    def __init__(
+        self,
+        subvector_size=8,
+        n_subspaces=1,
+        n_codewords=256,
+        n_iter=10,
+        sample_size=65536,
+        seed=0,
+        value_dtype="float32",
+    ):
+        """Initialize.
+
+        Args:
+            subvector_size (int): number of elements of a sub-vector (Default=8)
+            n_subspaces (int): number of sub-vectors per vector, each with its
+                own codebook (Default=1)
+            n_codewords (int): number of codewords per codebook (Default=256)
+            n_iter (int): number of k-means iterations (Default=10)
+            sample_size (int): fit codebooks on at most sample_size vectors,
+                None to fit on all of them (Default=65536)
+            seed (int): seed of the sampling and of the initial codewords
+                (Default=0)
+            value_dtype (str): precision of the codebooks, 'float32',
+                'float16' or 'bfloat16' (Default='float32')
+        """
+        if value_dtype not in VALUE_DTYPES:
+            raise ValueError(f"Unknown value dtype '{value_dtype}', expected one of {VALUE_DTYPES}")
+        self.subvector_size = subvector_size
+        self.n_subspaces = n_subspaces
+        self.n_codewords = n_codewords
+        self.n_iter = n_iter
+        self.sample_size = sample_size
+        self.seed = seed
+        self.value_dtype = value_dtype
+        self.lossy = True
+
+    def forward(self, data, **kwargs):
+        """Quantize data into codes of the nearest codewords.
+
+        Args:
+            data: an numpy array, or a SparseTensor whose values are
+             quantized.
+
+        Returns:
+            pq_data: an uint8 numpy array with the codes and the codebooks.
+            metadata: dictionary with the element count, the layout and the
+             shape of the data.
+        """
+        if isinstance(data, SparseTensor):
+            pq_values, metadata = self.forward(data.values, **kwargs)
+            return data._replace(values=pq_values), metadata
+        flatten_data = np.ravel(data)
+        vectors = pq_split(flatten_data, self.subvector_size, self.n_subspaces)
+        n_vectors = vectors.shape[1]
+        n_codewords = min(self.n_codewords, n_vectors)
+        fit_vectors = vectors
+        if self.sample_size is not None and n_vectors > self.sample_size:
+            rng = np.random.default_rng(self.seed)
+            fit_vectors = vectors[
+                :, np.sort(rng.choice(n_vectors, self.sample_size, replace=False))
+            ]
+        codebooks = pq_fit(fit_vectors, n_codewords, n_iter=self.n_iter, seed=self.seed)
+        encoded_codebooks = encode_values(codebooks, self.value_dtype)
+        # assign to the codewords as they will be decoded
+        codes = pq_assign(vectors, decode_values(encoded_codebooks, self.value_dtype))
+        codes = codes.astype(code_dtype(n_codewords))
+        pq_data = np.concatenate(
+            [codes.reshape(-1).view(np.uint8), encoded_codebooks.reshape(-1).view(np.uint8)]
+        )
+        metadata = {
+            "int_list": [
+                flatten_data.shape[0],
+                self.subvector_size,
+                self.n_subspaces,
+                n_codewords,
+                VALUE_DTYPES.index(self.value_dtype),
+                *np.shape(data),
+            ]
+        }
+        return pq_data, metadata
+
+    def backward(self, data, metadata, **kwargs):
+        """Recover float32 data from the codes and the codebooks.
+
+        Args:
+            data: an uint8 numpy array, or a SparseTensor of them.
+            metadata: dictionary to contain information for recovering back
+             to original data array
+
+        Returns:
+            data: float32 numpy array with the original shape
+        """
+        if isinstance(data, SparseTensor):
+            return data._replace(values=self.backward(data.values, metadata, **kwargs))
+        n_elements, subvector_size, n_subspaces, n_codewords, dtype_index, *data_shape = metadata[
+            "int_list"
+        ]
+        value_dtype = VALUE_DTYPES[dtype_index]
+        n_vectors = -(-n_elements // (subvector_size * n_subspaces))
+        data = np.asarray(data, dtype=np.uint8)
+        codes_nbytes = n_subspaces * n_vectors * np.dtype(code_dtype(n_codewords)).itemsize
+        codes = data[:codes_nbytes].view(code_dtype(n_codewords)).reshape(n_subspaces, n_vectors)
+        encoded_codebooks = data[codes_nbytes:].view(encode_values(np.zeros(0), value_dtype).dtype)
+        codebooks = decode_values(encoded_codebooks, value_dtype).reshape(
+            n_subspaces, n_codewords, subvector_size
+        )
+        vectors = codebooks[np.arange(n_subspaces)[:, None], codes]
+        return pq_merge(vectors, n_elements).reshape(data_shape)
+
+
+class BitPackTransformer(Transformer):
+    """A transformer class to pack integer codes into ceil(log2(K)) bits each."""
 
     def __init__(self):
         """Initialize."""
         self.lossy = False
 
+    def forward(self, data, **kwargs):
+        """Pack integer codes into a bit stream.
+
+        Args:
+            data: an numpy array of unsigned integer codes, or a SparseTensor
+             whose values are codes. Any other data is passed over unchanged.
+
+        Returns:
+            packed_data: an uint8 numpy array with the packed codes.
+            metadata: dictionary to store a list of meta information.
+        """
+        if isinstance(data, SparseTensor):
+            packed_values, metadata = self.forward(data.values, **kwargs)
+            return data._replace(values=packed_values), metadata
+        if data.dtype not in _VALUE_DTYPES or data.dtype.kind != "u":
+            return data, {"int_list": [0]}
+        n_bits = max(int(data.max(initial=0)).bit_length(), 1)
+        metadata = {"int_list": [n_bits, data.shape[0], _VALUE_DTYPES.index(data.dtype)]}
+        return pack_bits(data, n_bits), metadata
+
+    def backward(self, data, metadata, **kwargs):
+        """Unpack a bit stream back to integer codes.
+
+        Args:
+            data: an uint8 numpy array, or a SparseTensor with packed values
+            metadata: dictionary to contain information for recovering back
+             to original data array
+
+        Returns:
+            data: an numpy array of integer codes
+        """
+        if isinstance(data, SparseTensor):
+            return data._replace(values=self.backward(data.values, metadata, **kwargs))
+        int_list = list(metadata["int_list"])
+        if int_list[0] == 0:
+            return data
+        n_bits, count, dtype_code = int_list
+        return unpack_bits(data, n_bits, count, dtype=_VALUE_DTYPES[dtype_code])
+
+
+class ShuffleTransformer(Transformer):
+    """A transformer class to transpose the byte or bit planes of data before the codec.
+
+    Shuffling is lossless and groups the sign and exponent bytes of float
+    values, which codecs compress much better than the interleaved buffer.
+    """
+
+    def __init__(self, mode="byte"):
+        """Initialize.
+
+        Args:
+            mode (str): 'byte' or 'bit' planes (Default='byte')
+        """
+        if mode not in SHUFFLE_MODES:
+            raise ValueError(f"Unknown shuffle mode '{mode}', expected one of {SHUFFLE_MODES}")
+        self.mode = mode
+        self.lossy = False
+
+    def forward(self, data, **kwargs):
+        """Shuffle data into a flat uint8 array.
+
+        Args:
+            data: an numpy array, or a SparseTensor whose values are shuffled.
+
+        Returns:
+            shuffled_data: an uint8 numpy array.
+            metadata: dictionary with the mode, the dtype and the shape of data.
+        """
+        if isinstance(data, SparseTensor):
+            shuffled_values, metadata = self.forward(data.values, **kwargs)
+            return data._replace(values=shuffled_values), metadata
+        data = np.asarray(data)
+        metadata = {"int_list": [SHUFFLE_MODES.index(self.mode), ord(data.dtype.char), *data.shape]}
+        return shuffle(data, self.mode), metadata
+
+    def backward(self, data, metadata, **kwargs):
+        """Unshuffle data back to its dtype and shape.
+
+        Args:
+            data: an uint8 numpy array, or a SparseTensor of them.
+            metadata: dictionary to contain information for recovering back
+             to original data array
+
+        Returns:
+            data: an numpy array with the original dtype and shape
+        """
+        if isinstance(data, SparseTensor):
+            return data._replace(values=self.backward(data.values, metadata, **kwargs))
+        mode_index, dtype_char, *data_shape = metadata["int_list"]
+        count = int(np.prod(data_shape))
+        return unshuffle(data, chr(dtype_char), count, SHUFFLE_MODES[mode_index]).reshape(
+            data_shape
+        )
+
+
+class GZIPTransformer(Transformer):
+    """A transformer class to losslessly compress data.
+
+    The codec is taken from the openfl_contrib.pipelines.codecs registry, gzip
+    by default. Every payload names its codec in a one-byte header. Float
+    values are carried in value_dtype and promoted back to float32 on decode.
+    """
+
+    def __init__(self, codec="gzip", level=None, throughput_target=100.0, value_dtype="float32"):
+        """Initialize.
+
+        Args:
+            codec (str): registered codec name, or 'auto' to pick the densest
+                codec meeting throughput_target (Default='gzip')
+            level (int): codec level, None for the codec default (Default=None)
+            throughput_target (float): minimal compression throughput in MB/s
+                for the 'auto' codec (Default=100.0)
+            value_dtype (str): transport dtype of float values, 'float32',
+                'float16' or 'bfloat16' (Default='float32')
+        """
+        if codec != "auto" and codec not in codecs.available_codecs():
+            raise ValueError(
+                f"Unknown codec '{codec}', expected 'auto' or one of {codecs.available_codecs()}"
+            )
+        self.lossy = False
+        self.codec = codec
+        self.level = level
+        self.throughput_target = throughput_target
+        if value_dtype not in VALUE_DTYPES:
+            raise ValueError(f"Unknown value dtype '{value_dtype}', expected one of {VALUE_DTYPES}")
+        self.value_dtype = value_dtype
+
     def forward(self, data, **kwargs):
         """Compress data into bytes.
 
+        A SparseTensor is serialized as its index stream, coded by
+        encode_indices, followed by its values. The indices of a block-wise
+        selection keeping the same number of components in every block but
+        the last are sent instead as the byte-shuffled uint8 or uint16 gaps
+        between consecutive offsets within a block, the first one relative
+        to the block start.
+        Integer codes keep their width, any other values are sent as
+        value_dtype.
+
         Args:
-            data: an numpy array with non-zero values
+            data: an numpy array, or a SparseTensor
         """
-        bytes_ = data.astype(np.float32).tobytes()
-        compressed_bytes_ = gz.compress(bytes_)
-        metadata = {}
+        sparse = isinstance(data, SparseTensor)
+        if sparse:
+            n_indices = data.indices.shape[0]
+            block_layout = _block_layout(data)
+            if block_layout is None:
+                index_bytes_ = encode_indices(data.indices)
+            else:
+                offset_itemsize, block_size, k_block = block_layout
+                offsets = data.indices % block_size
+                gaps = np.diff(offsets, prepend=0)
+                gaps[::k_block] = offsets[::k_block]
+                index_bytes_ = bytearray(shuffle(gaps.astype(f"<u{offset_itemsize}"), "byte"))
+            data = data.values
+        if data.dtype in _VALUE_DTYPES[1:4]:
+            dtype_code = _VALUE_DTYPES.index(data.dtype)
+        elif self.value_dtype == "bfloat16":
+            data = encode_values(data, self.value_dtype)
+            dtype_code = _BFLOAT16_CODE
+        else:
+            data = encode_values(data, self.value_dtype)
+            dtype_code = _VALUE_DTYPES.index(data.dtype)
+        metadata = {"int_list": [dtype_code]}
+        if sparse and block_layout is not None:
+            # index item size 1 or 2 flags in-block gaps, k_block per block
+            metadata["int_list"] += [n_indices, offset_itemsize, block_size, k_block]
+        elif sparse:
+            # index item size 0 flags a coded index stream of the given length
+            metadata["int_list"] += [n_indices, 0, len(index_bytes_)]
+        # hand the values to the codec as a buffer, appended to the index stream if any
+        bytes_ = memoryview(np.ascontiguousarray(data)).cast("B")
+        if sparse:
+            index_bytes_ += bytes_
+            bytes_ = index_bytes_
+        compressed_bytes_ = codecs.compress(
+            bytes_,
+            codec=self.codec,
+            level=self.level,
+            throughput_target=self.throughput_target,
+            kind=(sparse, dtype_code),
+        )
         return compressed_bytes_, metadata
 
     def backward(self, data, metadata, **kwargs):
@@ -194,30 +852,889 @@ class GZIPTransformer(Transformer):
         Returns:
             data:
         """
-        decompressed_bytes_ = gz.decompress(data)
-        data = np.frombuffer(decompressed_bytes_, dtype=np.float32)
+        decompressed_bytes_ = codecs.decompress(data)
+        int_list = list(metadata.get("int_list") or [0])
+        if int_list[0] == _BFLOAT16_CODE:
+            value_dtype = np.dtype(np.uint16)
+        else:
+            value_dtype = _VALUE_DTYPES[int_list[0]]
+        offset = 0
+        if len(int_list) > 1 and int_list[2] == 0:
+            offset = int_list[3]
+            indices = decode_indices(memoryview(decompressed_bytes_)[:offset])
+        elif len(int_list) > 1:
+            n_indices, offset_itemsize, block_size, k_block = int_list[1:5]
+            offset = n_indices * offset_itemsize
+            gaps = unshuffle(
+                memoryview(decompressed_bytes_)[:offset], f"<u{offset_itemsize}", n_indices
+            )
+            # in-block offsets are the gap sums since the first gap of the block
+            offsets = np.cumsum(gaps, dtype=np.int64)
+            block_bases = offsets[::k_block] - gaps[::k_block]
+            offsets -= np.repeat(block_bases, k_block)[:n_indices]
+            indices = np.arange(n_indices, dtype=np.int64) // k_block * block_size
+            indices += offsets
+        data = np.frombuffer(decompressed_bytes_, dtype=value_dtype, offset=offset)
+        if int_list[0] == _BFLOAT16_CODE:
+            data = decode_values(data, "bfloat16")
+        elif value_dtype == np.float16:
+            data = decode_values(data, "float16")
+        if len(int_list) > 1:
+            return SparseTensor(indices.astype(np.int64), data)
         return data
 
 
 class SKCPipeline(TransformationPipeline):
-    """A pipeline class to compress data lossly using sparsity and k-means methods."""
+    """A pipeline class to compress data lossly using sparsity and k-means methods.
+
+    Payloads start with a frame byte. A stages frame holds the output of the
+    transformer chain for the whole tensor. A chunked frame holds a serialized
+    ModelProto with one NamedTensor per block of chunk_size elements, each
+    carrying the block payload and its own transformer metadata. Lossless and
+    passthrough frames hold the dtype string of the tensor followed by its raw
+    bytes, compressed by the codec or not. A product quantization frame holds
+    the codec output of ProductQuantizationTransformer for the whole tensor.
+    A delta frame wraps the payload of the difference between a tensor and its
+    cached reference, whose round and digest lead the transformer metadata.
+    """
 
-    def __init__(self, p_sparsity=0.1, n_clusters=6, **kwargs):
+    def __init__(
+        self,
+        p_sparsity=0.1,
+        n_clusters=6,
+        topk_method="partition",
+        topk_block_size=None,
+        n_workers=None,
+        array_backend="numpy",
+        kmeans_backend="dp",
+        warm_start=False,
+        warm_start_tolerance=0.25,
+        kmeans_sample_size=None,
+        kmeans_sample_method="random",
+        quantizer="kmeans",
+        qsgd_levels=8,
+        qsgd_block_size=None,
+        qsgd_seed=None,
+        pq_subvector_size=8,
+        pq_subspaces=1,
+        pq_codewords=256,
+        bit_pack=True,
+        codec="gzip",
+        codec_level=None,
+        codec_throughput=100.0,
+        value_dtype="float32",
+        lossless_shuffle=None,
+        chunk_size=None,
+        batch_workers=None,
+        batch_executor="thread",
+        error_feedback=False,
+        residual_dir="local_state/skc_residuals",
+        residual_max_bytes=256 << 20,
+        byte_budget=None,
+        distortion_target=None,
+        policy=None,
+        instrumentation=None,
+        delta_encoding=False,
+        reference_max_bytes=256 << 20,
+        **kwargs,
+    ):
         """Initialize a pipeline of transformers.
 
         Args:
             p_sparsity (float): Sparsity factor (Default=0.1)
-            n_cluster (int): Number of K-Means clusters (Default=6)
+            n_cluster (int): Number of K-Means clusters, None to send the
+                kept values without quantization (Default=6)
+            topk_method (str): Top-k selection engine, 'sort' or 'partition'
+                (Default='partition')
+            topk_block_size (int): Keep the top p_sparsity fraction of every
+                block of topk_block_size elements, at most 65536, and send
+                uint8 or uint16 in-block index gaps instead of coded indices.
+                Blocks are selected on n_workers threads, and chunk_size
+                should be a multiple of it (Default=None, global top-k)
+            n_workers (int): Number of threads used by the transformers
+                (Default=None, all available cores)
+            array_backend (str): Engine of the top-k selection and of the
+                code assignment, 'numpy' or 'torch'. The 'torch' backend
+                accepts torch tensors, runs on the intra-op threads of torch
+                and produces payloads any backend decodes (Default='numpy')
+            kmeans_backend (str): Codebook solver, 'dp' or 'sklearn' (Default='dp')
+            warm_start (bool): Refine the previous round's codebook of every
+                named tensor with one Lloyd iteration instead of a full fit.
+                Codebooks are cached in this pipeline object, so worker
+                processes of the 'process' batch executor do not share them
+                (Default=False)
+            warm_start_tolerance (float): Relative increase of the mean squared
+                error over the previous round that triggers a full fit
+                (Default=0.25)
+            kmeans_sample_size (int): Fit codebooks on a seeded sample of at
+                most kmeans_sample_size values, None to fit on all of them
+                (Default=None)
+            kmeans_sample_method (str): Codebook sample, 'random' or
+                'stratified' (Default='random')
+            quantizer (str): Value quantizer, 'kmeans' for a fitted codebook
+                of n_clusters centroids or 'qsgd' for unbiased stochastic
+                rounding on a uniform grid. n_clusters and the kmeans
+                settings are ignored by 'qsgd' (Default='kmeans')
+            qsgd_levels (int): Number of positive grid levels of the 'qsgd'
+                quantizer, 2 * qsgd_levels + 1 codes in total (Default=8)
+            qsgd_block_size (int): Number of kept values sharing a 'qsgd'
+                scale, None for one scale per tensor (Default=None)
+            qsgd_seed (int): Seed of the 'qsgd' rounding, None for a random
+                seed (Default=None)
+            pq_subvector_size (int): Number of elements per sub-vector of the
+                tensors routed to 'pq' by the policy (Default=8)
+            pq_subspaces (int): Number of sub-vectors per vector, each with
+                its own codebook, of the 'pq' route (Default=1)
+            pq_codewords (int): Number of codewords per codebook of the 'pq'
+                route, 256 for one byte per sub-vector (Default=256)
+            bit_pack (bool): Pack the cluster codes into ceil(log2(n_clusters))
+                bits each before compression (Default=True)
+            codec (str): Lossless codec name, or 'auto' (Default='gzip')
+            codec_level (int): Codec level, None for the codec default
+                (Default=None)
+            codec_throughput (float): Minimal throughput in MB/s accepted by
+                the 'auto' codec (Default=100.0)
+            value_dtype (str): Precision of the centroids and of unquantized
+                values, 'float32', 'float16' or 'bfloat16' (Default='float32')
+            lossless_shuffle (str): Shuffle the 'byte' or 'bit' planes of the
+                tensors routed to 'lossless' by the policy before the codec,
+                None to compress their raw bytes (Default=None)
+            chunk_size (int): Split tensors larger than chunk_size elements
+                into blocks compressed independently on n_workers threads,
+                None to disable (Default=None)
+            batch_workers (int): Number of workers of forward_batch and
+                backward_batch (Default=None, all available cores)
+            batch_executor (str): Worker pool of forward_batch and
+                backward_batch, 'thread' or 'process' (Default='thread')
+            error_feedback (bool): Add the compression error of the previous
+                round, i.e. the compensated tensor minus its decoded payload,
+                back before compression. Only applies to 'skc' and 'pq'
+                tensors compressed with a tensor_name, e.g. through
+                forward_batch (Default=False)
+            residual_dir (str): Directory where residuals are persisted, None
+                to keep them in memory only. Worker processes of the 'process'
+                batch executor share residuals through this directory, so it
+                cannot be None with them
+                (Default='local_state/skc_residuals')
+            residual_max_bytes (int): Memory budget of the residuals kept in
+                memory (Default=256 MiB)
+            byte_budget (int): Payload bytes per round. When set, p_sparsity
+                and n_clusters are chosen per tensor by a RateController to
+                minimize the total squared error. Tensors compressed one at a
+                time share the budget of their round from the second round on,
+                see RateController (Default=None)
+            distortion_target (float): Relative squared error per tensor. When
+                set, p_sparsity and n_clusters are chosen per tensor by a
+                RateController to meet it with the fewest bytes (Default=None)
+            policy: CompressionPolicy, or list of rule dictionaries routing
+                tensors to 'passthrough', 'lossless', 'skc' or 'pq'. Rate
+                control only applies to 'skc' tensors (Default=None, all tensors 'skc')
+            instrumentation: PipelineRecorder, or dictionary of its settings,
+                receiving the timings and byte counts of every stage. Worker
+                processes of the 'process' batch executor record into their
+                own copy (Default=None, disabled)
+            delta_encoding (bool): Compress 'skc' tensors as their difference
+                to the reference set by set_reference, on both ends, for
+                their tensor_name. Receivers verify the round and digest of
+                their reference and raise ReferenceMismatchError when it
+                differs (Default=False)
+            reference_max_bytes (int): Memory budget of the references
+                (Default=256 MiB)
 
         Returns:
             Data compression transformer pipeline object
         """
         # instantiate each transformer
+        _check_array_backend(array_backend)
+        self.array_backend = array_backend
         self.p = p_sparsity
         self.n_cluster = n_clusters
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.codec = codec
+        self.codec_level = codec_level
+        self.codec_throughput = codec_throughput
+        if lossless_shuffle is not None and lossless_shuffle not in SHUFFLE_MODES:
+            raise ValueError(
+                f"Unknown shuffle mode '{lossless_shuffle}', expected one of {SHUFFLE_MODES}"
+            )
+        self.lossless_shuffle = lossless_shuffle
+        if policy is not None and not isinstance(policy, CompressionPolicy):
+            policy = CompressionPolicy(policy)
+        self.policy = policy
+        if instrumentation is not None and not isinstance(instrumentation, PipelineRecorder):
+            instrumentation = PipelineRecorder(**instrumentation)
+        self.recorder = instrumentation
+        self.references = ReferenceCache(reference_max_bytes) if delta_encoding else None
+        if batch_executor not in ("thread", "process"):
+            raise ValueError(
+                f"Unknown batch executor '{batch_executor}', expected 'thread' or 'process'"
+            )
+        self.batch_workers = batch_workers or os.cpu_count() or 1
+        self.batch_executor = batch_executor
+        if quantizer not in ("kmeans", "qsgd"):
+            raise ValueError(f"Unknown quantizer '{quantizer}', expected 'kmeans' or 'qsgd'")
+        if quantizer == "qsgd" and (byte_budget is not None or distortion_target is not None):
+            raise ValueError("Rate control models the 'kmeans' quantizer only")
+        self.rate_controller = None
+        if byte_budget is not None or distortion_target is not None:
+            self.rate_controller = RateController(
+                byte_budget=byte_budget, distortion_target=distortion_target
+            )
+        self.residual_store = None
+        if error_feedback and residual_dir is None and batch_executor == "process":
+            raise ValueError(
+                "Residuals of worker processes are lost without residual_dir, "
+                "use the 'thread' batch executor or set residual_dir"
+            )
+        if error_feedback:
+            self.residual_store = ResidualStore(path=residual_dir, max_bytes=residual_max_bytes)
         transformers = [
-            SparsityTransformer(self.p),
-            KmeansTransformer(self.n_cluster),
-            GZIPTransformer(),
+            SparsityTransformer(
+                self.p,
+                topk_method=topk_method,
+                n_workers=n_workers,
+                array_backend=array_backend,
+                block_size=topk_block_size,
+            ),
         ]
+        if quantizer == "qsgd":
+            transformers.append(
+                QSGDTransformer(qsgd_levels, block_size=qsgd_block_size, seed=qsgd_seed)
+            )
+        elif self.n_cluster is not None:
+            transformers.append(
+                KmeansTransformer(
+                    self.n_cluster,
+                    backend=kmeans_backend,
+                    warm_start=warm_start,
+                    refit_tolerance=warm_start_tolerance,
+                    sample_size=kmeans_sample_size,
+                    sample_method=kmeans_sample_method,
+                    value_dtype=value_dtype,
+                    array_backend=array_backend,
+                )
+            )
+        if bit_pack:
+            transformers.append(BitPackTransformer())
+        transformers.append(
+            GZIPTransformer(
+                codec=codec,
+                level=codec_level,
+                throughput_target=codec_throughput,
+                value_dtype=value_dtype,
+            )
+        )
+        # product quantization of the tensors routed to 'pq', sharing the codec
+        self.pq_transformer = ProductQuantizationTransformer(
+            subvector_size=pq_subvector_size,
+            n_subspaces=pq_subspaces,
+            n_codewords=pq_codewords,
+            value_dtype=value_dtype,
+        )
         super(SKCPipeline, self).__init__(transformers=transformers, **kwargs)
+
+    def forward(self, data, **kwargs):
+        """Forward pass of pipeline data transformer.
+
+        Args:
+            data: Data to be transformed.
+            **kwargs: Additional keyword arguments for the transformation.
+                p_sparsity and n_clusters override the pipeline settings.
+                With delta_encoding, reference_round is the round of the
+                reference the receiver holds: the full tensor is sent when
+                the cached reference is from another round.
+
+        Returns:
+            data: The compressed payload.
+            transformer_metadata: The metadata for the transformation.
+        """
+        if self.array_backend == "torch":
+            from openfl_contrib.pipelines import torch_backend
+
+            data = torch_backend.to_numpy(data)
+        if self.recorder is None:
+            return self._forward(data, **kwargs)
+        tensor_name = kwargs.get("tensor_name")
+        with self.recorder.measure(tensor_name, PIPELINE_STAGE, "forward", data) as result:
+            result["output"], transformer_metadata = self._forward(data, **kwargs)
+            result["error"] = lambda: relative_error(
+                data,
+                self._backward(
+                    result["output"], list(transformer_metadata), tensor_name=tensor_name
+                ),
+            )
+        return result["output"], transformer_metadata
+
+    def _forward(self, data, reference_round=None, **kwargs):
+        """Compress a tensor, as a delta against its reference when there is one."""
+        reference = self._delta_reference(kwargs.get("tensor_name"), data, reference_round)
+        if reference is None:
+            return self._forward_frame(data, **kwargs)
+        data_bytes, transformer_metadata = self._forward_frame(_delta(data, reference), **kwargs)
+        reference_metadata = {"int_list": [reference.round_number, *reference.digest]}
+        return bytes((_DELTA_FRAME,)) + data_bytes, [reference_metadata] + transformer_metadata
+
+    def _forward_frame(self, data, **kwargs):
+        """Compress a tensor along its route, carrying its compression error over."""
+        tensor_name = kwargs.get("tensor_name")
+        route = self._route(tensor_name, data)
+        if route == "pq" and np.size(data) == 0:
+            # no vectors to fit codebooks on
+            route = "passthrough"
+        if route not in ("skc", "pq"):
+            return self._forward_raw(data, lossless=route == "lossless")
+        if self.residual_store is None or tensor_name is None:
+            return self._forward_lossy(data, route, **kwargs)
+        data = self._compensate(tensor_name, data)
+        data_bytes, transformer_metadata = self._forward_lossy(data, route, **kwargs)
+        # the compensated tensor becomes the residual once its payload is subtracted
+        residual = self.accumulate(data_bytes, transformer_metadata, out=data, weight=-1.0)
+        self.residual_store.put(tensor_name, residual.reshape(-1))
+        return data_bytes, transformer_metadata
+
+    def _compensate(self, tensor_name, data):
+        """Add the residual of the previous round of a tensor to a copy of it."""
+        residual = self.residual_store.get(tensor_name)
+        if residual is None or residual.shape[0] != np.size(data):
+            return np.array(data, dtype=np.float32)
+        return np.add(data, residual.reshape(np.shape(data)), dtype=np.float32)
+
+    def _forward_lossy(self, data, route, **kwargs):
+        """Compress a tensor along the 'skc' or 'pq' route."""
+        if route == "pq":
+            return self._forward_pq(data, **kwargs)
+        controlled = self.rate_controller is not None and "p_sparsity" not in kwargs
+        if controlled:
+            p, n_clusters = self.rate_controller.choose(kwargs.get("tensor_name"), data)
+            kwargs.update(p_sparsity=p, n_clusters=n_clusters)
+        if self.chunk_size and np.size(data) > self.chunk_size:
+            data_bytes, transformer_metadata = self._forward_chunked(data, **kwargs)
+            data_bytes = bytes((_CHUNKED_FRAME,)) + data_bytes
+        else:
+            data_bytes, transformer_metadata = self._forward_stages(data, **kwargs)
+            data_bytes = bytes((_STAGES_FRAME,)) + data_bytes
+        if controlled:
+            self._observe(kwargs.get("tensor_name"), data, data_bytes, transformer_metadata)
+        return data_bytes, transformer_metadata
+
+    def backward(self, data, transformer_metadata, out=None, **kwargs):
+        """Backward pass of pipeline data transformer.
+
+        Args:
+            data: The compressed payload.
+            transformer_metadata: The metadata for the transformation.
+            out: Preallocated C-contiguous float32 array of the tensor size
+                to decode into, e.g. reused across rounds (Default=None).
+            **kwargs: Additional keyword arguments for the transformation.
+
+        Returns:
+            The original data before the transformation.
+        """
+        if self.recorder is None:
+            return self._backward(data, transformer_metadata, out=out, **kwargs)
+        tensor_name = kwargs.get("tensor_name")
+        with self.recorder.measure(tensor_name, PIPELINE_STAGE, "backward", data) as result:
+            result["output"] = self._backward(
+                data, transformer_metadata, out=out, record=True, **kwargs
+            )
+        return result["output"]
+
+    def _backward(self, data, transformer_metadata, out=None, record=False, **kwargs):
+        """Decompress a payload of any frame, recording its stages when record is set."""
+        data = memoryview(data)
+        if data[0] == _DELTA_FRAME:
+            reference = self._verified_reference(kwargs.get("tensor_name"), transformer_metadata)
+            recovered_data = self._backward(
+                data[1:], transformer_metadata[1:], out=out, record=record, **kwargs
+            )
+            recovered_data += reference.data.reshape(recovered_data.shape)
+            return recovered_data
+        if data[0] == _CHUNKED_FRAME:
+            return self._backward_chunked(
+                data[1:], transformer_metadata, out=out, record=record, **kwargs
+            )
+        if data[0] in (_LOSSLESS_FRAME, _PASSTHROUGH_FRAME):
+            recovered_data = self._backward_raw(data, transformer_metadata)
+            if out is None:
+                return recovered_data
+            out[...] = recovered_data.reshape(out.shape)
+            return out.reshape(recovered_data.shape)
+        if data[0] == _PQ_FRAME:
+            recovered_data = self._backward_pq(data[1:], transformer_metadata, **kwargs)
+            if out is None:
+                return recovered_data
+            out[...] = recovered_data.reshape(out.shape)
+            return out.reshape(recovered_data.shape)
+        return self._backward_stages(
+            data[1:], transformer_metadata, out=out, record=record, **kwargs
+        )
+
+    def _forward_stages(self, data, **kwargs):
+        """Run the transformer chain, recording every stage when instrumented."""
+        if self.recorder is None:
+            return super().forward(data, **kwargs)
+        tensor_name = kwargs.get("tensor_name")
+        transformer_metadata = []
+        for transformer in self.transformers:
+            stage = type(transformer).__name__
+            with self.recorder.measure(tensor_name, stage, "forward", data) as result:
+                result["output"], metadata = transformer.forward(data=data, **kwargs)
+                if transformer.lossy:
+                    result["error"] = lambda: relative_error(
+                        data, transformer.backward(result["output"], dict(metadata))
+                    )
+            data = result["output"]
+            transformer_metadata.append(metadata)
+        return data, transformer_metadata
+
+    def _backward_stages(self, data, transformer_metadata, record=False, **kwargs):
+        """Run the transformer chain backwards, recording every stage when record is set."""
+        if not record:
+            return super().backward(data, transformer_metadata, **kwargs)
+        tensor_name = kwargs.get("tensor_name")
+        for transformer in self.transformers[::-1]:
+            stage = type(transformer).__name__
+            with self.recorder.measure(tensor_name, stage, "backward", data) as result:
+                result["output"] = transformer.backward(
+                    data=data, metadata=transformer_metadata.pop(), **kwargs
+                )
+            data = result["output"]
+        return data
+
+    def accumulate(self, data, transformer_metadata, out=None, weight=1.0, **kwargs):
+        """Add weight times a decompressed payload to an accumulator, in place.
+
+        Stages frames are never expanded to a dense tensor: the codebook or
+        the scales of the quantizer are multiplied by the weight and the
+        decoded values are scatter-added at their indices. Summing the
+        payloads of all collaborators into one accumulator thus takes memory
+        of a single tensor and time proportional to the kept components.
+
+        Args:
+            data: The compressed payload.
+            transformer_metadata: The metadata for the transformation.
+            out: C-contiguous float array of the tensor size to add into,
+                None to start from zeros (Default=None).
+            weight (float): Factor applied to the payload (Default=1.0).
+            **kwargs: Additional keyword arguments for the transformation.
+
+        Returns:
+            out: the accumulator with the shape of the tensor.
+        """
+        data = memoryview(data)
+        transformer_metadata = list(transformer_metadata)
+        if data[0] == _DELTA_FRAME:
+            reference = self._verified_reference(kwargs.get("tensor_name"), transformer_metadata)
+            out = self.accumulate(data[1:], transformer_metadata[1:], out, weight, **kwargs)
+            accumulator = out.reshape(-1)
+            accumulator += reference.data.reshape(-1) * weight
+            return out
+        if data[0] in (_LOSSLESS_FRAME, _PASSTHROUGH_FRAME, _PQ_FRAME):
+            # dense frames are decoded whole
+            recovered_data = self._backward(data, list(transformer_metadata), **kwargs)
+            if out is None:
+                out = np.zeros(recovered_data.shape, dtype=np.float32)
+            accumulator = out.reshape(-1)
+            accumulator += recovered_data.reshape(-1) * weight
+            return accumulator.reshape(recovered_data.shape)
+        if out is None:
+            out = np.zeros(list(transformer_metadata[0]["int_list"]), dtype=np.float32)
+        if data[0] == _CHUNKED_FRAME:
+            return self._accumulate_chunked(data[1:], transformer_metadata, out, weight, **kwargs)
+        return self._accumulate_stages(data[1:], transformer_metadata, out, weight, **kwargs)
+
+    def _accumulate_stages(self, data, transformer_metadata, out, weight, **kwargs):
+        """Decode a stages payload down to its sparse values and scatter-add them."""
+        sparsity, weighted = self.transformers[0], False
+        for transformer in self.transformers[:0:-1]:
+            stage_kwargs = kwargs
+            if isinstance(transformer, (KmeansTransformer, QSGDTransformer)):
+                # fold the weight into the codebook or the scales
+                stage_kwargs, weighted = dict(kwargs, weight=weight), True
+            data = transformer.backward(
+                data=data, metadata=transformer_metadata.pop(), **stage_kwargs
+            )
+        return sparsity.accumulate(
+            data, transformer_metadata.pop(), out, weight=1.0 if weighted else weight
+        )
+
+    def forward_batch(self, tensor_dict, **kwargs):
+        """Compress a whole tensor dict on a pool of batch_workers workers.
+
+        Each tensor goes through forward, with its name passed as tensor_name.
+        With a rate controller, the settings of all tensors are planned
+        together so that the byte budget applies to the whole dict.
+
+        Args:
+            tensor_dict: dictionary from tensor names to numpy arrays.
+            **kwargs: Additional keyword arguments for the transformation.
+
+        Returns:
+            dictionary from tensor names to (data, transformer_metadata) tuples.
+        """
+        names = list(tensor_dict)
+        tensor_kwargs = [kwargs] * len(names)
+        controlled = self.rate_controller is not None and "p_sparsity" not in kwargs
+        if controlled:
+            skc_names = [name for name in names if self._route(name, tensor_dict[name]) == "skc"]
+            # plan on what the stages will encode, i.e. the deltas of delta frames
+            encoded = {
+                name: self._encoded_tensor(name, tensor_dict[name], kwargs.get("reference_round"))
+                for name in skc_names
+            }
+            plan = self.rate_controller.plan(encoded)
+            tensor_kwargs = [
+                (
+                    dict(kwargs, p_sparsity=plan[name][0], n_clusters=plan[name][1])
+                    if name in plan
+                    else kwargs
+                )
+                for name in names
+            ]
+        with self._batch_pool() as executor:
+            results = dict(
+                zip(
+                    names,
+                    executor.map(
+                        self._batch_task(_forward_tensor),
+                        names,
+                        [tensor_dict[name] for name in names],
+                        tensor_kwargs,
+                        self._task_seeds(len(names)),
+                    ),
+                )
+            )
+        if controlled:
+            for name in skc_names:
+                self._observe(name, encoded[name], *results[name])
+        return results
+
+    def backward_batch(self, payload_dict, **kwargs):
+        """Decompress a whole dict of payloads on a pool of batch_workers workers.
+
+        Args:
+            payload_dict: dictionary from tensor names to (data,
+                transformer_metadata) tuples, as returned by forward_batch.
+            **kwargs: Additional keyword arguments for the transformation.
+
+        Returns:
+            dictionary from tensor names to numpy arrays.
+        """
+        names = list(payload_dict)
+        with self._batch_pool() as executor:
+            results = executor.map(
+                self._batch_task(_backward_tensor),
+                names,
+                [bytes(payload_dict[name][0]) for name in names],
+                [[_plain_metadata(m) for m in payload_dict[name][1]] for name in names],
+                [kwargs] * len(names),
+            )
+            return dict(zip(names, results))
+
+    def set_reference(self, tensor_name, round_number, data):
+        """Set the reference of a tensor for delta encoding.
+
+        Both ends set the same tensor, e.g. the aggregated model as
+        decompressed by the collaborators, so that the references agree to
+        the bit.
+
+        Args:
+            tensor_name (str): name of the tensor.
+            round_number (int): round the tensor was agreed on.
+            data: a numpy array.
+
+        Returns:
+            reference: the stored Reference.
+        """
+        if self.references is None:
+            raise ValueError("References are only kept with delta_encoding")
+        return self.references.put(tensor_name, round_number, data)
+
+    def _delta_reference(self, tensor_name, data, reference_round):
+        """Reference to encode a tensor against, or None to send it in full."""
+        if self.references is None or tensor_name is None:
+            return None
+        # lossless routes would not recover the exact values from a float delta
+        if self._route(tensor_name, data) != "skc":
+            return None
+        if not np.issubdtype(np.asarray(data).dtype, np.floating):
+            return None
+        reference = self.references.get(tensor_name)
+        if reference is None or reference.data.shape != np.shape(data):
+            return None
+        if reference_round is not None and reference.round_number != reference_round:
+            return None
+        return reference
+
+    def _encoded_tensor(self, tensor_name, data, reference_round=None):
+        """Tensor the stages encode: its delta when it has a reference, else itself."""
+        reference = self._delta_reference(tensor_name, data, reference_round)
+        return data if reference is None else _delta(data, reference)
+
+    def _verified_reference(self, tensor_name, transformer_metadata):
+        """Reference named by the metadata of a delta frame, checked against the cache."""
+        round_number, *digest = transformer_metadata[0]["int_list"]
+        if self.references is None:
+            raise ReferenceMismatchError("Delta payloads are only decoded with delta_encoding")
+        return self.references.verify(tensor_name, round_number, digest)
+
+    def _route(self, tensor_name, data):
+        """Route of a tensor under the compression policy."""
+        if self.policy is None:
+            return "skc"
+        return self.policy.route(tensor_name, data)
+
+    def _forward_raw(self, data, lossless):
+        """Send the raw bytes of a tensor, compressed by the codec when lossless."""
+        data = np.asarray(data)
+        dtype_str = data.dtype.str.encode()
+        header = bytes((_LOSSLESS_FRAME if lossless else _PASSTHROUGH_FRAME, len(dtype_str)))
+        transformer_metadata = [{"int_list": list(data.shape)}]
+        if lossless and self.lossless_shuffle is not None:
+            data_bytes = memoryview(shuffle(data, self.lossless_shuffle))
+            transformer_metadata.append({"int_list": [SHUFFLE_MODES.index(self.lossless_shuffle)]})
+        else:
+            data_bytes = memoryview(np.ascontiguousarray(data).reshape(-1)).cast("B")
+        if lossless:
+            data_bytes = codecs.compress(
+                data_bytes,
+                codec=self.codec,
+                level=self.codec_level,
+                throughput_target=self.codec_throughput,
+                kind=(dtype_str, self.lossless_shuffle),
+            )
+        return b"".join((header, dtype_str, data_bytes)), transformer_metadata
+
+    def _backward_raw(self, data, transformer_metadata):
+        """Recover a tensor from a lossless or passthrough frame."""
+        data_shape = list(transformer_metadata[0].get("int_list") or [])
+        dtype_end = 2 + data[1]
+        dtype = np.dtype(bytes(data[2:dtype_end]).decode())
+        data_bytes = data[dtype_end:]
+        if data[0] == _LOSSLESS_FRAME:
+            data_bytes = codecs.decompress(data_bytes)
+        if len(transformer_metadata) > 1:
+            mode = SHUFFLE_MODES[transformer_metadata[1]["int_list"][0]]
+            count = int(np.prod(data_shape))
+            return unshuffle(data_bytes, dtype, count, mode).reshape(data_shape)
+        return np.frombuffer(data_bytes, dtype=dtype).reshape(data_shape)
+
+    def _forward_pq(self, data, **kwargs):
+        """Send the product quantization codes of a dense tensor through the codec."""
+        pq_data, pq_metadata = self.pq_transformer.forward(data, **kwargs)
+        data_bytes, codec_metadata = self.transformers[-1].forward(pq_data, **kwargs)
+        return bytes((_PQ_FRAME,)) + data_bytes, [pq_metadata, codec_metadata]
+
+    def _backward_pq(self, data, transformer_metadata, **kwargs):
+        """Recover a tensor from a product quantization frame."""
+        pq_data = self.transformers[-1].backward(data, transformer_metadata[1], **kwargs)
+        return self.pq_transformer.backward(pq_data, transformer_metadata[0], **kwargs)
+
+    def _observe(self, tensor_name, data, data_bytes, transformer_metadata):
+        """Report the size and relative error of a compressed tensor to the rate controller.
+
+        Delta frames are measured against the delta they encode.
+        """
+        n_bytes = len(data_bytes)
+        if data_bytes[0] == _DELTA_FRAME:
+            data_bytes, transformer_metadata = memoryview(data_bytes)[1:], transformer_metadata[1:]
+        recovered = self._backward(data_bytes, list(transformer_metadata), tensor_name=tensor_name)
+        original = np.asarray(data, dtype=np.float32)
+        energy = float(np.vdot(original, original))
+        if energy > 0:
+            error = original - recovered.reshape(original.shape)
+            self.rate_controller.update(tensor_name, float(np.vdot(error, error)) / energy, n_bytes)
+
+    def _batch_pool(self):
+        """Create the worker pool of the batch entry points.
+
+        Worker processes receive a copy of the pipeline once, when they start,
+        so that the tasks only carry the tensors.
+        """
+        if self.batch_executor == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.batch_workers,
+                initializer=_install_worker_pipeline,
+                initargs=(self,),
+            )
+        return ThreadPoolExecutor(max_workers=self.batch_workers)
+
+    def _task_seeds(self, n_tasks):
+        """Seed sequences of the stochastic rounding of n_tasks batch tasks.
+
+        Worker processes hold copies of the pipeline, so the parent spawns a
+        fresh stream for every task. Threads share the pipeline and need none.
+        """
+        quantizer = self.transformers[1] if len(self.transformers) > 1 else None
+        if self.batch_executor != "process" or not isinstance(quantizer, QSGDTransformer):
+            return [None] * n_tasks
+        return quantizer.spawn_seeds(n_tasks)
+
+    def _batch_task(self, function):
+        """Bind a batch task to this pipeline, unless it runs in worker processes."""
+        if self.batch_executor == "process":
+            return function
+        return functools.partial(function, pipeline=self)
+
+    def _forward_chunked(self, data, tensor_name=None, **kwargs):
+        """Compress fixed-size blocks of the flattened tensor on a thread pool.
+
+        Only views of the input are handed to the workers, so peak memory is
+        bounded by chunk_size times n_workers temporaries.
+        """
+        flatten_data = np.ravel(data)
+        starts = range(0, flatten_data.shape[0], self.chunk_size)
+
+        def forward_block(start):
+            block = flatten_data[start : start + self.chunk_size]
+            block_name = None if tensor_name is None else f"{tensor_name}/{start}"
+            return self._forward_stages(block, tensor_name=block_name, **kwargs)
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            blocks = list(executor.map(forward_block, starts))
+        model_proto = base_pb2.ModelProto(
+            tensors=[
+                base_pb2.NamedTensor(
+                    name=str(i),
+                    data_bytes=block_bytes,
+                    transformer_metadata=[_metadata_to_proto(m) for m in block_metadata],
+                )
+                for i, (block_bytes, block_metadata) in enumerate(blocks)
+            ]
+        )
+        transformer_metadata = [
+            {"int_list": list(np.shape(data))},
+            {"int_list": [self.chunk_size]},
+        ]
+        return model_proto.SerializeToString(), transformer_metadata
+
+    def _backward_chunked(self, data, transformer_metadata, out=None, record=False, **kwargs):
+        """Decompress the blocks of a chunked frame on a thread pool, in place."""
+        data_shape = list(transformer_metadata[0]["int_list"])
+        chunk_size = transformer_metadata[1]["int_list"][0]
+        model_proto = base_pb2.ModelProto.FromString(data)
+        bytes_dict, metadata_dict, _ = utils.model_proto_to_bytes_and_metadata(model_proto)
+        if out is None:
+            out = np.empty(int(np.prod(data_shape)), dtype=np.float32)
+        recovered_data = out.reshape(-1)
+
+        def backward_block(i):
+            block_metadata = list(metadata_dict[str(i)])
+            self._backward_stages(
+                bytes_dict[str(i)],
+                block_metadata,
+                out=recovered_data[i * chunk_size : (i + 1) * chunk_size],
+                record=record,
+                **kwargs,
+            )
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            list(executor.map(backward_block, range(len(bytes_dict))))
+        return recovered_data.reshape(data_shape)
+
+    def _accumulate_chunked(self, data, transformer_metadata, out, weight, **kwargs):
+        """Accumulate the blocks of a chunked frame on a thread pool, in place."""
+        data_shape = list(transformer_metadata[0]["int_list"])
+        chunk_size = transformer_metadata[1]["int_list"][0]
+        model_proto = base_pb2.ModelProto.FromString(data)
+        bytes_dict, metadata_dict, _ = utils.model_proto_to_bytes_and_metadata(model_proto)
+        accumulator = out.reshape(-1)
+
+        def accumulate_block(i):
+            self._accumulate_stages(
+                bytes_dict[str(i)],
+                list(metadata_dict[str(i)]),
+                accumulator[i * chunk_size : (i + 1) * chunk_size],
+                weight,
+                **kwargs,
+            )
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            list(executor.map(accumulate_block, range(len(bytes_dict))))
+        return accumulator.reshape(data_shape)
+
+
+def _check_array_backend(array_backend):
+    """Raise when an array backend is unknown or its package is not installed."""
+    if array_backend not in ARRAY_BACKENDS:
+        raise ValueError(
+            f"Unknown array backend '{array_backend}', expected one of {ARRAY_BACKENDS}"
+        )
+    if array_backend == "torch" and util.find_spec("torch") is None:
+        raise ImportError("The 'torch' array backend requires the torch package")
+
+
+def _block_layout(data):
+    """Offset item size, block size and count per block of a block-wise SparseTensor.
+
+    Returns:
+        (offset_itemsize, block_size, k_block), or None when the indices of
+        data are not k_block per block but for a shorter last block.
+    """
+    if data.block_size is None or data.indices.shape[0] == 0:
+        return None
+    blocks = data.indices // data.block_size
+    k_block = int(np.bincount(blocks).max())
+    if not np.array_equal(blocks, np.arange(blocks.shape[0]) // k_block):
+        return None
+    offset_itemsize = 1 if data.block_size <= _MAX_OFFSET_BLOCK[1] else 2
+    return offset_itemsize, data.block_size, k_block
+
+
+def _sample_excess_error(data, codes, sample, codebook):
+    """Mean squared error on the whole array in excess of the one on the sample."""
+    codebook = np.asarray(codebook, dtype=np.float64)
+    data_error = np.mean(np.square(data - codebook[codes]))
+    sample_error = np.mean(np.square(sample - codebook[assign_1d(sample, codebook)]))
+    return max(float(data_error - sample_error), 0.0)
+
+
+def _delta(data, reference):
+    """Difference between a tensor and its reference, in float32."""
+    return np.subtract(data, reference.data.reshape(np.shape(data)), dtype=np.float32)
+
+
+# pipeline of a batch worker process, installed by _install_worker_pipeline
+_worker_pipeline = None
+
+
+def _install_worker_pipeline(pipeline):
+    """Keep the pipeline of a batch worker process for its tasks."""
+    global _worker_pipeline
+    _worker_pipeline = pipeline
+
+
+def _forward_tensor(tensor_name, data, kwargs, seed_sequence=None, pipeline=None):
+    """Compress one tensor of a batch, by default with the worker pipeline."""
+    pipeline = _worker_pipeline if pipeline is None else pipeline
+    if seed_sequence is not None:
+        pipeline.transformers[1].reseed(seed_sequence)
+    return pipeline.forward(data, tensor_name=tensor_name, **kwargs)
+
+
+def _backward_tensor(tensor_name, data, transformer_metadata, kwargs, pipeline=None):
+    """Decompress one tensor of a batch, by default with the worker pipeline."""
+    pipeline = _worker_pipeline if pipeline is None else pipeline
+    return pipeline.backward(data, transformer_metadata, tensor_name=tensor_name, **kwargs)
+
+
+def _plain_metadata(metadata):
+    """Copy transformer metadata, possibly backed by protobuf containers, to plain types."""
+    plain = {}
+    if metadata.get("int_to_float"):
+        plain["int_to_float"] = dict(metadata["int_to_float"])
+    if metadata.get("int_list"):
+        plain["int_list"] = list(metadata["int_list"])
+    if metadata.get("bool_list"):
+        plain["bool_list"] = list(metadata["bool_list"])
+    return plain
+
+
+def _metadata_to_proto(metadata):
+    """Convert a transformer metadata dictionary to a MetadataProto."""
+    return base_pb2.MetadataProto(
+        int_to_float=metadata.get("int_to_float") or {},
+        int_list=metadata.get("int_list") or [],
+        bool_list=metadata.get("bool_list") or [],
+    )
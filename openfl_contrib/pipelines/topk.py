@@ -0,0 +1,140 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Top-k selection module."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+TOPK_METHODS = ("sort", "partition")
+
+
+def topk_indices(x, k, method="partition", n_workers=1, chunk_size=1 << 20):
+    """Select the indices of the k largest-magnitude elements of x.
+
+    Both methods return the same index set. Ties on the k-th largest magnitude
+    are resolved in favour of the larger indices, which matches a stable
+    ascending sort of the magnitudes.
+
+    Args:
+        x: a flat numpy array.
+        k (int): number of elements to keep.
+        method (str): 'sort' for a full O(n log n) argsort, 'partition' for
+            an O(n) partial selection (Default='partition').
+        n_workers (int): number of threads used by the 'partition' method
+            (Default=1).
+        chunk_size (int): number of elements processed by one thread at a time
+            (Default=2**20).
+
+    Returns:
+        indices: sorted int64 array with the indices of the top-k components.
+    """
+    if method not in TOPK_METHODS:
+        raise ValueError(f"Unknown top-k method '{method}', expected one of {TOPK_METHODS}")
+    n_elements = x.shape[0]
+    k = min(max(int(k), 0), n_elements)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    if k == n_elements:
+        return np.arange(n_elements, dtype=np.int64)
+    if method == "sort":
+        idx = np.argsort(np.abs(x), kind="stable")
+        return np.sort(idx[n_elements - k :]).astype(np.int64, copy=False)
+    return _partition_topk(x, k, n_workers, chunk_size)
+
+
+def block_topk_indices(x, k, block_size, n_workers=1, chunk_size=1 << 20):
+    """Select the indices of the k largest-magnitude elements of every block of x.
+
+    x is cut into blocks of block_size consecutive elements, and the last,
+    shorter block keeps k * length / block_size elements, rounded to the
+    nearest integer with ties rounded down, so that it does not add to the
+    overshoot of the full blocks. No block keeps more than k elements, and the
+    i-th index belongs to block i // k.
+    Blocks are selected on n_workers threads, about chunk_size elements at a
+    time. Ties on the k-th largest magnitude of a block are resolved by
+    np.argpartition, not like topk_indices.
+
+    Args:
+        x: a flat numpy array.
+        k (int): number of elements to keep per block, at most block_size.
+        block_size (int): number of elements per block.
+        n_workers (int): number of threads (Default=1).
+        chunk_size (int): number of elements processed by one thread at a time
+            (Default=2**20).
+
+    Returns:
+        indices: sorted int64 array with the indices of the kept components.
+    """
+    n_elements = x.shape[0]
+    k = min(max(int(k), 0), block_size)
+    n_full = n_elements // block_size
+    tail = n_elements - n_full * block_size
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    rows = max(1, chunk_size // block_size)
+
+    def chunk_indices(start):
+        end = min(start + rows, n_full)
+        blocks = np.abs(x[start * block_size : end * block_size]).reshape(-1, block_size)
+        if k < block_size:
+            offsets = np.argpartition(blocks, block_size - k, axis=1)[:, block_size - k :]
+        else:
+            offsets = np.broadcast_to(np.arange(block_size), blocks.shape).copy()
+        offsets.sort(axis=1)
+        offsets += np.arange(start, end, dtype=np.int64)[:, None] * block_size
+        return offsets.reshape(-1)
+
+    with ThreadPoolExecutor(max_workers=max(1, n_workers)) as executor:
+        chunks = list(executor.map(chunk_indices, range(0, n_full, rows)))
+    if tail:
+        k_tail = -((block_size - 2 * k * tail) // (2 * block_size))
+        tail_indices = topk_indices(x[n_full * block_size :], k_tail, method="sort")
+        chunks.append(tail_indices + n_full * block_size)
+    if not chunks:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(chunks).astype(np.int64, copy=False)
+
+
+def _partition_topk(x, k, n_workers, chunk_size):
+    """Select the top-k magnitudes with chunked partial selection.
+
+    Every chunk keeps its own top-k candidates, whose union is guaranteed to
+    contain the k-th largest magnitude of the whole array. The final index set
+    is then gathered with a threshold scan over the chunks. Magnitudes are
+    computed one chunk at a time, so no temporary spans the whole array.
+    """
+    n_elements = x.shape[0]
+    bounds = [(s, min(s + chunk_size, n_elements)) for s in range(0, n_elements, chunk_size)]
+
+    def chunk_candidates(bound):
+        start, end = bound
+        chunk = np.abs(x[start:end])
+        kc = min(k, end - start)
+        if kc < end - start:
+            chunk.partition(end - start - kc)
+        # copy the candidates so that the chunk buffer is released
+        return chunk[end - start - kc :].copy()
+
+    def chunk_scan(bound):
+        start, end = bound
+        chunk = np.abs(x[start:end])
+        return np.flatnonzero(chunk > threshold) + start, np.flatnonzero(chunk == threshold) + start
+
+    with ThreadPoolExecutor(max_workers=max(1, n_workers)) as executor:
+        if len(bounds) > 1 and len(bounds) * k < n_elements:
+            candidates = np.concatenate(list(executor.map(chunk_candidates, bounds)))
+        else:
+            candidates = np.abs(x)
+        candidates.partition(candidates.shape[0] - k)
+        threshold = candidates[candidates.shape[0] - k]
+        del candidates
+        above, ties = zip(*executor.map(chunk_scan, bounds))
+
+    above = np.concatenate(above)
+    ties = np.concatenate(ties)
+    n_ties = k - above.shape[0]
+    indices = np.concatenate([above, ties[ties.shape[0] - n_ties :]])
+    indices.sort()
+    return indices.astype(np.int64, copy=False)
@@ -0,0 +1,106 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+
+"""Torch array backend module.
+
+Runs the top-k selection, the nearest-centroid assignment and the unique
+fallback of the SKC transformers with torch.topk, torch.bucketize and
+torch.unique, which use the intra-op thread pool of torch (see
+torch.set_num_threads). Arrays are shared with numpy without copies, and the
+results are numpy arrays of the dtypes the numpy backend returns, so the
+payloads stay identical and any receiver can decode them.
+
+This module requires the `torch` package and is only imported by the
+transformers configured with array_backend='torch'.
+"""
+
+import warnings
+
+import numpy as np
+import torch
+
+
+def to_numpy(data):
+    """View a torch tensor as a numpy array, other inputs are returned unchanged.
+
+    CPU tensors share their memory with the returned array, tensors on other
+    devices are copied to the CPU.
+
+    Args:
+        data: a torch tensor or a numpy array.
+
+    Returns:
+        data: a numpy array.
+    """
+    if isinstance(data, torch.Tensor):
+        return data.detach().cpu().numpy()
+    return data
+
+
+def topk_indices(x, k):
+    """Select the indices of the k largest-magnitude elements of x with torch.topk.
+
+    Ties on the k-th largest magnitude may be resolved differently than by
+    openfl_contrib.pipelines.topk.topk_indices.
+
+    Args:
+        x: a flat numpy array.
+        k (int): number of elements to keep.
+
+    Returns:
+        indices: sorted int64 array with the indices of the top-k components.
+    """
+    n_elements = x.shape[0]
+    k = min(max(int(k), 0), n_elements)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    if k == n_elements:
+        return np.arange(n_elements, dtype=np.int64)
+    indices = torch.topk(_as_tensor(x).abs(), k, sorted=False).indices
+    return torch.sort(indices).values.numpy()
+
+
+def assign_1d(x, centroids):
+    """Assign every element of x to its nearest centroid with torch.bucketize.
+
+    Matches openfl_contrib.pipelines.quantization.assign_1d, including ties
+    at the midpoints, which go to the lower centroid.
+
+    Args:
+        x: a numpy array.
+        centroids: ascending numpy array of centroids.
+
+    Returns:
+        labels: int64 array with the index of the nearest centroid.
+    """
+    midpoints = (centroids[1:] + centroids[:-1]) / 2
+    # compare in the common dtype, as np.searchsorted does
+    dtype = np.result_type(x, midpoints)
+    labels = torch.bucketize(
+        _as_tensor(np.asarray(x, dtype=dtype)),
+        _as_tensor(np.asarray(midpoints, dtype=dtype)),
+        right=False,
+    )
+    return labels.numpy()
+
+
+def unique_inverse(x):
+    """Sorted unique values of x and the index of every element in them.
+
+    Args:
+        x: a numpy array.
+
+    Returns:
+        values: sorted numpy array of the unique values.
+        inverse: int64 array shaped like x.
+    """
+    values, inverse = torch.unique(_as_tensor(x), sorted=True, return_inverse=True)
+    return values.numpy(), inverse.numpy()
+
+
+def _as_tensor(x):
+    """Share the memory of a numpy array with a CPU tensor, read-only arrays included."""
+    with warnings.catch_warnings():
+        # torch warns about read-only arrays, which are never written here
+        warnings.simplefilter("ignore", UserWarning)
+        return torch.from_numpy(np.ascontiguousarray(x))
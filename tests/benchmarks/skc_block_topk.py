@@ -0,0 +1,67 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+"""Compare block-wise and global top-k sparsification of SKCPipeline.
+
+For every size, p and block size, reports the top-k selection time, the
+SKCPipeline forward time, the payload size, the relative reconstruction error
+and the share of the global top-k indices that the block-wise selection keeps.
+Block size 0 stands for the global selection.
+
+Usage: python -m tests.benchmarks.skc_block_topk --sizes 1000000 10000000 --blocks 256 4096
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines.topk import block_topk_indices, topk_indices
+from tests.benchmarks.skc_topk import best_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**5, 10**6, 10**7])
+    parser.add_argument('--p', type=float, nargs='+', default=[0.01, 0.1])
+    parser.add_argument('--blocks', type=int, nargs='+', default=[256, 4096, 65536])
+    parser.add_argument('--clusters', type=int, default=6)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>10} {'p':>6} {'block':>6} {'top-k [s]':>10} {'forward [s]':>12}"
+          f" {'bytes':>10} {'rel. error':>11} {'overlap':>8}")
+    for size in args.sizes:
+        x = rng.standard_normal(size).astype(np.float32)
+        energy = float(np.dot(x, x))
+        for p in args.p:
+            k = int(np.ceil(size * p))
+            global_idx = topk_indices(x, k, n_workers=args.workers)
+            for block_size in [0] + args.blocks:
+                if block_size:
+                    k_block = int(np.ceil(block_size * p))
+                    select = lambda: block_topk_indices(  # noqa: E731
+                        x, k_block, block_size, n_workers=args.workers
+                    )
+                else:
+                    select = lambda: topk_indices(x, k, n_workers=args.workers)  # noqa: E731
+                tp = SKCPipeline(
+                    p_sparsity=p,
+                    n_clusters=args.clusters,
+                    topk_block_size=block_size or None,
+                    n_workers=args.workers,
+                )
+                t_select = best_time(select, args.repeat)
+                t_forward = best_time(lambda: tp.forward(x), args.repeat)
+                data_fwd, transformer_metadata = tp.forward(x)
+                error = x - tp.backward(data_fwd, transformer_metadata)
+                overlap = np.intersect1d(select(), global_idx).shape[0] / max(k, 1)
+                print(f'{size:>10} {p:>6} {block_size or "global":>6} {t_select:>10.4f}'
+                      f' {t_forward:>12.4f} {len(data_fwd):>10}'
+                      f' {float(np.dot(error, error)) / energy:>11.4f} {overlap:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+"""Benchmark every SKC transformer stage and the full SKCPipeline.
+
+For each tensor and (p_sparsity, n_clusters) setting, every stage is fed the
+output of the previous one and the report records forward and backward
+throughput, compression ratio, relative reconstruction error and peak traced
+memory. Results are written as JSON, to compare releases.
+
+Usage:
+    python -m tests.benchmarks.skc_suite --sizes 1000 1000000 100000000 --output skc.json
+    python -m tests.benchmarks.skc_suite --model-file weights.npz --p 0.01 --clusters 16
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+import openfl_contrib
+from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines.instrumentation import relative_error
+from openfl_contrib.pipelines.skc_pipeline import SparseTensor
+
+# layer shapes of the torch_cnn_mnist workspace model
+MNIST_CNN_SHAPES = {
+    'conv1.weight': (20, 1, 2, 2),
+    'conv1.bias': (20,),
+    'conv2.weight': (50, 20, 5, 5),
+    'conv2.bias': (50,),
+    'fc1.weight': (500, 800),
+    'fc1.bias': (500,),
+    'fc2.weight': (10, 500),
+    'fc2.bias': (10,),
+}
+
+
+def synthetic_tensors(sizes, seed=0):
+    """Gaussian tensors of the given element counts."""
+    rng = np.random.default_rng(seed)
+    return {f'gaussian_{size}': rng.standard_normal(size, dtype=np.float32) for size in sizes}
+
+
+def mnist_cnn_tensors(seed=0):
+    """Tensors shaped like the MNIST CNN model, with fan-in scaled initialization."""
+    rng = np.random.default_rng(seed)
+    return {
+        name: (rng.standard_normal(shape) / np.sqrt(np.prod(shape[1:]) or 1)).astype(np.float32)
+        for name, shape in MNIST_CNN_SHAPES.items()
+    }
+
+
+def nbytes(data):
+    """Size of a stage output."""
+    if isinstance(data, SparseTensor):
+        return data.indices.nbytes + data.values.nbytes
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    return len(data)
+
+
+def measure(fn, repeat):
+    """Best wall time of fn over repeat runs, and its peak traced memory."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(timings), peak
+
+
+def bench_tensor(name, data, p, n_clusters, repeat, codec):
+    """Benchmark the stages and the pipeline on one tensor."""
+    pipeline = SKCPipeline(p_sparsity=p, n_clusters=n_clusters, codec=codec)
+    records = []
+
+    stage_input = data
+    for transformer in pipeline.transformers:
+        (output, metadata), forward_time, forward_peak = measure(
+            lambda: transformer.forward(stage_input), repeat
+        )
+        recovered, backward_time, backward_peak = measure(
+            lambda: transformer.backward(output, dict(metadata)), repeat
+        )
+        records.append(
+            {
+                'stage': type(transformer).__name__,
+                'input_bytes': nbytes(stage_input),
+                'output_bytes': nbytes(output),
+                'forward_seconds': forward_time,
+                'backward_seconds': backward_time,
+                'forward_peak_bytes': forward_peak,
+                'backward_peak_bytes': backward_peak,
+            }
+        )
+        stage_input = output
+
+    (payload, metadata), forward_time, forward_peak = measure(
+        lambda: pipeline.forward(data), repeat
+    )
+    recovered, backward_time, backward_peak = measure(
+        lambda: pipeline.backward(payload, list(metadata)), repeat
+    )
+    records.append(
+        {
+            'stage': 'SKCPipeline',
+            'input_bytes': data.nbytes,
+            'output_bytes': len(payload),
+            'forward_seconds': forward_time,
+            'backward_seconds': backward_time,
+            'forward_peak_bytes': forward_peak,
+            'backward_peak_bytes': backward_peak,
+            'relative_error': relative_error(data, recovered),
+        }
+    )
+
+    for record in records:
+        record.update(
+            tensor=name,
+            shape=list(data.shape),
+            elements=int(data.size),
+            p_sparsity=p,
+            n_clusters=n_clusters,
+            forward_mb_per_s=record['input_bytes'] / max(record['forward_seconds'], 1e-9) / 1e6,
+            backward_mb_per_s=record['input_bytes'] / max(record['backward_seconds'], 1e-9) / 1e6,
+            compression_ratio=record['input_bytes'] / max(record['output_bytes'], 1),
+        )
+    return records
+
+
+def environment():
+    """Versions and hardware the report was produced on."""
+    return {
+        'openfl_contrib': openfl_contrib.__version__,
+        'numpy': np.__version__,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**3, 10**4, 10**5, 10**6])
+    parser.add_argument('--p', type=float, nargs='+', default=[0.01, 0.1])
+    parser.add_argument('--clusters', type=int, nargs='+', default=[6, 16])
+    parser.add_argument('--no-mnist', action='store_true', help='skip the MNIST CNN tensors')
+    parser.add_argument('--model-file', help='.npz file of real model tensors')
+    parser.add_argument('--codec', default='gzip')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON report path (default: stdout)')
+    args = parser.parse_args(argv)
+
+    tensor_dicts = {'synthetic': synthetic_tensors(args.sizes)}
+    if not args.no_mnist:
+        tensor_dicts['mnist_cnn'] = mnist_cnn_tensors()
+    if args.model_file:
+        with np.load(args.model_file) as model:
+            tensor_dicts[os.path.basename(args.model_file)] = {
+                name: model[name].astype(np.float32) for name in model.files
+            }
+
+    results = []
+    for dict_name, tensor_dict in tensor_dicts.items():
+        for name, data in tensor_dict.items():
+            for p in args.p:
+                for n_clusters in args.clusters:
+                    for record in bench_tensor(name, data, p, n_clusters, args.repeat, args.codec):
+                        results.append(dict(record, tensor_dict=dict_name))
+
+    report = json.dumps({'environment': environment(), 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
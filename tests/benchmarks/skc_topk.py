@@ -0,0 +1,49 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+"""Compare the top-k selection engines of SparsityTransformer.
+
+Usage: python -m tests.benchmarks.skc_topk --sizes 1000000 10000000 --p 0.01 0.1
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from openfl_contrib.pipelines.topk import topk_indices
+
+
+def best_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**4, 10**5, 10**6, 10**7])
+    parser.add_argument('--p', type=float, nargs='+', default=[0.01, 0.05, 0.1])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>12} {'p':>6} {'sort [s]':>10} {'partition [s]':>14} {'speedup':>8}")
+    for size in args.sizes:
+        x = rng.standard_normal(size).astype(np.float32)
+        for p in args.p:
+            k = int(np.ceil(size * p))
+            t_sort = best_time(lambda: topk_indices(x, k, method='sort'), args.repeat)
+            t_part = best_time(
+                lambda: topk_indices(x, k, method='partition', n_workers=args.workers),
+                args.repeat,
+            )
+            assert np.array_equal(
+                topk_indices(x, k, method='sort'),
+                topk_indices(x, k, method='partition', n_workers=args.workers),
+            )
+            print(f'{size:>12} {p:>6} {t_sort:>10.4f} {t_part:>14.4f} {t_sort / t_part:>7.1f}x')
@@ -0,0 +1,76 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+"""SparseWeightedAverage tests."""
+
+import tracemalloc
+
+import numpy as np
+from openfl.utilities.types import LocalTensor
+
+from openfl_contrib.interface.aggregation_functions import (
+    CustomWeightedAverage,
+    SparseWeightedAverage,
+)
+from openfl_contrib.pipelines import SKCPipeline, skc_pipeline
+
+
+def test_sparse_weighted_average_matches_dense_average():
+    """Test that payloads aggregate like their decompressed tensors, with little memory."""
+    pipeline = SKCPipeline(p_sparsity=0.01, n_clusters=6)
+    rng = np.random.default_rng(0)
+    payloads = [
+        pipeline.forward(rng.standard_normal((1_000, 1_000)).astype(np.float32))
+        for _ in range(8)
+    ]
+    weights = rng.uniform(1, 10, size=8)
+    compressed = [LocalTensor(f'col{i}', p, w) for i, (p, w) in enumerate(zip(payloads, weights))]
+    decompressed = [
+        LocalTensor(x.col_name, pipeline.backward(x.tensor[0], list(x.tensor[1])), x.weight)
+        for x in compressed
+    ]
+    dense = decompressed[:2]
+    aggregator = SparseWeightedAverage()
+    aggregator.pipeline = pipeline
+
+    tracemalloc.start()
+    agg_nparray = aggregator.call(compressed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    control_nparray = CustomWeightedAverage().call(decompressed)
+
+    assert agg_nparray.shape == (1_000, 1_000)
+    assert np.allclose(agg_nparray, control_nparray, atol=1e-6)
+    assert peak < 1.25 * agg_nparray.nbytes
+    # dense tensors and payloads can be mixed
+    mixed = SparseWeightedAverage(n_clusters=2).call(dense + compressed[2:])
+    assert np.allclose(mixed, control_nparray, atol=1e-6)
+    # the singleton ignores the settings of later constructions
+    assert SparseWeightedAverage(n_clusters=2) is aggregator
+    assert aggregator.pipeline is pipeline
+
+
+def test_sparse_weighted_average_of_delta_payloads():
+    """Test that delta-encoded payloads aggregate against the aggregator reference."""
+    rng = np.random.default_rng(0)
+    reference = rng.standard_normal((64, 64)).astype(np.float32)
+    updates = [
+        reference + 0.01 * rng.standard_normal((64, 64)).astype(np.float32) for _ in range(3)
+    ]
+    weights = [1.0, 2.0, 3.0]
+    settings = {'p_sparsity': 0.1, 'n_clusters': 6, 'delta_encoding': True}
+    compressed, decompressed = [], []
+    for i, (update, weight) in enumerate(zip(updates, weights)):
+        sender = SKCPipeline(**settings)
+        sender.set_reference('fc.weight', 4, reference)
+        payload = sender.forward(update, tensor_name='fc.weight', reference_round=4)
+        assert payload[0][0] == skc_pipeline._DELTA_FRAME
+        recovered = sender.backward(payload[0], list(payload[1]), tensor_name='fc.weight')
+        compressed.append(LocalTensor(f'col{i}', payload, weight))
+        decompressed.append(LocalTensor(f'col{i}', recovered, weight))
+
+    aggregator = SparseWeightedAverage()
+    aggregator.pipeline = SKCPipeline(**settings)
+    aggregator.pipeline.set_reference('fc.weight', 4, reference)
+    agg_nparray = aggregator.call(compressed, None, 'fc.weight', 5, ())
+
+    assert np.allclose(agg_nparray, CustomWeightedAverage().call(decompressed), atol=1e-6)
@@ -0,0 +1,22 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import json
+
+from tests.benchmarks import skc_suite
+
+
+def test_skc_suite_json_report(tmp_path):
+    """Test that the benchmark suite reports every stage of every case."""
+    output = tmp_path / 'skc.json'
+    skc_suite.main(['--sizes', '1000', '--p', '0.1', '--clusters', '6', '--repeat', '1',
+                    '--output', str(output)])
+
+    report = json.loads(output.read_text())
+    n_tensors = 1 + len(skc_suite.MNIST_CNN_SHAPES)
+    assert len(report['results']) == n_tensors * 5
+    pipeline_results = [r for r in report['results'] if r['stage'] == 'SKCPipeline']
+    assert len(pipeline_results) == n_tensors
+    for record in pipeline_results:
+        assert record['compression_ratio'] > 1
+        assert 0 <= record['relative_error'] < 1
+        assert record['forward_mb_per_s'] > 0 and record['forward_peak_bytes'] > 0
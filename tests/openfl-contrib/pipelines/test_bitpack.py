@@ -0,0 +1,44 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines.bitpack import pack_bits, unpack_bits
+from openfl_contrib.pipelines.skc_pipeline import BitPackTransformer, SparseTensor
+
+
+@pytest.mark.parametrize('n_bits,dtype', [(1, np.uint8), (3, np.uint8), (8, np.uint8),
+                                          (9, np.uint16), (16, np.uint16), (20, np.uint32)])
+def test_pack_bits_round_trip(n_bits, dtype):
+    """Test that packed codes unpack to the original codes."""
+    codes = np.random.default_rng(0).integers(0, 2**n_bits, size=1_001).astype(dtype)
+
+    packed = pack_bits(codes, n_bits)
+    assert packed.dtype == np.uint8
+    assert packed.shape == (int(np.ceil(codes.shape[0] * n_bits / 8)),)
+    assert np.array_equal(unpack_bits(packed, n_bits, codes.shape[0], dtype), codes)
+
+
+def test_bitpack_transformer_sparse_codes():
+    """Test that the transformer packs the codes of a SparseTensor."""
+    codes = np.random.default_rng(1).integers(0, 6, size=10_000).astype(np.uint8)
+    data = SparseTensor(np.arange(codes.shape[0]), codes)
+    transformer = BitPackTransformer()
+
+    packed, metadata = transformer.forward(data)
+    assert metadata['int_list'][0] == 3
+    assert packed.values.nbytes == 3_750
+
+    unpacked = transformer.backward(packed, metadata)
+    assert np.array_equal(unpacked.values, codes)
+    assert np.array_equal(unpacked.indices, data.indices)
+
+
+def test_bitpack_transformer_passes_floats():
+    """Test that non-integer data is passed over unchanged."""
+    data = np.linspace(0, 1, 10, dtype=np.float32)
+    transformer = BitPackTransformer()
+
+    packed, metadata = transformer.forward(data)
+    assert packed is data
+    assert transformer.backward(packed, metadata) is data
@@ -0,0 +1,79 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import gzip
+
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines import SKCPipeline, codecs
+
+DATA = np.random.default_rng(0).integers(0, 4, size=100_000).astype(np.uint8).tobytes()
+
+
+@pytest.mark.parametrize('codec', codecs.available_codecs())
+def test_codec_round_trip(codec):
+    """Test that every registered codec round-trips and names itself in the header."""
+    payload = codecs.compress(DATA, codec=codec)
+
+    assert payload[0] == codecs._CODECS[codec].codec_id
+    assert codecs.decompress(payload) == DATA
+
+
+def test_codec_legacy_gzip_payload():
+    """Test that plain gzip streams without a header are still decoded."""
+    assert codecs.decompress(gzip.compress(DATA)) == DATA
+
+
+@pytest.mark.parametrize('throughput_target', [0.0, 1e12])
+def test_codec_auto(throughput_target, monkeypatch):
+    """Test that the auto mode picks a registered codec and round-trips."""
+    monkeypatch.setattr(codecs, '_auto_choices', {})
+    payload = codecs.compress(DATA, codec='auto', throughput_target=throughput_target)
+
+    assert codecs.decompress(payload) == DATA
+    if throughput_target == 0.0:
+        densest = min(len(codecs.compress(DATA, codec=name, level=level))
+                      for name, level in codecs.AUTO_CANDIDATES
+                      if name in codecs.available_codecs())
+        assert len(payload) == densest
+
+
+def test_codec_unknown():
+    """Test that unknown codecs are rejected."""
+    with pytest.raises(ValueError):
+        SKCPipeline(codec='snappy-9000')
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'lzma', 'auto'])
+def test_skc_pipeline_codec(codec):
+    """Test that SKCPipeline round-trips with a non-default codec."""
+    tp = SKCPipeline(codec=codec, codec_level=1 if codec == 'zlib' else None)
+    nparray = np.random.default_rng(0).standard_normal((16, 64)).astype(np.float32)
+
+    data_fwd, transformer_metadata = tp.forward(nparray)
+    assert data_fwd[0] != 0x1f
+    assert tp.backward(data_fwd, transformer_metadata).shape == nparray.shape
+
+
+def test_codec_auto_reuses_its_probe(monkeypatch):
+    """Test that the auto mode probes once per kind and size class, then on a schedule."""
+    monkeypatch.setattr(codecs, '_auto_choices', {})
+    monkeypatch.setattr(codecs, 'AUTO_REPROBE_INTERVAL', 3)
+    probes = []
+    probe = codecs._auto_probe
+    monkeypatch.setattr(codecs, '_auto_probe', lambda *args: probes.append(1) or probe(*args))
+
+    for _ in range(5):
+        assert codecs.decompress(codecs.compress(DATA, codec='auto', kind='u1')) == DATA
+    assert len(probes) == 2
+    codecs.compress(DATA, codec='auto', kind='f4')
+    codecs.compress(DATA[:1_000], codec='auto', kind='u1')
+    assert len(probes) == 4
+
+
+def test_codec_gzip_is_deterministic(monkeypatch):
+    """Test that gzip payloads do not depend on the time they are made at."""
+    payload = codecs.compress(DATA, codec='gzip')
+    monkeypatch.setattr('time.time', lambda: 4e9)
+
+    assert codecs.compress(DATA, codec='gzip') == payload
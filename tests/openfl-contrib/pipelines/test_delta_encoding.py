@@ -0,0 +1,85 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines.reference_cache import ReferenceCache, ReferenceMismatchError
+
+
+def _rounds(seed=0):
+    """A reference tensor and its small update of the next round."""
+    rng = np.random.default_rng(seed)
+    reference = rng.standard_normal((100, 100)).astype(np.float32)
+    return reference, reference + 0.01 * rng.standard_normal((100, 100)).astype(np.float32)
+
+
+def _error(data, recovered):
+    """Relative squared error."""
+    return np.sum((data - recovered) ** 2) / np.sum(data ** 2)
+
+
+def test_delta_round_trip():
+    """Test that deltas decode against the receiver's reference, far more accurately."""
+    reference, data = _rounds()
+    sender = SKCPipeline(p_sparsity=0.1, delta_encoding=True)
+    receiver = SKCPipeline(p_sparsity=0.1, delta_encoding=True)
+    full_fwd, full_metadata = sender.forward(data, tensor_name='w')
+    sender.set_reference('w', 4, reference)
+    receiver.set_reference('w', 4, reference)
+
+    data_fwd, transformer_metadata = sender.forward(data, tensor_name='w')
+    recovered = receiver.backward(data_fwd, list(transformer_metadata), tensor_name='w')
+    accumulated = receiver.accumulate(data_fwd, transformer_metadata, weight=0.5, tensor_name='w')
+
+    assert transformer_metadata[0]['int_list'][0] == 4
+    assert recovered.shape == data.shape
+    assert _error(data, recovered) < 1e-3 * _error(data, receiver.backward(full_fwd, full_metadata))
+    assert np.allclose(accumulated, 0.5 * recovered, atol=1e-6)
+
+
+def test_delta_reference_mismatch():
+    """Test that receivers reject deltas against another version of the reference."""
+    reference, data = _rounds()
+    sender = SKCPipeline(p_sparsity=0.1, delta_encoding=True)
+    sender.set_reference('w', 4, reference)
+    data_fwd, transformer_metadata = sender.forward(data, tensor_name='w')
+
+    stale = SKCPipeline(p_sparsity=0.1, delta_encoding=True)
+    stale.set_reference('w', 3, reference)
+    drifted = SKCPipeline(p_sparsity=0.1, delta_encoding=True)
+    drifted.set_reference('w', 4, reference + 1e-6)
+    for receiver, tensor_name in [(stale, 'w'), (drifted, 'w'), (sender, None),
+                                  (SKCPipeline(p_sparsity=0.1), 'w')]:
+        with pytest.raises(ReferenceMismatchError):
+            receiver.backward(data_fwd, list(transformer_metadata), tensor_name=tensor_name)
+
+
+@pytest.mark.parametrize('kwargs', [{'reference_round': 5}, {'tensor_name': 'b'}, {}])
+def test_delta_falls_back_to_full_send(kwargs):
+    """Test that tensors without an agreed reference are sent in full."""
+    reference, data = _rounds()
+    sender = SKCPipeline(p_sparsity=0.1, delta_encoding=True)
+    sender.set_reference('w', 4, reference)
+    sender.set_reference('b', 4, reference[:10])
+
+    data_fwd, transformer_metadata = sender.forward(data, **dict({'tensor_name': 'w'}, **kwargs))
+
+    if kwargs:
+        assert len(transformer_metadata) == len(sender.transformers)
+        receiver = SKCPipeline(p_sparsity=0.1)
+        assert receiver.backward(data_fwd, transformer_metadata).shape == (100, 100)
+    else:
+        assert len(transformer_metadata) == len(sender.transformers) + 1
+
+
+def test_reference_cache_budget():
+    """Test that the least recently used references are dropped first."""
+    cache = ReferenceCache(max_bytes=2 * 400)
+    for name in 'abc':
+        cache.put(name, 0, np.zeros(100))
+        cache.get('a')
+
+    assert cache.get('b') is None
+    assert cache.get('a').digest == cache.get('c').digest
+    assert not cache.get('a').data.flags.writeable
@@ -0,0 +1,88 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import pickle
+
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines.error_feedback import ResidualStore
+
+
+def test_residual_store_memory_cap_and_persistence(tmp_path):
+    """Test that evicted residuals are reloaded from the workspace directory."""
+    store = ResidualStore(path=str(tmp_path), max_bytes=4_000)
+    residuals = {f'layer{i}.weight': np.full(500, i, dtype=np.float32) for i in range(3)}
+    for name, residual in residuals.items():
+        store.put(name, residual)
+
+    assert store._nbytes <= 4_000
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f'{n}.npy' for n in sorted(residuals)]
+    restarted = pickle.loads(pickle.dumps(store))
+    for name, residual in residuals.items():
+        assert np.array_equal(store.get(name), residual)
+        assert np.array_equal(restarted.get(name), residual)
+    assert store.get('missing') is None
+
+    store.clear()
+    assert store.get('layer0.weight') is None
+
+
+def test_skc_error_feedback_transmits_dropped_mass(tmp_path):
+    """Test that components dropped in one round are sent in later rounds."""
+    update = np.random.default_rng(0).standard_normal(1_000).astype(np.float32)
+    # more clusters than kept values keeps the quantization stage lossless
+    tp = SKCPipeline(p_sparsity=0.1, n_clusters=1_000, error_feedback=True,
+                     residual_dir=str(tmp_path))
+
+    sent = np.zeros_like(update)
+    for _ in range(10):
+        data_fwd, transformer_metadata = tp.forward(update, tensor_name='fc.weight')
+        sent += tp.backward(data_fwd, transformer_metadata)
+    residual = np.load(tmp_path / 'fc.weight.npy')
+
+    # every component of the update has been transmitted or is carried over
+    assert np.allclose(sent + residual, 10 * update, atol=1e-4)
+    assert np.count_nonzero(residual) == 900
+    # without a tensor name the transformer has no state to use
+    data_fwd, transformer_metadata = tp.forward(update)
+    assert np.count_nonzero(tp.backward(data_fwd, transformer_metadata)) == 100
+
+
+@pytest.mark.parametrize('settings', [
+    {'n_clusters': 2},
+    {'n_clusters': 6},
+    {'quantizer': 'qsgd', 'qsgd_levels': 2, 'qsgd_seed': 0},
+    {'n_clusters': 6, 'chunk_size': 300},
+])
+def test_skc_error_feedback_carries_quantization_error(settings):
+    """Test that the quantization error of the sent values is carried over too."""
+    update = np.random.default_rng(0).standard_normal(1_000).astype(np.float32)
+    tp = SKCPipeline(p_sparsity=0.1, error_feedback=True, residual_dir=None, **settings)
+
+    sent = np.zeros_like(update)
+    for _ in range(50):
+        data_fwd, transformer_metadata = tp.forward(update, tensor_name='fc.weight')
+        sent += tp.backward(data_fwd, transformer_metadata)
+    residual = tp.residual_store.get('fc.weight')
+
+    loss = np.linalg.norm(sent + residual - 50 * update) / np.linalg.norm(50 * update)
+    assert loss < 1e-5
+
+
+def test_skc_error_feedback_of_worker_processes(tmp_path):
+    """Test that worker processes keep residuals in residual_dir, and need one."""
+    update = np.random.default_rng(0).standard_normal(1_000).astype(np.float32)
+    with pytest.raises(ValueError):
+        SKCPipeline(error_feedback=True, residual_dir=None, batch_executor='process')
+    tp = SKCPipeline(p_sparsity=0.1, n_clusters=1_000, error_feedback=True,
+                     residual_dir=str(tmp_path), batch_workers=2, batch_executor='process')
+
+    sent = np.zeros_like(update)
+    for _ in range(10):
+        sent += tp.backward_batch(tp.forward_batch({'fc.weight': update}))['fc.weight']
+    residual = tp.residual_store.get('fc.weight')
+
+    assert np.allclose(sent + residual, 10 * update, atol=1e-4)
+    # without the residuals, the same 100 components would be sent every round
+    assert np.count_nonzero(sent) > 100
@@ -0,0 +1,45 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines.index_coding import INDEX_FORMATS, decode_indices, encode_indices
+
+
+@pytest.mark.parametrize('index_format', INDEX_FORMATS)
+@pytest.mark.parametrize('indices', [
+    [],
+    [0],
+    [5, 6, 7, 127, 128, 16_383, 16_384],
+    [3, 2**33 + 1],
+])
+def test_index_stream_round_trip(index_format, indices):
+    """Test both index formats on edge-case gaps."""
+    if index_format == 'bitmap' and indices and indices[-1] > 2**20:
+        pytest.skip('bitmap of a huge range')
+    indices = np.asarray(indices, dtype=np.int64)
+
+    stream = encode_indices(indices, index_format=index_format)
+
+    assert stream[0] == INDEX_FORMATS.index(index_format)
+    decoded = decode_indices(stream)
+    assert decoded.dtype == np.int64
+    assert np.array_equal(decoded, indices)
+
+
+@pytest.mark.parametrize('p, index_format, max_bits', [
+    (0.001, 'delta', 16),
+    (0.05, 'delta', 8.1),
+    (0.5, 'bitmap', 2),
+])
+def test_index_stream_picks_shorter_format(p, index_format, max_bits):
+    """Test that the encoder switches to the bitmap for dense selections."""
+    rng = np.random.default_rng(0)
+    n_elements = 1_000_000
+    indices = np.sort(rng.choice(n_elements, int(n_elements * p), replace=False))
+
+    stream = encode_indices(indices)
+
+    assert INDEX_FORMATS[stream[0]] == index_format
+    assert 8 * (len(stream) - 1) <= max_bits * indices.shape[0]
+    assert np.array_equal(decode_indices(stream), indices)
@@ -0,0 +1,65 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import json
+
+import numpy as np
+
+from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines.instrumentation import PipelineRecorder
+
+STAGES = ['SparsityTransformer', 'KmeansTransformer', 'BitPackTransformer', 'GZIPTransformer']
+
+
+def test_recorder_stage_records(tmp_path):
+    """Test per-stage records, hooks and the JSON lines written per round."""
+    hooked = []
+    recorder = PipelineRecorder(path=str(tmp_path / 'logs' / 'skc.jsonl'), measure_error=True,
+                                hooks=[hooked.append])
+    tp = SKCPipeline(p_sparsity=0.1, n_clusters=4, instrumentation=recorder)
+    data = np.random.default_rng(0).standard_normal((100, 100)).astype(np.float32)
+
+    data_fwd, transformer_metadata = tp.forward(data, tensor_name='w')
+    recovered = tp.backward(data_fwd, list(transformer_metadata), tensor_name='w')
+    records = recorder.records()
+
+    forward = [r for r in records if r['direction'] == 'forward']
+    backward = [r for r in records if r['direction'] == 'backward']
+    assert [r['stage'] for r in forward] == STAGES + ['pipeline']
+    assert [r['stage'] for r in backward] == STAGES[::-1] + ['pipeline']
+    assert hooked == records
+    assert all(r['tensor_name'] == 'w' and r['wall_seconds'] >= 0 for r in records)
+    # every stage consumes the bytes the previous one produced
+    for previous, stage in zip(forward[:3], forward[1:4]):
+        assert previous['output_bytes'] == stage['input_bytes']
+    assert forward[0]['input_bytes'] == forward[-1]['input_bytes'] == data.nbytes
+    assert forward[-1]['output_bytes'] == len(data_fwd)
+    assert forward[2]['relative_error'] is None
+    assert 0 < forward[0]['relative_error'] < forward[-1]['relative_error'] < 1
+    error = np.sum((data - recovered) ** 2) / np.sum(data ** 2)
+    assert np.isclose(forward[-1]['relative_error'], error, rtol=1e-4)
+
+    summary = recorder.flush(round_number=3)
+
+    assert recorder.records() == []
+    assert summary['KmeansTransformer/forward']['count'] == 1
+    assert summary['pipeline/backward']['output_bytes'] == data.nbytes
+    with open(recorder.path) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == len(records) and {line['round'] for line in lines} == {3}
+
+
+def test_recorder_chunked_and_disabled():
+    """Test that chunk blocks are recorded under their block names."""
+    tp = SKCPipeline(p_sparsity=0.1, chunk_size=1_000, instrumentation={})
+    data = np.random.default_rng(0).standard_normal(2_500).astype(np.float32)
+
+    tp.backward(*tp.forward(data, tensor_name='w'))
+    records = tp.recorder.records()
+
+    blocks = [r for r in records if r['stage'] == 'SparsityTransformer']
+    assert {r['tensor_name'] for r in blocks if r['direction'] == 'forward'} == {
+        'w/0', 'w/1000', 'w/2000'
+    }
+    assert len(blocks) == 6
+    assert all(r['relative_error'] is None for r in records)
+    assert SKCPipeline().recorder is None
@@ -0,0 +1,57 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines import SKCPipeline
+
+
+def traced_peak(fn, *args, **kwargs):
+    """Run fn and return its result and the peak of the memory it allocated."""
+    tracemalloc.start()
+    try:
+        result = fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+@pytest.fixture(scope='module')
+def tensor():
+    """A 16 MB float32 tensor."""
+    return np.random.default_rng(0).standard_normal((2_000, 2_000)).astype(np.float32)
+
+
+@pytest.mark.parametrize('settings, forward_limit, backward_limit', [
+    ({'p_sparsity': 0.01}, 0.75, 1.25),
+    ({'p_sparsity': 0.1}, 2.0, 1.5),
+    ({'p_sparsity': 0.01, 'error_feedback': True, 'residual_dir': None}, 1.75, 1.25),
+    ({'p_sparsity': 0.01, 'chunk_size': 1 << 20}, 0.75, 1.25),
+])
+def test_skc_peak_memory(tensor, settings, forward_limit, backward_limit):
+    """Test that compression allocates at most a small multiple of the tensor size."""
+    tp = SKCPipeline(n_workers=1, **settings)
+
+    (data_fwd, transformer_metadata), forward_peak = traced_peak(tp.forward, tensor,
+                                                                 tensor_name='w')
+    recovered, backward_peak = traced_peak(tp.backward, data_fwd, list(transformer_metadata))
+
+    assert recovered.shape == tensor.shape
+    assert forward_peak < forward_limit * tensor.nbytes
+    assert backward_peak < backward_limit * tensor.nbytes
+
+
+def test_skc_backward_into_preallocated_output(tensor):
+    """Test that decoding into a reused buffer allocates no full-size array."""
+    tp = SKCPipeline(p_sparsity=0.01)
+    data_fwd, transformer_metadata = tp.forward(tensor)
+    out = np.empty_like(tensor)
+
+    recovered, peak = traced_peak(tp.backward, data_fwd, list(transformer_metadata), out=out)
+
+    assert np.shares_memory(recovered, out)
+    assert np.array_equal(recovered, tp.backward(data_fwd, list(transformer_metadata)))
+    assert peak < 0.25 * tensor.nbytes
@@ -0,0 +1,88 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+import yaml
+
+from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines.policy import CompressionPolicy
+
+PLAN_SETTINGS = """
+n_clusters : 2
+policy :
+  - route        : passthrough
+    dtypes       : [int64]
+  - route        : lossless
+    pattern      : '*.running_*'
+  - route        : lossless
+    max_elements : 256
+"""
+
+
+def _model():
+    rng = np.random.default_rng(0)
+    return {
+        'conv.weight': rng.standard_normal((32, 16, 3, 3)).astype(np.float32),
+        'conv.bias': rng.standard_normal(32).astype(np.float32),
+        'bn.running_mean': rng.standard_normal(512).astype(np.float32),
+        'bn.num_batches_tracked': np.array(1234, dtype=np.int64),
+    }
+
+
+def test_policy_routes_first_matching_rule():
+    """Test rule matching on name pattern, element count and dtype."""
+    policy = CompressionPolicy(yaml.safe_load(PLAN_SETTINGS)['policy'])
+    routes = {name: policy.route(name, data) for name, data in _model().items()}
+
+    assert routes == {
+        'conv.weight': 'skc',
+        'conv.bias': 'lossless',
+        'bn.running_mean': 'lossless',
+        'bn.num_batches_tracked': 'passthrough',
+    }
+    # name patterns never match unnamed tensors
+    assert policy.route(None, _model()['bn.running_mean']) == 'skc'
+
+
+@pytest.mark.parametrize('rule', [{'route': 'zip'}, {'route': 'skc', 'max_size': 10}])
+def test_policy_rejects_invalid_rules(rule):
+    """Test that malformed plan rules are reported."""
+    with pytest.raises(ValueError):
+        CompressionPolicy([rule])
+
+
+def test_skc_policy_round_trip():
+    """Test that non-SKC routes are recovered exactly with their dtype."""
+    tp = SKCPipeline(**yaml.safe_load(PLAN_SETTINGS))
+    tensor_dict = _model()
+
+    payloads = tp.forward_batch(tensor_dict)
+    recovered = tp.backward_batch(payloads)
+
+    for name in ('conv.bias', 'bn.running_mean', 'bn.num_batches_tracked'):
+        assert recovered[name].dtype == tensor_dict[name].dtype
+        assert np.array_equal(recovered[name], tensor_dict[name])
+    assert recovered['conv.weight'].shape == tensor_dict['conv.weight'].shape
+    assert not np.array_equal(recovered['conv.weight'], tensor_dict['conv.weight'])
+    # no tensor name: the element count rule still applies
+    data_fwd, transformer_metadata = tp.forward(tensor_dict['conv.bias'])
+    assert np.array_equal(tp.backward(data_fwd, transformer_metadata), tensor_dict['conv.bias'])
+
+
+def test_skc_policy_product_quantization_route():
+    """Test that tensors routed to 'pq' round trip densely through the codec."""
+    tp = SKCPipeline(policy=[{'route': 'pq', 'pattern': '*.weight'}], pq_subvector_size=9)
+    data = np.random.default_rng(0).standard_normal((64, 32, 3, 3)).astype(np.float32)
+
+    data_fwd, transformer_metadata = tp.forward(data, tensor_name='conv.weight')
+    recovered = tp.backward(data_fwd, list(transformer_metadata))
+    accumulated = tp.accumulate(data_fwd, transformer_metadata, weight=2.0)
+
+    assert recovered.shape == data.shape
+    assert np.count_nonzero(recovered) == data.size
+    assert np.sum((recovered - data) ** 2) < np.sum(data ** 2)
+    assert np.allclose(accumulated, 2 * recovered)
+    # empty tensors are passed through
+    empty = np.zeros((0, 32, 3, 3), dtype=np.float32)
+    data_fwd, transformer_metadata = tp.forward(empty, tensor_name='empty.weight')
+    assert tp.backward(data_fwd, list(transformer_metadata)).shape == empty.shape
@@ -0,0 +1,61 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines.precision import decode_values, encode_values, round_values
+
+
+def test_bfloat16_rounds_to_nearest_even():
+    """Test bfloat16 encoding against hand-computed bit patterns."""
+    x = np.array([1.0, -2.5, 1 + 2**-8, 1 + 3 * 2**-8, 3e38, np.inf, np.nan], dtype=np.float32)
+
+    encoded = encode_values(x, 'bfloat16')
+
+    assert encoded.dtype == np.uint16
+    assert list(encoded[:4]) == [0x3F80, 0xC020, 0x3F80, 0x3F82]
+    decoded = decode_values(encoded, 'bfloat16')
+    assert decoded.dtype == np.float32
+    assert np.isclose(decoded[4], 3e38, rtol=2**-8) and np.isinf(decoded[5])
+    assert np.isnan(decoded[6])
+
+
+@pytest.mark.parametrize('value_dtype', ['float32', 'float16', 'bfloat16'])
+def test_round_values_is_idempotent(value_dtype):
+    """Test that rounded values survive the transport dtype unchanged."""
+    x = np.random.default_rng(0).standard_normal(1_000).astype(np.float32)
+
+    rounded = round_values(x, value_dtype)
+
+    assert np.array_equal(decode_values(encode_values(rounded, value_dtype), value_dtype), rounded)
+    assert np.allclose(rounded, x, rtol=2**-7)
+
+
+@pytest.mark.parametrize('value_dtype', ['float16', 'bfloat16'])
+def test_skc_half_precision_values(value_dtype):
+    """Test that unquantized values travel in 16 bits and decode to float32."""
+    data = np.random.default_rng(0).standard_normal((256, 256)).astype(np.float32)
+    full = SKCPipeline(p_sparsity=0.1, n_clusters=None, codec='none')
+    half = SKCPipeline(p_sparsity=0.1, n_clusters=None, codec='none', value_dtype=value_dtype)
+
+    full_bytes, _ = full.forward(data)
+    half_bytes, transformer_metadata = half.forward(data)
+    recovered = half.backward(half_bytes, transformer_metadata)
+
+    k = int(np.ceil(data.size * 0.1))
+    assert len(full_bytes) - len(half_bytes) == 2 * k
+    assert recovered.dtype == np.float32
+    kept = recovered != 0
+    assert np.allclose(recovered[kept], data[kept], rtol=2**-7)
+
+
+def test_skc_half_precision_centroids():
+    """Test that centroids are rounded to the transport dtype."""
+    data = np.random.default_rng(0).standard_normal(1_000).astype(np.float32)
+    tp = SKCPipeline(p_sparsity=0.5, n_clusters=8, value_dtype='float16')
+
+    _, transformer_metadata = tp.forward(data)
+
+    centroids = np.array(list(transformer_metadata[1]['int_to_float'].values()), dtype=np.float32)
+    assert np.array_equal(centroids.astype(np.float16).astype(np.float32), centroids)
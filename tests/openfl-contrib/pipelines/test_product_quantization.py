@@ -0,0 +1,60 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines.product_quantization import pq_assign, pq_fit, pq_merge, pq_split
+from openfl_contrib.pipelines.skc_pipeline import GZIPTransformer, ProductQuantizationTransformer
+
+
+def _clustered_rows(n_rows, row_size, n_patterns, pattern_size=8, noise=0.01, seed=0):
+    """Rows of repeated sub-vector patterns plus noise, like correlated weights."""
+    rng = np.random.default_rng(seed)
+    patterns = rng.standard_normal((n_patterns, pattern_size)).astype(np.float32)
+    rows = patterns[rng.integers(n_patterns, size=(n_rows, row_size // pattern_size))]
+    rows = rows.reshape(n_rows, -1)
+    return rows + noise * rng.standard_normal(rows.shape).astype(np.float32)
+
+
+@pytest.mark.parametrize('n_subspaces', [1, 3])
+def test_pq_split_merge(n_subspaces):
+    """Test that splitting pads the last vector and merging inverts it."""
+    x = np.arange(50, dtype=np.float32)
+
+    vectors = pq_split(x, 4, n_subspaces)
+
+    assert vectors.shape == (n_subspaces, -(-50 // (4 * n_subspaces)), 4)
+    assert np.array_equal(vectors[0, 0], x[:4])
+    assert np.array_equal(pq_merge(vectors, 50), x)
+
+
+def test_pq_fit_and_assign():
+    """Test that codebooks recover sub-vectors drawn from a few patterns."""
+    vectors = pq_split(_clustered_rows(256, 64, 16, noise=0).ravel(), 8, 2)
+
+    codebooks = pq_fit(vectors, 32, seed=1)
+    labels = pq_assign(vectors, codebooks, block_size=100)
+
+    assert codebooks.shape == (2, 32, 8)
+    assert labels.shape == vectors.shape[:2]
+    recovered = codebooks[np.arange(2)[:, None], labels]
+    assert np.allclose(recovered, vectors, atol=1e-5)
+
+
+@pytest.mark.parametrize('value_dtype', ['float32', 'float16'])
+def test_pq_transformer_sub_bit_payload(value_dtype):
+    """Test that correlated dense weights cost less than one bit per element."""
+    data = _clustered_rows(500, 800, 64, pattern_size=16)
+    transformer = ProductQuantizationTransformer(subvector_size=16, value_dtype=value_dtype)
+
+    pq_data, metadata = transformer.forward(data)
+    recovered = transformer.backward(pq_data, metadata)
+    payload, _ = GZIPTransformer().forward(pq_data)
+
+    assert pq_data.dtype == np.uint8
+    assert recovered.shape == data.shape and recovered.dtype == np.float32
+    assert 8 * len(payload) < data.size
+    assert np.sum((recovered - data) ** 2) < 0.01 * np.sum(data ** 2)
+    # fewer vectors than codewords are sent exactly
+    small = data[:2, :40]
+    assert np.allclose(transformer.backward(*transformer.forward(small)), small, atol=1e-2)
@@ -0,0 +1,107 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import itertools
+
+import numpy as np
+import pytest
+from sklearn import cluster
+
+from openfl_contrib.pipelines.quantization import (
+    assign_1d,
+    dequantize_uniform,
+    kmeans_1d,
+    lloyd_step_1d,
+    sample_1d,
+    stochastic_quantize,
+)
+
+
+def distortion(x, centroids):
+    """Sum of squared errors of x quantized to its nearest centroid."""
+    return np.sum((x - centroids[assign_1d(x, centroids)]) ** 2)
+
+
+def test_kmeans_1d_is_optimal():
+    """Test that the quantizer finds the optimal partition of a small array."""
+    x = np.sort(np.random.default_rng(0).standard_normal(12))
+    best = min(
+        sum(np.sum((seg - seg.mean()) ** 2) for seg in np.split(x, cuts))
+        for cuts in itertools.combinations(range(1, 12), 2)
+    )
+
+    assert np.isclose(distortion(x, kmeans_1d(x, 3)), best)
+
+
+@pytest.mark.parametrize('n_clusters', [2, 6, 16])
+def test_kmeans_1d_not_worse_than_sklearn(n_clusters):
+    """Test that the codebook distortion does not exceed the sklearn one."""
+    x = np.random.default_rng(1).standard_normal(20_000)
+    x = x[np.abs(x) > 1.0]
+    k_means = cluster.KMeans(n_clusters=n_clusters, n_init=n_clusters).fit(x.reshape(-1, 1))
+
+    centroids = kmeans_1d(x, n_clusters)
+    assert centroids.shape == (n_clusters,)
+    assert np.all(np.diff(centroids) > 0)
+    assert distortion(x, centroids) <= k_means.inertia_ * (1 + 1e-9)
+
+
+def test_kmeans_1d_few_unique_values():
+    """Test that data with fewer distinct values than clusters is kept exact."""
+    x = np.array([3.0, 1.0, 3.0, 2.0, 1.0])
+
+    centroids = kmeans_1d(x, 6)
+    assert np.array_equal(centroids, [1.0, 2.0, 3.0])
+    assert np.array_equal(centroids[assign_1d(x, centroids)], x)
+
+
+def test_lloyd_step_1d_does_not_increase_distortion():
+    """Test that a Lloyd step from a stale codebook lowers the error on new data."""
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal(10_000)
+    stale = kmeans_1d(x, 8) * 1.5
+
+    centroids, labels, mse = lloyd_step_1d(x, stale)
+
+    assert np.all(np.diff(centroids) >= 0)
+    assert np.isclose(mse, np.mean((x - centroids[labels]) ** 2))
+    assert mse * x.shape[0] < distortion(x, stale)
+
+
+@pytest.mark.parametrize('method', ['random', 'stratified'])
+def test_sample_1d(method):
+    """Test that samples are bounded, seeded and drawn from the data."""
+    x = np.arange(100_000, dtype=np.float32)
+
+    sample = sample_1d(x, 1_000, method=method, seed=3)
+
+    assert sample.shape == (1_000,)
+    assert np.unique(sample).shape == (1_000,)
+    assert np.array_equal(sample, sample_1d(x, 1_000, method=method, seed=3))
+    if method == 'stratified':
+        assert np.array_equal(np.sort(sample) // 100, np.arange(1_000))
+    assert np.array_equal(sample_1d(x[:10], 1_000, method=method), x[:10])
+
+
+@pytest.mark.parametrize('block_size', [None, 1_000])
+def test_stochastic_quantize_is_unbiased(block_size):
+    """Test the code range, the block scales and the mean of the decoded values."""
+    x = np.random.default_rng(0).standard_normal(10_000).astype(np.float32)
+    x[:1_000] *= 10
+    rng = np.random.default_rng(1)
+
+    codes, scales = stochastic_quantize(x, 4, block_size=block_size, rng=rng)
+    decoded = [dequantize_uniform(codes, scales, 4, block_size=block_size)]
+    for _ in range(199):
+        decoded.append(dequantize_uniform(
+            *stochastic_quantize(x, 4, block_size=block_size, rng=rng), 4, block_size=block_size
+        ))
+    steps = np.repeat(scales, block_size or x.shape[0])[:x.shape[0]] / 4
+
+    assert codes.dtype == np.uint8 and codes.min() >= 0 and codes.max() <= 8
+    assert scales.shape == ((10,) if block_size else (1,))
+    assert scales[0] == np.abs(x[:block_size or None]).max()
+    assert np.all(np.abs(decoded[0] - x) <= steps * (1 + 1e-6))
+    # the mean of 200 draws is within a few standard errors of x
+    assert np.all(np.abs(np.mean(decoded, axis=0) - x) <= 4 * steps / np.sqrt(200) + 1e-6)
+    zeros = stochastic_quantize(np.zeros(5, np.float32), 4, rng=rng)
+    assert np.array_equal(dequantize_uniform(*zeros, 4), np.zeros(5))
@@ -0,0 +1,128 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines import SKCPipeline, skc_pipeline
+from openfl_contrib.pipelines.rate_control import RateController
+
+
+def _model(seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'conv.weight': rng.standard_normal((64, 32, 3, 3)).astype(np.float32),
+        'fc.weight': (rng.standard_normal((256, 128)) * 0.1).astype(np.float32),
+        'fc.bias': rng.standard_normal(128).astype(np.float32),
+    }
+
+
+def test_rate_controller_settings_validation():
+    """Test that exactly one of the two objectives is accepted."""
+    with pytest.raises(ValueError):
+        RateController()
+    with pytest.raises(ValueError):
+        RateController(byte_budget=1_000, distortion_target=0.1)
+
+
+@pytest.mark.parametrize('byte_budget', [5_000, 20_000, 80_000])
+def test_skc_byte_budget_is_met_per_round(byte_budget):
+    """Test that the payload of a round stays close to the byte budget."""
+    tp = SKCPipeline(byte_budget=byte_budget, batch_workers=2)
+
+    # the controller calibrates its byte model over the first rounds
+    for seed in range(3):
+        tensor_dict = _model(seed)
+        payloads = tp.forward_batch(tensor_dict)
+    total_bytes = sum(len(data) for data, _ in payloads.values())
+
+    assert total_bytes <= 1.2 * byte_budget
+    recovered = tp.backward_batch(payloads)
+    error = sum(np.sum((tensor_dict[n] - recovered[n]) ** 2) for n in tensor_dict)
+    assert error < sum(np.sum(t**2) for t in tensor_dict.values())
+
+
+@pytest.mark.parametrize('named', [False, True])
+@pytest.mark.parametrize('byte_budget', [5_000, 20_000])
+def test_skc_byte_budget_is_met_by_single_tensor_calls(byte_budget, named):
+    """Test that a round of one tensor at a time forward calls meets the budget."""
+    tp = SKCPipeline(byte_budget=byte_budget)
+
+    # the first rounds teach the controller the tensors of a round
+    for seed in range(4):
+        total_bytes = sum(
+            len(tp.forward(data, tensor_name=name if named else None)[0])
+            for name, data in _model(seed).items()
+        )
+
+    assert 0.6 * byte_budget <= total_bytes <= 1.2 * byte_budget
+
+
+@pytest.mark.parametrize('settings', [{'byte_budget': 20_000}, {'distortion_target': 0.2}])
+def test_skc_rate_control_of_delta_payloads(settings):
+    """Test that batches of delta frames are planned and measured on their deltas."""
+    references = _model()
+    sender = SKCPipeline(delta_encoding=True, batch_workers=2, **settings)
+    receiver = SKCPipeline(delta_encoding=True)
+    for name, reference in references.items():
+        sender.set_reference(name, 4, reference)
+        receiver.set_reference(name, 4, reference)
+
+    for seed in range(1, 4):
+        tensor_dict = {
+            name: reference + 0.01 * update
+            for (name, reference), update in zip(references.items(), _model(seed).values())
+        }
+        payloads = sender.forward_batch(tensor_dict, reference_round=4)
+    recovered = receiver.backward_batch(payloads)
+
+    assert all(data[0] == skc_pipeline._DELTA_FRAME for data, _ in payloads.values())
+    for name, data in tensor_dict.items():
+        delta = data - references[name]
+        relative_error = np.sum((data - recovered[name]) ** 2) / np.sum(delta**2)
+        assert relative_error < 1
+        if 'distortion_target' in settings:
+            assert relative_error <= 0.2 * 1.25
+    if 'byte_budget' in settings:
+        assert sum(len(data) for data, _ in payloads.values()) <= 1.2 * 20_000
+
+
+@pytest.mark.parametrize('settings', [{'byte_budget': 20_000}, {'distortion_target': 0.2}])
+def test_skc_rate_control_of_empty_tensors(settings):
+    """Test that empty tensors are compressed under rate control."""
+    tensor_dict = dict(_model(), **{'empty.weight': np.zeros((0, 16), dtype=np.float32)})
+    tp = SKCPipeline(batch_workers=2, **settings)
+
+    for _ in range(2):
+        recovered = tp.backward_batch(tp.forward_batch(tensor_dict))
+        data_fwd, transformer_metadata = tp.forward(tensor_dict['empty.weight'])
+
+    assert recovered['empty.weight'].shape == (0, 16)
+    assert tp.backward(data_fwd, transformer_metadata).shape == (0, 16)
+
+
+def test_skc_larger_budget_lowers_error():
+    """Test that the error decreases as the byte budget grows."""
+    tensor_dict = _model()
+    errors = []
+    for byte_budget in (5_000, 50_000):
+        tp = SKCPipeline(byte_budget=byte_budget)
+        recovered = tp.backward_batch(tp.forward_batch(tensor_dict))
+        errors.append(sum(np.sum((tensor_dict[n] - recovered[n]) ** 2) for n in tensor_dict))
+    assert errors[1] < errors[0]
+
+
+def test_skc_distortion_target_and_recorded_choices():
+    """Test that the distortion target is met and the chosen p is recorded."""
+    data = np.random.default_rng(1).standard_normal((128, 64)).astype(np.float32)
+    tp = SKCPipeline(distortion_target=0.2)
+
+    for _ in range(3):
+        data_fwd, transformer_metadata = tp.forward(data, tensor_name='fc.weight')
+    recovered = tp.backward(data_fwd, list(transformer_metadata))
+
+    relative_error = np.sum((data - recovered) ** 2) / np.sum(data**2)
+    assert relative_error <= 0.2 * 1.25
+    p, n_clusters = tp.rate_controller.choose('fc.weight', data)
+    assert transformer_metadata[0]['int_to_float'] == {0: p}
+    assert len(transformer_metadata[1]['int_to_float']) <= n_clusters
+    assert len(data_fwd) < data.nbytes
@@ -0,0 +1,60 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines import ShufflePipeline, SKCPipeline
+from openfl_contrib.pipelines import shuffle as shuffle_module
+from openfl_contrib.pipelines.shuffle import shuffle, unshuffle
+
+
+@pytest.mark.parametrize('mode', ['byte', 'bit'])
+@pytest.mark.parametrize('dtype', [np.float32, np.float16, np.int64, np.uint8])
+@pytest.mark.parametrize('count', [0, 5, 8, 1_003])
+def test_shuffle_round_trip(mode, dtype, count, monkeypatch):
+    """Test that unshuffling restores every byte, across bit blocks and tails."""
+    monkeypatch.setattr(shuffle_module, '_BIT_BLOCK', 64)
+    data = np.random.default_rng(0).standard_normal(count).astype(dtype)
+
+    shuffled = shuffle(data, mode)
+
+    assert shuffled.dtype == np.uint8 and shuffled.shape == (data.nbytes,)
+    assert unshuffle(shuffled.tobytes(), dtype, count, mode).tobytes() == data.tobytes()
+
+
+def test_shuffle_groups_byte_planes():
+    """Test that byte shuffling puts the same byte of every value together."""
+    data = np.array([0x01020304, 0x05060708], dtype='<u4')
+
+    assert list(shuffle(data, 'byte')) == [4, 8, 3, 7, 2, 6, 1, 5]
+    with pytest.raises(ValueError):
+        shuffle(data, 'word')
+
+
+@pytest.mark.parametrize('mode', ['byte', 'bit'])
+def test_shuffle_pipeline_is_lossless_and_denser(mode):
+    """Test that the standalone pipeline is exact and beats the raw codec on smooth data."""
+    data = np.cumsum(np.random.default_rng(0).standard_normal((256, 256)), axis=1)
+    data = data.astype(np.float32)
+    tp = ShufflePipeline(shuffle=mode)
+
+    data_fwd, transformer_metadata = tp.forward(data)
+    recovered = tp.backward(data_fwd, transformer_metadata)
+    raw_fwd, _ = ShufflePipeline().transformers[1].forward(data)
+
+    assert not tp.is_lossy()
+    assert recovered.dtype == data.dtype and np.array_equal(recovered, data)
+    assert len(data_fwd) < len(raw_fwd)
+
+
+def test_skc_lossless_route_shuffle():
+    """Test the shuffled lossless route of SKCPipeline."""
+    data = np.arange(1_000, dtype=np.float64).reshape(10, 100)
+    tp = SKCPipeline(policy=[{'route': 'lossless'}], lossless_shuffle='bit')
+
+    data_fwd, transformer_metadata = tp.forward(data)
+
+    assert len(transformer_metadata) == 2
+    recovered = tp.backward(data_fwd, list(transformer_metadata))
+    assert recovered.dtype == data.dtype and np.array_equal(recovered, data)
+    assert np.array_equal(tp.accumulate(data_fwd, transformer_metadata), data)
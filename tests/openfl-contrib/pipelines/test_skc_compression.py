@@ -1,10 +1,15 @@
 # Copyright (C) 2024 Intel Corporation
 # SPDX-License-Identifier: Apache-2.0
+import io
+import pickle
+
 import numpy as np
 import pytest
 
 from openfl.protocols import base_pb2
 from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines import skc_pipeline
+from openfl_contrib.pipelines.skc_pipeline import KmeansTransformer
 
 
 @pytest.fixture
@@ -40,8 +45,270 @@ def test_skc_compression_pipeline(named_tensor):
     nparray = np.reshape(flat_array, newshape=array_shape, order='C')
 
     data_fwd, transformer_metadata = tp.forward(nparray)
-    assert len(transformer_metadata) == 3
+    assert len(transformer_metadata) == 4
     assert isinstance(data_fwd, bytes)
 
     data_bwd = tp.backward(data_fwd, transformer_metadata)
     assert data_bwd.shape == tuple(metadata['int_list'])
+
+
+def test_skc_sparse_payload_scales_with_k():
+    """Test that only the top-k components travel through the pipeline."""
+    tp = SKCPipeline(p_sparsity=0.01, n_clusters=4)
+    nparray = np.random.default_rng(0).standard_normal((100, 1000)).astype(np.float32)
+
+    data_fwd, transformer_metadata = tp.forward(nparray)
+    k = 1000
+    assert transformer_metadata[-1]['int_list'][1] == k
+
+    data_bwd = tp.backward(data_fwd, transformer_metadata)
+    assert data_bwd.shape == nparray.shape
+    assert data_bwd.dtype == np.float32
+    assert np.count_nonzero(data_bwd) <= k
+    kept = np.argsort(np.abs(nparray).ravel())[-k:]
+    assert np.all(data_bwd.ravel()[kept] != 0)
+
+
+@pytest.mark.parametrize('topk_block_size,offset_itemsize', [(200, 1), (1_000, 2)])
+@pytest.mark.parametrize('n_clusters', [4, None])
+def test_skc_block_topk_round_trip(topk_block_size, offset_itemsize, n_clusters):
+    """Test that block-wise payloads carry in-block offsets and keep the top-k of every block."""
+    nparray = np.random.default_rng(0).standard_normal((30, 1001)).astype(np.float32)
+    tp = SKCPipeline(p_sparsity=0.05, n_clusters=n_clusters, topk_block_size=topk_block_size)
+
+    data_fwd, transformer_metadata = tp.forward(nparray)
+    k_block = int(np.ceil(topk_block_size * 0.05))
+    assert transformer_metadata[-1]['int_list'][2:] == [offset_itemsize, topk_block_size, k_block]
+
+    data_bwd = SKCPipeline(n_clusters=n_clusters).backward(data_fwd, transformer_metadata).ravel()
+    flat = nparray.ravel()
+    for start in range(0, flat.shape[0], topk_block_size):
+        block = flat[start:start + topk_block_size]
+        kept = np.flatnonzero(data_bwd[start:start + topk_block_size])
+        k = int(np.ceil(k_block * block.shape[0] / topk_block_size - 0.5))
+        assert np.array_equal(kept, np.sort(np.argsort(np.abs(block))[block.shape[0] - k:]))
+    assert abs(np.count_nonzero(data_bwd) - k_block * flat.shape[0] / topk_block_size) <= 0.5
+    if n_clusters is None:
+        assert np.array_equal(data_bwd[data_bwd != 0], flat[data_bwd != 0])
+
+
+@pytest.mark.parametrize('kmeans_backend', ['dp', 'sklearn'])
+def test_skc_kmeans_backends(kmeans_backend):
+    """Test that both codebook solvers round-trip through the pipeline."""
+    tp = SKCPipeline(p_sparsity=0.1, n_clusters=6, kmeans_backend=kmeans_backend)
+    nparray = np.random.default_rng(0).standard_normal((32, 64)).astype(np.float32)
+
+    data_fwd, transformer_metadata = tp.forward(nparray)
+    assert len(transformer_metadata[1]['int_to_float']) == 6
+
+    data_bwd = tp.backward(data_fwd, transformer_metadata)
+    assert data_bwd.shape == nparray.shape
+    assert len(np.unique(data_bwd[data_bwd != 0])) <= 6
+
+
+def test_kmeans_transformer_narrow_codes():
+    """Test that codes use the narrowest dtype and decode with a table lookup."""
+    values = np.random.default_rng(0).standard_normal(5_000).astype(np.float32)
+
+    for n_cluster, dtype in [(6, np.uint8), (300, np.uint16)]:
+        transformer = KmeansTransformer(n_cluster)
+        codes, metadata = transformer.forward(values)
+        assert codes.dtype == dtype
+        assert codes.max() < n_cluster
+
+        decoded = transformer.backward(codes, metadata)
+        table = np.array([metadata['int_to_float'][i] for i in range(n_cluster)], np.float32)
+        assert np.array_equal(decoded, table[codes])
+        nearest = np.abs(table[:, None] - values).min(axis=0)
+        assert np.all(np.abs(decoded - values) <= nearest + 1e-6)
+
+
+def test_skc_chunked_round_trip():
+    """Test that chunked compression decodes blocks back in place."""
+    nparray = np.random.default_rng(0).standard_normal((50, 1000)).astype(np.float32)
+    tp = SKCPipeline(p_sparsity=0.05, chunk_size=12_000, n_workers=3)
+
+    data_fwd, transformer_metadata = tp.forward(nparray)
+    data_bwd = SKCPipeline(n_workers=2).backward(data_fwd, transformer_metadata)
+
+    assert data_bwd.shape == nparray.shape
+    flat_in, flat_out = nparray.ravel(), data_bwd.ravel()
+    for start in range(0, flat_in.shape[0], 12_000):
+        block_in, block_out = flat_in[start:start + 12_000], flat_out[start:start + 12_000]
+        k = int(np.ceil(block_in.shape[0] * 0.05))
+        assert np.count_nonzero(block_out) == k
+        assert np.all(block_out[np.argsort(np.abs(block_in))[-k:]] != 0)
+
+
+@pytest.mark.parametrize('batch_executor', ['thread', 'process'])
+def test_skc_batch_matches_single_tensor_path(batch_executor):
+    """Test that the batch API returns the same payloads as per-tensor calls."""
+    rng = np.random.default_rng(0)
+    tensor_dict = {
+        'conv1.weight': rng.standard_normal((8, 1, 5, 5)).astype(np.float32),
+        'conv1.bias': rng.standard_normal(8).astype(np.float32),
+        'fc1.weight': rng.standard_normal((64, 128)).astype(np.float32),
+    }
+    tp = SKCPipeline(batch_workers=2, batch_executor=batch_executor)
+
+    payloads = tp.forward_batch(tensor_dict)
+    assert list(payloads) == list(tensor_dict)
+    for name, nparray in tensor_dict.items():
+        data_fwd, transformer_metadata = tp.forward(nparray)
+        assert payloads[name][0] == data_fwd
+        assert payloads[name][1] == transformer_metadata
+
+    recovered = tp.backward_batch(payloads)
+    for name, nparray in tensor_dict.items():
+        assert np.array_equal(recovered[name], tp.backward(*payloads[name]))
+        assert recovered[name].shape == nparray.shape
+
+
+def test_skc_process_batch_sends_pipeline_once(monkeypatch):
+    """Test that the process executor does not send the pipeline with every task."""
+    submitted, pickled_pipelines = [], []
+
+    class RecordingPickler(pickle.Pickler):
+        def persistent_id(self, obj):
+            if isinstance(obj, SKCPipeline):
+                pickled_pipelines.append(obj)
+            return None
+
+    class RecordingExecutor(skc_pipeline.ProcessPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            submitted.append(fn)
+            RecordingPickler(io.BytesIO()).dump((fn, args, kwargs))
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(skc_pipeline, 'ProcessPoolExecutor', RecordingExecutor)
+    rng = np.random.default_rng(0)
+    tensor_dict = {
+        f'layer{i}.weight': rng.standard_normal((16, 16)).astype(np.float32) for i in range(4)
+    }
+    tp = SKCPipeline(batch_workers=2, batch_executor='process')
+
+    recovered = tp.backward_batch(tp.forward_batch(tensor_dict))
+    for name, nparray in tensor_dict.items():
+        assert recovered[name].shape == nparray.shape
+    assert submitted
+    assert not pickled_pipelines
+
+
+@pytest.mark.parametrize('kmeans_backend', ['dp', 'sklearn'])
+def test_kmeans_warm_start(kmeans_backend, monkeypatch):
+    """Test that slowly changing tensors reuse their codebook until the error jumps."""
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal(2_000).astype(np.float32)
+    kt = KmeansTransformer(8, backend=kmeans_backend, warm_start=True)
+    kt.forward(data, tensor_name='fc.weight')
+
+    def no_full_fit(*args, **kwargs):
+        raise AssertionError('unexpected full fit')
+
+    with monkeypatch.context() as m:
+        m.setattr(skc_pipeline, 'kmeans_1d', no_full_fit)
+        m.setattr(skc_pipeline.cluster, 'KMeans', no_full_fit)
+        for _ in range(3):
+            data = data + 0.01 * rng.standard_normal(data.shape).astype(np.float32)
+            codes, metadata = kt.forward(data, tensor_name='fc.weight')
+    recovered = kt.backward(codes, metadata)
+    assert np.mean((data - recovered) ** 2) < 0.05
+
+    # a shifted distribution triggers a full fit
+    shifted = np.concatenate([data[:1_000], data[1_000:] + 10])
+    codes, metadata = kt.forward(shifted, tensor_name='fc.weight')
+    assert np.mean((shifted - kt.backward(codes, metadata)) ** 2) < 0.2
+
+
+@pytest.mark.parametrize('kmeans_backend', ['dp', 'sklearn'])
+def test_kmeans_sampled_fit(kmeans_backend):
+    """Test that a codebook fitted on a sample quantizes the whole array."""
+    data = np.random.default_rng(0).standard_normal(100_000).astype(np.float32)
+    full = KmeansTransformer(8, backend=kmeans_backend)
+    sampled = KmeansTransformer(8, backend=kmeans_backend, sample_size=5_000,
+                                sample_method='stratified')
+
+    full_error = np.mean((data - full.backward(*full.forward(data))) ** 2)
+    codes, metadata = sampled.forward(data)
+    sampled_error = np.mean((data - sampled.backward(codes, metadata)) ** 2)
+
+    assert codes.shape == data.shape
+    assert sampled_error < 1.05 * full_error
+    assert metadata['int_to_float'][-1] >= 0
+    assert sorted(k for k in metadata['int_to_float'] if k >= 0) == list(range(8))
+
+
+@pytest.mark.parametrize('qsgd_block_size', [None, 64])
+def test_skc_qsgd_round_trip(qsgd_block_size):
+    """Test the QSGD quantizer stage within one grid step of the kept values."""
+    data = np.random.default_rng(0).standard_normal((64, 64)).astype(np.float32)
+    tp = SKCPipeline(p_sparsity=0.1, quantizer='qsgd', qsgd_levels=4,
+                     qsgd_block_size=qsgd_block_size, qsgd_seed=0)
+
+    data_fwd, transformer_metadata = tp.forward(data)
+    recovered = tp.backward(data_fwd, transformer_metadata)
+
+    kept = recovered != 0
+    assert isinstance(tp.transformers[1], skc_pipeline.QSGDTransformer)
+    assert recovered.shape == data.shape
+    assert np.all(np.abs(recovered - data)[kept] <= np.abs(data).max() / 4 * (1 + 1e-6))
+    seeded = SKCPipeline(p_sparsity=0.1, quantizer='qsgd', qsgd_levels=4,
+                         qsgd_block_size=qsgd_block_size, qsgd_seed=0)
+    assert seeded.forward(data)[0] == data_fwd
+    with pytest.raises(ValueError):
+        SKCPipeline(quantizer='uniform')
+
+
+def test_skc_qsgd_process_batch():
+    """Test that a pipeline with the 'qsgd' quantizer is copied to worker processes."""
+    rng = np.random.default_rng(0)
+    tensor_dict = {
+        'conv1.weight': rng.standard_normal((8, 1, 5, 5)).astype(np.float32),
+        'fc1.weight': rng.standard_normal((64, 128)).astype(np.float32),
+    }
+    tp = SKCPipeline(quantizer='qsgd', qsgd_seed=0, batch_workers=2, batch_executor='process')
+
+    recovered = tp.backward_batch(tp.forward_batch(tensor_dict))
+
+    for name, nparray in tensor_dict.items():
+        assert recovered[name].shape == nparray.shape
+        assert np.sum((recovered[name] - nparray) ** 2) < np.sum(nparray**2)
+
+
+@pytest.mark.parametrize('qsgd_seed', [None, 0])
+def test_skc_qsgd_process_batch_rounds_draw_fresh_noise(qsgd_seed):
+    """Test that worker processes do not repeat the rounding of earlier rounds."""
+    rng = np.random.default_rng(0)
+    tensor_dict = {
+        f'layer{i}.weight': rng.standard_normal(4_096).astype(np.float32) for i in range(3)
+    }
+    tp = SKCPipeline(p_sparsity=0.5, quantizer='qsgd', qsgd_levels=2, qsgd_seed=qsgd_seed,
+                     batch_workers=2, batch_executor='process')
+
+    first, second = tp.forward_batch(tensor_dict), tp.forward_batch(tensor_dict)
+
+    for name in tensor_dict:
+        assert first[name][0] != second[name][0]
+
+
+@pytest.mark.parametrize('settings', [
+    {'n_clusters': 6},
+    {'n_clusters': None, 'value_dtype': 'bfloat16'},
+    {'quantizer': 'qsgd', 'qsgd_block_size': 100, 'qsgd_seed': 0},
+    {'chunk_size': 1_000},
+    {'topk_block_size': 256, 'chunk_size': 1_024},
+    {'policy': [{'route': 'lossless'}]},
+])
+def test_skc_accumulate(settings):
+    """Test that accumulating payloads adds their weighted decompressed tensors."""
+    rng = np.random.default_rng(0)
+    tp = SKCPipeline(p_sparsity=0.1, **settings)
+    payloads = [tp.forward(rng.standard_normal((50, 90)).astype(np.float32)) for _ in range(3)]
+
+    accumulator = None
+    for data_fwd, transformer_metadata in payloads:
+        accumulator = tp.accumulate(data_fwd, transformer_metadata, out=accumulator, weight=0.5)
+    control = sum(0.5 * tp.backward(data_fwd, list(metadata)) for data_fwd, metadata in payloads)
+
+    assert accumulator.shape == (50, 90)
+    assert np.allclose(accumulator, control, atol=1e-6)
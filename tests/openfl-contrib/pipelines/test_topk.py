@@ -0,0 +1,63 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines.topk import block_topk_indices, topk_indices
+
+
+@pytest.mark.parametrize('p', [0.001, 0.01, 0.1, 0.5])
+def test_partition_matches_sort(p):
+    """Test that the partition engine selects the same indices as a full sort."""
+    x = np.random.default_rng(0).standard_normal(10_000).astype(np.float32)
+    k = int(np.ceil(x.shape[0] * p))
+
+    expected = np.sort(np.argsort(np.abs(x))[-k:])
+    for method in ('sort', 'partition'):
+        indices = topk_indices(x, k, method=method, n_workers=4, chunk_size=777)
+        assert np.array_equal(indices, expected)
+
+
+def test_partition_ties_match_sort():
+    """Test that ties on the threshold are resolved like the sort engine."""
+    x = np.random.default_rng(1).integers(-5, 5, size=5_000).astype(np.float32)
+
+    for k in (1, 10, 1_000, 4_999):
+        sort_idx = topk_indices(x, k, method='sort')
+        part_idx = topk_indices(x, k, method='partition', n_workers=3, chunk_size=128)
+        assert part_idx.shape == (k,)
+        assert np.array_equal(sort_idx, part_idx)
+
+
+def test_topk_unknown_method():
+    """Test that an unknown engine is rejected."""
+    with pytest.raises(ValueError):
+        topk_indices(np.ones(4), 2, method='heap')
+
+
+@pytest.mark.parametrize('block_size', [1, 64, 100, 1_024, 4_096])
+def test_block_topk_keeps_top_k_of_every_block(block_size):
+    """Test that every block keeps its own top-k, and the last one a prorated share."""
+    x = np.random.default_rng(2).standard_normal(10_000).astype(np.float32)
+    k = int(np.ceil(block_size * 0.05))
+
+    indices = block_topk_indices(x, k, block_size, n_workers=3, chunk_size=1_000)
+
+    assert np.all(np.diff(indices) > 0)
+    for start in range(0, x.shape[0], block_size):
+        block = np.abs(x[start:start + block_size])
+        k_block = int(np.ceil(k * block.shape[0] / block_size - 0.5))
+        kept = indices[(indices >= start) & (indices < start + block_size)] - start
+        assert np.array_equal(kept, np.sort(np.argsort(block)[block.shape[0] - k_block:]))
+    assert np.array_equal(indices // block_size, np.arange(indices.shape[0]) // k)
+    # the tail is rounded to nearest, so the total is k per block size to within half
+    assert abs(indices.shape[0] - k * x.shape[0] / block_size) <= 0.5
+
+
+def test_block_topk_rounds_the_tail_half_down():
+    """Test that a tail owed exactly half an element keeps the lower count."""
+    x = np.arange(1, 13, dtype=np.float32)
+
+    indices = block_topk_indices(x, 3, 8)
+
+    assert np.array_equal(indices, [5, 6, 7, 11])
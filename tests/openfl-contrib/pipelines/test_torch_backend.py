@@ -0,0 +1,54 @@
+# Copyright (C) 2024 Intel Corporation
+# SPDX-License-Identifier: Apache-2.0
+from importlib import util
+
+import numpy as np
+import pytest
+
+from openfl_contrib.pipelines import SKCPipeline
+from openfl_contrib.pipelines.quantization import assign_1d
+
+has_torch = util.find_spec('torch') is not None
+requires_torch = pytest.mark.skipif(not has_torch, reason='torch is not installed')
+
+
+def test_unknown_array_backend():
+    """Test that unknown array backends are rejected."""
+    with pytest.raises(ValueError):
+        SKCPipeline(array_backend='cupy')
+
+
+@pytest.mark.skipif(has_torch, reason='torch is installed')
+def test_torch_backend_requires_torch():
+    """Test that the torch backend fails early without the torch package."""
+    with pytest.raises(ImportError):
+        SKCPipeline(array_backend='torch')
+
+
+@requires_torch
+@pytest.mark.parametrize('n_clusters', [6, None])
+def test_torch_payloads_decode_with_numpy(n_clusters):
+    """Test that a numpy receiver decodes torch payloads to the numpy result."""
+    import torch
+
+    data = np.random.default_rng(0).standard_normal((64, 257)).astype(np.float32)
+    sender = SKCPipeline(p_sparsity=0.05, n_clusters=n_clusters, array_backend='torch')
+    receiver = SKCPipeline(p_sparsity=0.05, n_clusters=n_clusters)
+
+    payload, metadata = sender.forward(torch.from_numpy(data))
+    expected = receiver.backward(*receiver.forward(data))
+
+    np.testing.assert_array_equal(receiver.backward(payload, metadata), expected)
+
+
+@requires_torch
+def test_torch_assignment_matches_numpy():
+    """Test that bucketize assigns midpoint ties like searchsorted."""
+    from openfl_contrib.pipelines import torch_backend
+
+    centroids = np.array([-1.0, 0.0, 0.5, 2.0], dtype=np.float32)
+    x = np.concatenate([np.linspace(-3, 3, 1_001), [-0.5, 0.25, 1.25]]).astype(np.float32)
+
+    np.testing.assert_array_equal(torch_backend.assign_1d(x, centroids), assign_1d(x, centroids))
+    values, inverse = torch_backend.unique_inverse(np.array([3.0, 1.0, 3.0, 2.0]))
+    np.testing.assert_array_equal(values[inverse], [3.0, 1.0, 3.0, 2.0])